@@ -3,13 +3,15 @@ import os
 import sys
 from logging.config import fileConfig
 
+from sqlalchemy import pool
 from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
 from alembic import context
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
 from app.core.config import settings  # type: ignore  # noqa: E402
-from app.core.database import Base, engine  # type: ignore  # noqa: E402
+from app.core.database import Base  # type: ignore  # noqa: E402
 from app.models import profile  # noqa: F401, E402
 
 # this is the Alembic Config object, which provides
@@ -43,6 +45,7 @@ def do_run_migrations(connection: Connection) -> None:
 
 
 async def run_migrations_online() -> None:
+    engine = create_async_engine(settings.database_url, poolclass=pool.NullPool)
     async with engine.begin() as connection:
         await connection.run_sync(do_run_migrations)
     await engine.dispose()
@@ -0,0 +1,29 @@
+"""Profile feature vectors on weekly plans for nearest-plan reuse (pgvector)."""
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    op.add_column("weeklyplanentity", sa.Column("profile_embedding", Vector(38), nullable=True))
+    op.add_column("weeklyplanentity", sa.Column("constraint_signature", sa.String(length=64), nullable=True))
+    op.create_index("ix_weeklyplanentity_constraint_signature", "weeklyplanentity", ["constraint_signature"])
+    op.execute(
+        "CREATE INDEX ix_weeklyplanentity_profile_embedding_hnsw ON weeklyplanentity "
+        "USING hnsw (profile_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_weeklyplanentity_profile_embedding_hnsw", table_name="weeklyplanentity")
+    op.drop_index("ix_weeklyplanentity_constraint_signature", table_name="weeklyplanentity")
+    op.drop_column("weeklyplanentity", "constraint_signature")
+    op.drop_column("weeklyplanentity", "profile_embedding")
@@ -0,0 +1,26 @@
+"""Constraint snapshots and parent links on weekly plans for incremental re-planning."""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("weeklyplanentity", sa.Column("constraints", postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column(
+        "weeklyplanentity",
+        sa.Column("parent_id", sa.String(), sa.ForeignKey("weeklyplanentity.id", ondelete="SET NULL"), nullable=True),
+    )
+    op.create_index("ix_weeklyplanentity_parent_id", "weeklyplanentity", ["parent_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_weeklyplanentity_parent_id", table_name="weeklyplanentity")
+    op.drop_column("weeklyplanentity", "parent_id")
+    op.drop_column("weeklyplanentity", "constraints")
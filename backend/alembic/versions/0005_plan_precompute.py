@@ -0,0 +1,24 @@
+"""Source and readiness status of weekly plans for off-peak precomputation."""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "weeklyplanentity", sa.Column("source", sa.String(length=16), nullable=False, server_default="request")
+    )
+    op.add_column("weeklyplanentity", sa.Column("status", sa.String(length=16), nullable=True))
+    op.create_index("ix_weeklyplanentity_profile_id_status", "weeklyplanentity", ["profile_id", "status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_weeklyplanentity_profile_id_status", table_name="weeklyplanentity")
+    op.drop_column("weeklyplanentity", "status")
+    op.drop_column("weeklyplanentity", "source")
@@ -0,0 +1,28 @@
+"""Indexes for clinician profile search and keyset pagination."""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_profile_data_gin", "profile", ["data"], postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}
+    )
+    op.create_index("ix_profile_goal", "profile", [sa.text("(data -> 'goals' ->> 'primary')")])
+    op.create_index("ix_profile_activity_level", "profile", [sa.text("(data -> 'lifestyle' ->> 'activityLevel')")])
+    op.create_index("ix_profile_language", "profile", ["language"])
+    op.create_index("ix_profile_created_at_id", "profile", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_profile_created_at_id", table_name="profile")
+    op.drop_index("ix_profile_language", table_name="profile")
+    op.drop_index("ix_profile_activity_level", table_name="profile")
+    op.drop_index("ix_profile_goal", table_name="profile")
+    op.drop_index("ix_profile_data_gin", table_name="profile")
@@ -0,0 +1,23 @@
+"""Content hashes of stored plans and reports, for strong ETags."""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("weeklyplanentity", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    op.add_column("clinicalreportentity", sa.Column("content_hash", sa.String(length=64), nullable=True))
+    # Existing rows: any stable digest will do, they never change.
+    op.execute("UPDATE weeklyplanentity SET content_hash = encode(sha256(convert_to(plan::text, 'UTF8')), 'hex')")
+    op.execute("UPDATE clinicalreportentity SET content_hash = encode(sha256(convert_to(report::text, 'UTF8')), 'hex')")
+
+
+def downgrade() -> None:
+    op.drop_column("clinicalreportentity", "content_hash")
+    op.drop_column("weeklyplanentity", "content_hash")
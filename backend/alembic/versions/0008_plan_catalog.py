@@ -0,0 +1,67 @@
+"""Meal catalog and shared plan bodies; plans reference them instead of inlining the document."""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalogmeal",
+        sa.Column("hash", sa.String(length=64), primary_key=True),
+        sa.Column("data", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "planbody",
+        sa.Column("hash", sa.String(length=64), primary_key=True),
+        sa.Column("body", postgresql.JSONB(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.add_column("weeklyplanentity", sa.Column("body_hash", sa.String(length=64), sa.ForeignKey("planbody.hash"), nullable=True))
+    op.add_column("weeklyplanentity", sa.Column("instance", postgresql.JSONB(), nullable=True))
+    op.create_index("ix_weeklyplanentity_body_hash", "weeklyplanentity", ["body_hash"])
+    # Existing rows keep their inline document.
+    op.alter_column("weeklyplanentity", "plan", existing_type=postgresql.JSONB(), nullable=True)
+    op.create_check_constraint(
+        "ck_weeklyplanentity_plan_or_body", "weeklyplanentity", "plan IS NOT NULL OR body_hash IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    # Inline the documents again before the catalog goes away.
+    op.execute(
+        """
+        UPDATE weeklyplanentity w
+        SET plan = (b.body - 'days') || jsonb_build_object(
+            'id', w.instance -> 'id',
+            'generatedAt', w.instance -> 'generatedAt',
+            'days', (
+                SELECT coalesce(jsonb_agg((d.day - 'meals') || jsonb_build_object('meals', (
+                    SELECT coalesce(jsonb_agg(c.data || jsonb_build_object(
+                        'id', w.instance -> 'mealIds' -> (d.ord::int - 1) -> (m.ord::int - 1),
+                        'timestamp', m.meal -> 'timestamp'
+                    ) ORDER BY m.ord), '[]'::jsonb)
+                    FROM jsonb_array_elements(d.day -> 'meals') WITH ORDINALITY AS m(meal, ord)
+                    JOIN catalogmeal c ON c.hash = m.meal ->> 'ref'
+                )) ORDER BY d.ord), '[]'::jsonb)
+                FROM jsonb_array_elements(b.body -> 'days') WITH ORDINALITY AS d(day, ord)
+            )
+        )
+        FROM planbody b
+        WHERE w.body_hash = b.hash AND w.plan IS NULL
+        """
+    )
+    op.drop_constraint("ck_weeklyplanentity_plan_or_body", "weeklyplanentity", type_="check")
+    op.alter_column("weeklyplanentity", "plan", existing_type=postgresql.JSONB(), nullable=False)
+    op.drop_index("ix_weeklyplanentity_body_hash", table_name="weeklyplanentity")
+    op.drop_column("weeklyplanentity", "instance")
+    op.drop_column("weeklyplanentity", "body_hash")
+    op.drop_table("planbody")
+    op.drop_table("catalogmeal")
@@ -0,0 +1,24 @@
+"""Correlation ids on stored plans and reports, so a retried plan task persists once."""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("weeklyplanentity", sa.Column("correlation_id", sa.String(), nullable=True))
+    op.add_column("clinicalreportentity", sa.Column("correlation_id", sa.String(), nullable=True))
+    op.create_index("ix_weeklyplanentity_correlation_id", "weeklyplanentity", ["correlation_id"], unique=True)
+    op.create_index("ix_clinicalreportentity_correlation_id", "clinicalreportentity", ["correlation_id"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_clinicalreportentity_correlation_id", table_name="clinicalreportentity")
+    op.drop_index("ix_weeklyplanentity_correlation_id", table_name="weeklyplanentity")
+    op.drop_column("clinicalreportentity", "correlation_id")
+    op.drop_column("weeklyplanentity", "correlation_id")
@@ -0,0 +1,32 @@
+"""Derived nutrition metrics as typed, indexed profile columns.
+
+Existing rows stay NULL here; the ``profiles.recompute_metrics`` task fills them.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+METRIC_COLUMNS = ("bmr", "tdee", "target_calories", "target_protein", "target_carbs", "target_fats", "bmi")
+INDEXED = ("bmi", "tdee", "target_calories", "metrics_version")
+
+
+def upgrade() -> None:
+    for name in METRIC_COLUMNS:
+        op.add_column("profile", sa.Column(name, sa.Float(), nullable=True))
+    op.add_column("profile", sa.Column("metrics_version", sa.SmallInteger(), nullable=True))
+    for name in INDEXED:
+        op.create_index(f"ix_profile_{name}", "profile", [name])
+
+
+def downgrade() -> None:
+    for name in reversed(INDEXED):
+        op.drop_index(f"ix_profile_{name}", table_name="profile")
+    op.drop_column("profile", "metrics_version")
+    for name in reversed(METRIC_COLUMNS):
+        op.drop_column("profile", name)
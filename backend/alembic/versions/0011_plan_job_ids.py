@@ -0,0 +1,33 @@
+"""Idempotency of stored plans and reports keyed on the plan task, per profile.
+
+Client correlation ids are not scoped to a tenant, so they stay a plain trace column
+and lose their unique index; retried or redelivered tasks are matched on the
+server-minted task id together with the profile instead.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+TABLES = ("weeklyplanentity", "clinicalreportentity")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_correlation_id", table_name=table)
+        op.create_index(f"ix_{table}_correlation_id", table, ["correlation_id"])
+        op.add_column(table, sa.Column("job_id", sa.String(), nullable=True))
+        op.create_index(f"ix_{table}_profile_job", table, ["profile_id", "job_id"], unique=True)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_profile_job", table_name=table)
+        op.drop_column(table, "job_id")
+        op.drop_index(f"ix_{table}_correlation_id", table_name=table)
+        op.create_index(f"ix_{table}_correlation_id", table, ["correlation_id"], unique=True)
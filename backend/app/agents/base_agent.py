@@ -1,11 +1,22 @@
 import asyncio
 import time
 from abc import ABC, abstractmethod
+from collections import deque
 from enum import Enum
-from typing import Any, Dict, Optional, TypeVar, Generic
+from typing import TYPE_CHECKING, Any, ClassVar, Deque, Dict, Optional, Type, TypeVar, Generic
 
 import structlog
 from pydantic import BaseModel, Field
+from pydantic_core import to_jsonable_python
+
+from app.core import deadline
+from app.core.metrics import AGENT_HEDGES, AGENT_RUN_ATTEMPTS, AGENT_RUN_SECONDS
+from app.core.tracing import tracer
+from app.services import llm_usage
+from app.services.agent_memory import ProfileMemory, memory_store
+
+if TYPE_CHECKING:
+    from app.agents.transport import Transport
 
 logger = structlog.get_logger()
 
@@ -24,7 +35,12 @@ class AgentMessage(BaseModel):
     content: Dict[str, Any]
     message_type: str
     timestamp: float = Field(default_factory=lambda: time.time())
+    # Trace id of the plan the message belongs to, shared by every step of that plan.
     correlation_id: Optional[str] = None
+    # Unique per bus request; the reply carries it back to the waiting caller.
+    request_id: Optional[str] = None
+    reply_to: Optional[str] = None
+    deadline: Optional[float] = None
 
 
 class AgentConfig(BaseModel):
@@ -35,54 +51,186 @@ class AgentConfig(BaseModel):
     logging_level: str = "INFO"
     enable_memory: bool = True
     llm_model: Optional[str] = None
+    # Hedging: once an attempt outlives the observed p95 (and at least hedge_min_delay),
+    # start a duplicate and keep whichever succeeds first. Only for idempotent agents
+    # whose class allows it; at most hedge_budget of recent attempts are hedged, since
+    # the losing call still runs (and bills) until the attempt's deadline.
+    hedge: bool = False
+    hedge_min_delay: float = 0.5
+    hedge_min_samples: int = 20
+    hedge_budget: float = 0.1
+    backoff_base: float = 2.0
 
 
 class AgentProcessingError(Exception):
     """Raised when an agent fails after retry attempts."""
 
 
+class AgentTimeoutError(AgentProcessingError):
+    """Raised when every attempt timed out or the request deadline ran out."""
+
+
 T = TypeVar("T")
 
 
 class BaseAgent(ABC, Generic[T]):
     """Base class for all agents."""
 
+    # Model the result is rebuilt into after crossing the message bus (None: plain JSON).
+    result_model: ClassVar[Optional[Type[BaseModel]]] = None
+    # Whether a duplicate attempt is cheap and safe enough to hedge with (config.hedge).
+    hedgeable: ClassVar[bool] = True
+
     def __init__(self, config: AgentConfig):
         self.config = config
         self.state = AgentState.IDLE
         self.message_queue: asyncio.Queue[AgentMessage] = asyncio.Queue()
         self._running = False
+        self.attempts = 0
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.hedged: Deque[bool] = deque(maxlen=200)
 
     @abstractmethod
     async def process(self, input_data: T) -> Any:  # pragma: no cover - to be implemented by subclasses
         ...
 
+    async def recall(self, profile_id: Optional[str]) -> Optional[ProfileMemory]:
+        """The profile's bounded memory, or None when ``config.enable_memory`` is off."""
+        if not self.config.enable_memory or not profile_id:
+            return None
+        return await memory_store.get(profile_id)
+
     async def run(self, input_data: T) -> Any:
         """Execute the agent with retries and timeout handling."""
+        started = time.perf_counter()
+        self.attempts = 0
+        with tracer.start_as_current_span("agent.run") as span:
+            span.set_attribute("agent", self.config.name)
+            try:
+                return await self._run_with_retries(input_data, span)
+            finally:
+                outcome = {AgentState.COMPLETED: "success", AgentState.FAILED: "error"}.get(self.state, "timeout")
+                AGENT_RUN_SECONDS.labels(agent=self.config.name, outcome=outcome).observe(time.perf_counter() - started)
+                AGENT_RUN_ATTEMPTS.labels(agent=self.config.name).observe(self.attempts)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Observed p95 attempt latency, or None until there are enough samples to hedge on."""
+        if not (self.config.hedge and self.hedgeable) or len(self.latencies) < self.config.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return max(ordered[int(0.95 * (len(ordered) - 1))], self.config.hedge_min_delay)
+
+    def _hedge_allowed(self) -> bool:
+        return sum(self.hedged) < self.config.hedge_budget * len(self.hedged)
+
+    def _start(self, input_data: T, ends_at: float) -> "asyncio.Future[Any]":
+        # The attempt's end becomes the deadline of everything it runs, so a cancelled or
+        # timed-out attempt's Gemini call (in a thread, not cancellable) stops with it.
+        with deadline.deadline_scope(ends_at):
+            return asyncio.ensure_future(self.process(input_data))
+
+    async def _attempt(self, input_data: T, timeout: float) -> Any:
+        started = time.perf_counter()
+        ends_at = time.time() + timeout
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            self.hedged.append(False)
+            result = await asyncio.wait_for(self._start(input_data, ends_at), timeout=timeout)
+            self.latencies.append(time.perf_counter() - started)
+            return result
+
+        primary = self._start(input_data, ends_at)
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if not done and not self._hedge_allowed():
+            logger.info("agent_hedge_over_budget", agent=self.config.name)
+        elif not done:
+            self.hedged.append(True)
+            hedge = self._start(input_data, ends_at)
+            logger.info("agent_hedge_started", agent=self.config.name, after_ms=round(delay * 1000))
+            pending = {primary, hedge}
+            end = started + timeout
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=max(end - time.perf_counter(), 0.0), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        raise asyncio.TimeoutError()
+                    winner = next((task for task in done if task.exception() is None), None)
+                    if winner is not None:
+                        AGENT_HEDGES.labels(agent=self.config.name, winner="hedge" if winner is hedge else "primary").inc()
+                        self.latencies.append(time.perf_counter() - started)
+                        return winner.result()
+                # Both failed: surface the primary's error.
+                return primary.result()
+            finally:
+                for task in (primary, hedge):
+                    task.cancel()
+        self.hedged.append(False)
+        try:
+            result = await asyncio.wait_for(primary, timeout=max(ends_at - time.time(), 0.0))
+        finally:
+            primary.cancel()
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _run_with_retries(self, input_data: T, span: Any) -> Any:
         self.state = AgentState.RUNNING
         retries = 0
 
         while retries < self.config.max_retries:
+            timeout = deadline.bounded(self.config.timeout)
+            if timeout <= 0:
+                span.add_event("deadline_exceeded", {"attempt": retries + 1})
+                raise AgentTimeoutError(f"Agent {self.config.name} ran out of deadline") from deadline.DeadlineExceeded()
+            self.attempts = retries + 1
+            span.set_attribute("attempts", self.attempts)
             try:
-                logger.info("agent_run_start", agent=self.config.name, attempt=retries + 1)
-                result = await asyncio.wait_for(self.process(input_data), timeout=self.config.timeout)
+                logger.info("agent_run_start", agent=self.config.name, attempt=retries + 1, timeout=round(timeout, 3))
+                result = await self._attempt(input_data, timeout)
                 self.state = AgentState.COMPLETED
                 logger.info("agent_run_success", agent=self.config.name)
                 return result
             except asyncio.TimeoutError:
                 retries += 1
+                span.add_event("timeout", {"attempt": retries})
                 logger.warning("agent_timeout", agent=self.config.name, attempt=retries)
-                await asyncio.sleep(2**retries)
+                if retries >= self.config.max_retries:
+                    raise AgentTimeoutError(f"Agent {self.config.name} timed out after {retries} attempts")
+                await self._backoff(retries)
             except Exception as exc:  # pragma: no cover - upstream tests should mock
                 retries += 1
+                span.record_exception(exc)
                 logger.exception("agent_error", agent=self.config.name, attempt=retries, error=str(exc))
                 if retries >= self.config.max_retries:
                     self.state = AgentState.FAILED
                     raise AgentProcessingError(f"Agent {self.config.name} failed after retries") from exc
 
-    async def handle_message(self, message: AgentMessage) -> None:
-        """Handle incoming message. Override as needed."""
-        logger.info("agent_message_received", agent=self.config.name, message_type=message.message_type)
+    async def _backoff(self, retries: int) -> None:
+        """Sleep ``backoff_base ** retries`` unless that would leave no time for another attempt."""
+        pause = self.config.backoff_base**retries
+        left = deadline.remaining()
+        if left is not None and pause >= left:
+            raise AgentTimeoutError(f"Agent {self.config.name} has no deadline left to retry")
+        await asyncio.sleep(pause)
+
+    async def handle_message(self, message: AgentMessage) -> Optional[Dict[str, Any]]:
+        """Handle an incoming message; requests run the agent and return the reply content."""
+        with structlog.contextvars.bound_contextvars(correlation_id=message.correlation_id):
+            logger.info("agent_message_received", agent=self.config.name, message_type=message.message_type)
+            if message.message_type != "request":
+                return None
+            try:
+                profile = message.content.get("profile") or {}
+                with (
+                    deadline.deadline_scope(message.deadline),
+                    llm_usage.usage_scope(message.content.get("tenant_id"), profile.get("id"), message.correlation_id),
+                ):
+                    result = await self.run(message.content)
+            except Exception as exc:
+                cause = exc.__cause__ or exc
+                return {"ok": False, "error": str(cause), "error_type": type(cause).__name__}
+        return {"ok": True, "result": to_jsonable_python(result)}
 
     async def receive_messages(self) -> None:
         """Continuously process messages from queue."""
@@ -91,5 +239,18 @@ class BaseAgent(ABC, Generic[T]):
             message = await self.message_queue.get()
             await self.handle_message(message)
 
+    async def serve(self, transport: "Transport", consumer: str, concurrency: int = 1) -> None:
+        """Consume this agent's inbox on ``transport`` with ``concurrency`` messages in flight."""
+        self._running = True
+        await asyncio.gather(*(self._serve_one(transport, f"{consumer}-{slot}") for slot in range(concurrency)))
+
+    async def _serve_one(self, transport: "Transport", consumer: str) -> None:
+        while self._running:
+            for delivery in await transport.receive(self.config.name, consumer):
+                reply = await self.handle_message(delivery.message)
+                if reply is not None:
+                    await transport.reply(delivery.message, reply)
+                await transport.ack(delivery)
+
     def stop(self) -> None:
         self._running = False
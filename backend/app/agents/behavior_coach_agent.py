@@ -1,10 +1,34 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from app.agents.base_agent import AgentConfig, BaseAgent
+from app.services.agent_memory import ProfileMemory
+
+DEFAULT_INSIGHTS = ["Stay hydrated", "Sleep 7-8 hours"]
+# Logged days in the memory window below which logging itself is the first tip.
+MIN_LOGGED_DAYS = 4
+
+
+def adherence_insights(memory: Optional[ProfileMemory]) -> List[str]:
+    """Tips from the meal-log adherence kept in the profile's agent memory."""
+    adherence = memory.adherence if memory else None
+    if not adherence:
+        return ["Log your meals to track how closely you follow the plan"]
+    insights = []
+    if adherence["logged_days"] < MIN_LOGGED_DAYS:
+        insights.append(f"Logged {adherence['logged_days']} of the last {adherence['window']} days; log every day")
+    ratio = adherence.get("intake_ratio")
+    if ratio is not None and ratio < 0.85:
+        insights.append(f"Intake averages {ratio:.0%} of the plan; avoid skipping meals")
+    elif ratio is not None and ratio > 1.15:
+        insights.append(f"Intake averages {ratio:.0%} of the plan; review portion sizes")
+    return insights
 
 
 class BehaviorCoachAgent(BaseAgent[Dict[str, Any]]):
-    """Agent that provides adherence tips (placeholder)."""
+    """Agent that provides adherence tips from the profile's agent memory."""
 
     async def process(self, input_data: Dict[str, Any]) -> Any:
-        return {"insights": ["Stay hydrated", "Sleep 7-8 hours"], "profile": input_data.get("profile")}
+        profile = input_data.get("profile")
+        memory = await self.recall((profile or {}).get("id"))
+        insights = (adherence_insights(memory) if self.config.enable_memory else []) + DEFAULT_INSIGHTS
+        return {"insights": insights, "profile": profile}
@@ -1,12 +1,24 @@
+import asyncio
 from typing import Any, Dict
 
+import structlog
+
 from app.agents.base_agent import AgentConfig, BaseAgent
-from app.services import gemini
-from app.schemas.plan import PlanRequest, WeeklyPlan
+from app.services import clinical_rules, gemini
+from app.schemas.plan import ClinicalReport, PlanRequest, WeeklyPlan
+
+logger = structlog.get_logger()
 
 
 class ClinicalSafetyAgent(BaseAgent[Dict[str, Any]]):
-    """Agent that validates a plan for clinical safety via Gemini report."""
+    """Agent that validates a plan for clinical safety.
+
+    Numbers and hard safety flags come from the local rules engine; Gemini only writes
+    the narrative when ``clinical_rules.narrative_needed`` says a template is not enough
+    and the request was not downgraded to the local engine.
+    """
+
+    result_model = ClinicalReport
 
     async def process(self, input_data: Dict[str, Any]) -> Any:
         profile = input_data.get("profile")
@@ -15,7 +27,14 @@ class ClinicalSafetyAgent(BaseAgent[Dict[str, Any]]):
             raise RuntimeError("No plan provided for safety check")
         plan = WeeklyPlan.model_validate(plan_data)
         request = PlanRequest.model_validate({"profile": profile})
-        report = gemini.generate_clinical_report(request, plan)
-        if not report:
-            raise RuntimeError("Failed to generate clinical report")
-        return report
+        assessment = clinical_rules.assess(request.profile, plan)
+        if input_data.get("engine") != "local" and clinical_rules.narrative_needed(assessment):
+            try:
+                report = await asyncio.to_thread(
+                    gemini.generate_clinical_report, request, plan, assessment, input_data.get("llm_model")
+                )
+                if report:
+                    return report
+            except Exception as exc:
+                logger.warning("clinical_template_fallback", agent=self.config.name, error=str(exc))
+        return assessment.to_report()
@@ -1,10 +1,55 @@
+import asyncio
+from dataclasses import asdict
 from typing import Any, Dict
 
+import structlog
+
 from app.agents.base_agent import AgentConfig, BaseAgent
+from app.core.config import settings
+from app.schemas.plan import MacroBreakdown
+from app.services import gemini, meal_parser
+
+logger = structlog.get_logger()
 
 
 class MealLogAgent(BaseAgent[Dict[str, Any]]):
-    """Agent that records meal logs. Placeholder for future parsing."""
+    """Agent that turns free-text meal logs into calorie and macro totals.
+
+    Items are resolved against the local food index; only items matched below
+    ``settings.meal_log_min_confidence`` are sent to Gemini, in a single call.
+    """
 
     async def process(self, input_data: Dict[str, Any]) -> Any:
-        return {"status": "logged", "entry": input_data.get("entry")}
+        entry = input_data.get("entry")
+        text = entry.get("text", "") if isinstance(entry, dict) else str(entry or "")
+        parsed = meal_parser.parse_entry(text)
+        uncertain = parsed.uncertain(settings.meal_log_min_confidence)
+        items = parsed.items
+        source = "local"
+
+        calories = parsed.calories
+        macros = parsed.macros
+        if uncertain:
+            try:
+                estimate = await asyncio.to_thread(gemini.estimate_meal, ", ".join(i.text for i in uncertain))
+            except Exception as exc:
+                logger.warning("meal_log_llm_failed", agent=self.config.name, error=str(exc))
+            else:
+                confident = [i for i in items if i not in uncertain]
+                calories = round(sum(i.calories for i in confident) + estimate.calories, 1)
+                macros = MacroBreakdown(
+                    protein=round(sum(i.macros.protein for i in confident) + estimate.protein, 1),
+                    carbs=round(sum(i.macros.carbs for i in confident) + estimate.carbs, 1),
+                    fats=round(sum(i.macros.fats for i in confident) + estimate.fats, 1),
+                )
+                source = "llm" if not confident else "mixed"
+
+        return {
+            "status": "logged",
+            "entry": entry,
+            "calories": calories,
+            "macros": macros.model_dump(),
+            "items": [{**asdict(i), "macros": i.macros.model_dump()} for i in items],
+            "confidence": parsed.confidence,
+            "source": source,
+        }
@@ -1,16 +1,65 @@
+import asyncio
 from typing import Any, Dict
 
+import structlog
+
 from app.agents.base_agent import AgentConfig, BaseAgent
-from app.services import gemini
+from app.core.config import settings
+from app.core.metrics import PLAN_REPLAN_FRACTION
+from app.services import gemini, plan_engine, plan_reuse, replan
 from app.schemas.plan import PlanRequest, WeeklyPlan
 
+logger = structlog.get_logger()
+
 
 class NutritionPlanAgent(BaseAgent[Dict[str, Any]]):
-    """Agent that generates a weekly nutrition plan using Gemini."""
+    """Agent that generates a weekly nutrition plan with Gemini and/or the local plan engine.
+
+    ``settings.plan_engine_mode`` picks llm, local, fallback (llm, local on failure) or
+    skeleton (local draft that Gemini personalises; the draft is kept if Gemini fails).
+    Outside local mode a stored plan of a near-identical profile is reused first when
+    ``settings.plan_reuse_enabled``. Given a ``parent`` (the profile's latest plan), only
+    the days and meals that no longer fit the profile are regenerated. With
+    ``config.enable_memory`` the profile's agent memory (recent plans, adherence, coach
+    notes) is added to the Gemini prompt. ``engine`` and ``llm_model`` in the input
+    override the mode and the Gemini model (LLM budget downgrades).
+    """
+
+    result_model = WeeklyPlan
+    # A weekly plan is the largest Gemini call; a duplicate would double its cost.
+    hedgeable = False
 
     async def process(self, input_data: Dict[str, Any]) -> Any:
         request = PlanRequest.model_validate({"profile": input_data.get("profile")})
-        plan = gemini.generate_weekly_plan(request)
-        if not plan:
-            raise RuntimeError("Failed to generate plan")
-        return plan
+        mode = input_data.get("engine") or settings.plan_engine_mode
+        parent = input_data.get("parent")
+        if parent:
+            result = await asyncio.to_thread(
+                replan.replan, WeeklyPlan.model_validate(parent["plan"]), parent.get("constraints"), request.profile
+            )
+            if result is not None:
+                PLAN_REPLAN_FRACTION.observe(result.regenerated_fraction)
+                logger.info("plan_replanned", parent=parent["id"], days=len(result.days), meals=len(result.meals))
+                return result.plan
+            PLAN_REPLAN_FRACTION.observe(1.0)
+        if mode == "local":
+            # A few ms of NumPy work; kept off the event loop like the Gemini call.
+            return await asyncio.to_thread(plan_engine.generate_weekly_plan, request.profile)
+        if settings.plan_reuse_enabled:
+            reused = await plan_reuse.find_reusable(request.profile)
+            if reused is not None:
+                return reused
+
+        skeleton = await asyncio.to_thread(plan_engine.generate_weekly_plan, request.profile) if mode == "skeleton" else None
+        memory = await self.recall(request.profile.id)
+        try:
+            history = memory.context() if memory else ""
+            plan = await asyncio.to_thread(gemini.generate_weekly_plan, request, skeleton, history, input_data.get("llm_model"))
+            if not plan:
+                raise RuntimeError("Failed to generate plan")
+            return plan
+        except Exception as exc:
+            if mode == "llm":
+                raise
+            logger.warning("plan_local_fallback", agent=self.config.name, mode=mode, error=str(exc))
+            return skeleton or await asyncio.to_thread(plan_engine.generate_weekly_plan, request.profile)
@@ -1,49 +1,180 @@
 import asyncio
-from typing import Any, Dict, List
+import time
+from typing import Any, Callable, ClassVar, Dict, List, Optional
 
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
+from langgraph.graph import END, START, StateGraph
 
 from app.agents.base_agent import AgentConfig, BaseAgent
 from app.agents.registry import AgentRegistry
+from app.core.config import settings
+from app.services.checkpoints import PlanCheckpoints
+
+# Steps name their inputs by id: a step receives the orchestration input plus
+# the outputs of its dependencies under their step ids.
+DEFAULT_WORKFLOW: List[Dict[str, Any]] = [
+    {"id": "plan", "agent": "nutrition_plan", "depends_on": []},
+    {"id": "clinical", "agent": "clinical_safety", "depends_on": ["plan"]},
+    {"id": "coach", "agent": "behavior_coach", "depends_on": ["plan"]},
+]
+WORKFLOWS: Dict[str, List[Dict[str, Any]]] = {"weekly_plan": DEFAULT_WORKFLOW}
+
+_BOOKKEEPING = ("steps", "results", "outputs", "timings", "status", "workflow")
+
+Node = Callable[[Dict[str, Any], RunnableConfig], Any]
+
+
+def _timed(name: str, fn: Node) -> Node:
+    async def node(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        started = time.perf_counter()
+        state = await fn(state, config)
+        state.setdefault("timings", {})[name] = round((time.perf_counter() - started) * 1000, 3)
+        return state
+
+    return node
+
+
+async def _intake(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    return {**state, "status": "intake_ok"}
+
+
+async def _planner(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    state["steps"] = WORKFLOWS[state.get("workflow") or "weekly_plan"]
+    return state
+
+
+async def _executor(state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+    orchestrator: "OrchestratorAgent" = config["configurable"]["orchestrator"]
+    base_input = {k: v for k, v in state.items() if k not in _BOOKKEEPING}
+    outputs, step_timings = await orchestrator.execute_steps(
+        state.get("steps", []), base_input, checkpoints=config["configurable"].get("checkpoints")
+    )
+    state["outputs"] = outputs
+    state["results"] = [outputs[step["id"]] for step in state.get("steps", []) if step["id"] in outputs]
+    state.setdefault("timings", {})["steps"] = step_timings
+    return state
+
+
+def _build_plan_pipeline():
+    graph = StateGraph(dict)
+    graph.add_node("intake", _timed("intake", _intake))
+    graph.add_node("planner", _timed("planner", _planner))
+    graph.add_node("executor", _timed("executor", _executor))
+    graph.add_edge(START, "intake")
+    graph.add_edge("intake", "planner")
+    graph.add_edge("planner", "executor")
+    graph.add_edge("executor", END)
+    return graph.compile()
+
+
+GRAPH_DEFINITIONS: Dict[str, Callable[[], Any]] = {"plan_pipeline": _build_plan_pipeline}
 
 
 class OrchestratorAgent(BaseAgent[Dict[str, Any]]):
-    """Simple orchestrator that delegates to registered agents using LangGraph."""
+    """Orchestrator that delegates to registered agents using LangGraph.
+
+    Graphs are compiled once per definition and shared by every instance; node
+    functions reach the instance through the run config, not closures.
+    """
+
+    _graphs: ClassVar[Dict[str, Any]] = {}
 
-    def __init__(self, config: AgentConfig, registry: AgentRegistry):
+    def __init__(self, config: AgentConfig, registry: AgentRegistry, graph_name: str = "plan_pipeline"):
         super().__init__(config)
         self.registry = registry
+        self.graph_name = graph_name
 
-    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Build a trivial graph: intake -> planner -> executor."""
-        graph = StateGraph(dict)
-
-        async def intake(state: Dict[str, Any]) -> Dict[str, Any]:
-            return {**state, "status": "intake_ok"}
-
-        async def planner(state: Dict[str, Any]) -> Dict[str, Any]:
-            state["plan"] = [{"agent": "nutrition_plan", "input": state}]
-            return state
-
-        async def executor(state: Dict[str, Any]) -> Dict[str, Any]:
-            results: List[Any] = []
-            for step in state.get("plan", []):
-                agent = self.registry.get(step["agent"])
-                if not agent:
-                    continue
-                res = await agent.run(step["input"])
-                results.append(res)
-            state["results"] = results
-            return state
-
-        graph.add_node("intake", intake)
-        graph.add_node("planner", planner)
-        graph.add_node("executor", executor)
-
-        graph.add_edge("intake", "planner")
-        graph.add_edge("planner", "executor")
-        graph.add_edge("executor", END)
-
-        app = graph.compile()
-        result = await app.ainvoke(input_data)
+    @classmethod
+    def compiled_graph(cls, name: str) -> Any:
+        graph = cls._graphs.get(name)
+        if graph is None:
+            graph = cls._graphs[name] = GRAPH_DEFINITIONS[name]()
+        return graph
+
+    async def process(self, input_data: Dict[str, Any], checkpoints: Optional[PlanCheckpoints] = None) -> Dict[str, Any]:
+        """Run intake -> planner -> executor on the cached graph.
+
+        With ``checkpoints``, steps completed by an earlier attempt of the same request
+        are restored instead of run, and each newly completed step is saved.
+        """
+        started = time.perf_counter()
+        app = self.compiled_graph(self.graph_name)
+        configurable = {"orchestrator": self, "checkpoints": checkpoints}
+        result = await app.ainvoke(dict(input_data), config={"configurable": configurable})
+        result.setdefault("timings", {})["total"] = round((time.perf_counter() - started) * 1000, 3)
         return result
+
+    async def execute_steps(
+        self,
+        steps: List[Dict[str, Any]],
+        base_input: Dict[str, Any],
+        max_parallel: Optional[int] = None,
+        checkpoints: Optional[PlanCheckpoints] = None,
+    ) -> tuple[Dict[str, Any], Dict[str, float]]:
+        """Run steps as soon as their dependencies finish, at most `max_parallel` at a time.
+
+        Steps whose agent is not registered are skipped, and so are steps that depend on them.
+        Checkpointed steps are rebuilt into the agent's result model and take no time.
+        """
+        by_id = {step["id"]: step for step in steps}
+        for step in steps:
+            missing = [dep for dep in step.get("depends_on", []) if dep not in by_id]
+            if missing:
+                raise ValueError(f"Step {step['id']} depends on unknown steps {missing}")
+
+        limit = asyncio.Semaphore(max_parallel or settings.orchestrator_max_parallel)
+        outputs: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        restored = await checkpoints.load() if checkpoints else {}
+
+        async def run_step(step: Dict[str, Any]) -> bool:
+            deps = step.get("depends_on", [])
+            if deps and not all(await asyncio.gather(*(tasks[dep] for dep in deps))):
+                return False
+            agent = self.registry.get(step["agent"])
+            if not agent:
+                return False
+            if step["id"] in restored:
+                model = getattr(agent, "remote_result_model", None) or getattr(agent, "result_model", None)
+                data = restored[step["id"]]
+                outputs[step["id"]] = model.model_validate(data) if model and data is not None else data
+                timings[step["id"]] = 0.0
+                return True
+            step_input = {**base_input, **{dep: outputs[dep] for dep in deps}}
+            async with limit:
+                started = time.perf_counter()
+                outputs[step["id"]] = await agent.run(step_input)
+                timings[step["id"]] = round((time.perf_counter() - started) * 1000, 3)
+            if checkpoints:
+                await checkpoints.save(step["id"], outputs[step["id"]])
+            return True
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for step in self._topological(steps, by_id):
+                    tasks[step["id"]] = group.create_task(run_step(step))
+        except ExceptionGroup as exc:
+            # Surface the agent's own error (e.g. AgentProcessingError), not the group wrapper.
+            raise exc.exceptions[0]
+        return outputs, timings
+
+    @staticmethod
+    def _topological(steps: List[Dict[str, Any]], by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ordered: List[Dict[str, Any]] = []
+        state: Dict[str, str] = {}
+
+        def visit(step_id: str) -> None:
+            if state.get(step_id) == "done":
+                return
+            if state.get(step_id) == "visiting":
+                raise ValueError(f"Workflow has a cycle through {step_id}")
+            state[step_id] = "visiting"
+            for dep in by_id[step_id].get("depends_on", []):
+                visit(dep)
+            state[step_id] = "done"
+            ordered.append(by_id[step_id])
+
+        for step in steps:
+            visit(step["id"])
+        return ordered
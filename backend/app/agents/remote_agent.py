@@ -0,0 +1,47 @@
+import time
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from app.agents.base_agent import AgentConfig, AgentMessage, AgentProcessingError, BaseAgent
+from app.agents.transport import Transport
+from app.core import deadline
+from app.core.metrics import AGENT_BUS_REQUEST_SECONDS
+
+
+class RemoteAgentError(AgentProcessingError):
+    """Raised when the worker serving a remote agent replies with an error."""
+
+
+class RemoteAgent(BaseAgent[Dict[str, Any]]):
+    """Proxy for an agent served by its own worker pool over the message bus.
+
+    Registered under the remote agent's name, so the orchestrator is unaware of where
+    the agent runs. The request carries the current deadline; the result is rebuilt
+    into the served agent's ``result_model`` when given.
+    """
+
+    def __init__(self, config: AgentConfig, transport: Transport, result_model: Optional[Type[BaseModel]] = None):
+        super().__init__(config)
+        self.transport = transport
+        self.remote_result_model = result_model
+
+    async def process(self, input_data: Dict[str, Any]) -> Any:
+        message = AgentMessage(
+            sender=self.transport.reply_address,
+            receiver=self.config.name,
+            content=to_jsonable_python(input_data),
+            message_type="request",
+            correlation_id=input_data.get("correlation_id"),
+            deadline=deadline.current(),
+        )
+        started = time.perf_counter()
+        reply = await self.transport.request(message, timeout=deadline.bounded(self.config.timeout))
+        AGENT_BUS_REQUEST_SECONDS.labels(agent=self.config.name).observe(time.perf_counter() - started)
+        if not reply.content.get("ok"):
+            raise RemoteAgentError(f"{self.config.name}: {reply.content.get('error_type')}: {reply.content.get('error')}")
+        result = reply.content.get("result")
+        if self.remote_result_model is not None and result is not None:
+            return self.remote_result_model.model_validate(result)
+        return result
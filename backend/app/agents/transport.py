@@ -0,0 +1,232 @@
+"""Agent message transports: in-process queues and Redis Streams.
+
+Messages are routed by ``AgentMessage.receiver``. Each agent name has an inbox and
+every worker serving that agent joins the inbox's consumer group (named after the
+agent), so a pool of workers shares the inbox and a crashed worker's unacknowledged
+messages are reclaimed by the others. ``request`` stamps a fresh request id and the
+sender's reply address; the reply resolves the future waiting on that request id. The
+correlation id only traces the plan, and parallel steps of one plan share it.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import orjson
+import structlog
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from app.agents.base_agent import AgentMessage
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+INBOX_PREFIX = "agents:inbox:"
+REPLY_PREFIX = "agents:replies:"
+REPLY_TTL = 3600
+
+
+def node_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass(frozen=True)
+class Delivery:
+    message: AgentMessage
+    id: str
+    agent: str
+
+
+class Transport(ABC):
+    """Routes messages by receiver and correlates request/reply pairs."""
+
+    def __init__(self) -> None:
+        self.reply_address = f"{REPLY_PREFIX}{node_name()}-{uuid.uuid4().hex[:8]}"
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    @abstractmethod
+    async def send(self, message: AgentMessage) -> None: ...
+
+    @abstractmethod
+    async def receive(self, agent: str, consumer: str, count: int = 1, block: float = 1.0) -> List[Delivery]:
+        """Up to ``count`` messages for ``agent``, waiting at most ``block`` seconds."""
+
+    @abstractmethod
+    async def ack(self, delivery: Delivery) -> None: ...
+
+    async def _listen_for_replies(self) -> None:
+        """Start whatever delivers messages addressed to ``reply_address``; idempotent."""
+
+    def _resolve(self, message: AgentMessage) -> None:
+        future = self._pending.get(message.request_id or "")
+        if future is not None and not future.done():
+            future.set_result(message)
+
+    async def request(self, message: AgentMessage, timeout: float) -> AgentMessage:
+        request_id = str(uuid.uuid4())
+        message = message.model_copy(update={"request_id": request_id, "reply_to": self.reply_address})
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._listen_for_replies()
+            await self.send(message)
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def reply(self, request: AgentMessage, content: Dict[str, Any]) -> None:
+        if not request.reply_to:
+            return
+        await self.send(
+            AgentMessage(
+                sender=request.receiver,
+                receiver=request.reply_to,
+                content=content,
+                message_type="reply",
+                correlation_id=request.correlation_id,
+                request_id=request.request_id,
+            )
+        )
+
+    async def close(self) -> None:
+        return None
+
+
+class InProcessTransport(Transport):
+    """Queues in the current event loop; for tests and single-process deployments."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.inboxes: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._sequence = 0
+
+    async def send(self, message: AgentMessage) -> None:
+        if message.receiver == self.reply_address:
+            self._resolve(message)
+            return
+        self._sequence += 1
+        await self.inboxes[message.receiver].put(Delivery(message, str(self._sequence), message.receiver))
+
+    async def receive(self, agent: str, consumer: str, count: int = 1, block: float = 1.0) -> List[Delivery]:
+        inbox = self.inboxes[agent]
+        try:
+            deliveries = [await asyncio.wait_for(inbox.get(), timeout=block)]
+        except asyncio.TimeoutError:
+            return []
+        while len(deliveries) < count and not inbox.empty():
+            deliveries.append(inbox.get_nowait())
+        return deliveries
+
+    async def ack(self, delivery: Delivery) -> None:
+        return None
+
+
+class RedisStreamsTransport(Transport):
+    """One stream per agent inbox with a consumer group per agent name.
+
+    Replies go to a stream per requesting process, read by a background task. Redis
+    clients are bound to an event loop, so client and reply reader are recreated when
+    the running loop changes (each Celery task runs its own ``asyncio.run``).
+    """
+
+    def __init__(self, url: Optional[str] = None) -> None:
+        super().__init__()
+        self.url = url or settings.agent_bus_url or settings.redis_url
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis: Optional[Redis] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._groups: set = set()
+
+    def _client(self) -> Redis:
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._loop = loop
+            self._redis = Redis.from_url(self.url)
+            self._reader = None
+        return self._redis
+
+    @staticmethod
+    def stream(receiver: str) -> str:
+        return receiver if receiver.startswith(REPLY_PREFIX) else f"{INBOX_PREFIX}{receiver}"
+
+    @staticmethod
+    def encode(message: AgentMessage) -> Dict[str, bytes]:
+        return {"json": orjson.dumps(message.model_dump())}
+
+    @staticmethod
+    def decode(fields: Dict[bytes, bytes]) -> AgentMessage:
+        return AgentMessage.model_validate(orjson.loads(fields[b"json"]))
+
+    async def send(self, message: AgentMessage) -> None:
+        client = self._client()
+        stream = self.stream(message.receiver)
+        await client.xadd(stream, self.encode(message), maxlen=settings.agent_bus_maxlen, approximate=True)
+        if stream.startswith(REPLY_PREFIX):
+            await client.expire(stream, REPLY_TTL)
+
+    async def _ensure_group(self, client: Redis, stream: str, group: str) -> None:
+        if (stream, group) in self._groups:
+            return
+        try:
+            await client.xgroup_create(stream, group, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._groups.add((stream, group))
+
+    async def receive(self, agent: str, consumer: str, count: int = 1, block: float = 1.0) -> List[Delivery]:
+        client = self._client()
+        stream = self.stream(agent)
+        await self._ensure_group(client, stream, agent)
+        # Messages a dead consumer read but never acknowledged come first.
+        claimed = await client.xautoclaim(
+            stream, agent, consumer, min_idle_time=int(settings.agent_bus_claim_idle * 1000), start_id="0-0", count=count
+        )
+        entries = [entry for entry in claimed[1] if entry and entry[1]]
+        if not entries:
+            response = await client.xreadgroup(agent, consumer, {stream: ">"}, count=count, block=int(block * 1000))
+            entries = [entry for _, batch in response or [] for entry in batch]
+        return [Delivery(self.decode(fields), entry_id.decode(), agent) for entry_id, fields in entries]
+
+    async def ack(self, delivery: Delivery) -> None:
+        await self._client().xack(self.stream(delivery.agent), delivery.agent, delivery.id)
+
+    async def _listen_for_replies(self) -> None:
+        client = self._client()
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_replies(client))
+
+    async def _read_replies(self, client: Redis) -> None:
+        last_id = "0-0"
+        while True:
+            try:
+                response = await client.xread({self.reply_address: last_id}, block=1000, count=50)
+                for _, entries in response or []:
+                    for entry_id, fields in entries:
+                        last_id = entry_id
+                        self._resolve(self.decode(fields))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pragma: no cover - keep reading
+                logger.warning("agent_bus_reply_reader_failed", error=str(exc))
+                await asyncio.sleep(1)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = None
+
+
+@lru_cache(maxsize=1)
+def get_transport() -> Transport:
+    """Process-wide transport chosen by ``settings.agent_bus``."""
+    return InProcessTransport() if settings.agent_bus == "memory" else RedisStreamsTransport()
@@ -0,0 +1,67 @@
+"""Serve one agent from the message bus, as its own horizontally scaled pool.
+
+    python -m app.agents.worker clinical_safety --concurrency 8
+
+Every process started for an agent joins that agent's consumer group, so scaling
+the pool is running more processes; ``--concurrency`` bounds messages in flight
+per process. Route the orchestrator to the pool with ``AGENT_REMOTE``.
+"""
+
+import argparse
+import asyncio
+from typing import Dict, List, Optional, Tuple, Type
+
+import structlog
+
+from app.agents.base_agent import AgentConfig, BaseAgent
+from app.agents.behavior_coach_agent import BehaviorCoachAgent
+from app.agents.clinical_safety_agent import ClinicalSafetyAgent
+from app.agents.meal_log_agent import MealLogAgent
+from app.agents.nutrition_plan_agent import NutritionPlanAgent
+from app.agents.transport import RedisStreamsTransport, node_name
+from app.core.config import settings
+from app.core.logging import configure_logging
+from app.core.metrics import serve_metrics
+from app.core.resources import resources
+from app.core.tracing import configure_tracing
+
+logger = structlog.get_logger()
+
+AGENT_TYPES: Dict[str, Tuple[Type[BaseAgent], str]] = {
+    "nutrition_plan": (NutritionPlanAgent, "Generate plan"),
+    "clinical_safety": (ClinicalSafetyAgent, "Safety check"),
+    "behavior_coach": (BehaviorCoachAgent, "Adherence tips"),
+    "meal_log": (MealLogAgent, "Parse meal logs"),
+}
+
+
+def build_agent(name: str) -> BaseAgent:
+    cls, description = AGENT_TYPES[name]
+    return cls(AgentConfig(name=name, description=description, hedge=settings.agent_hedging_enabled))
+
+
+async def serve(name: str, concurrency: int) -> None:
+    agent = build_agent(name)
+    transport = RedisStreamsTransport()
+    await resources.warmup()
+    logger.info("agent_worker_started", agent=name, concurrency=concurrency)
+    try:
+        await agent.serve(transport, node_name(), concurrency)
+    finally:
+        await transport.close()
+        await resources.shutdown()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("agent", choices=sorted(AGENT_TYPES))
+    parser.add_argument("--concurrency", type=int, default=settings.agent_worker_concurrency)
+    args = parser.parse_args(argv)
+    configure_logging()
+    configure_tracing(f"mas-agent-{args.agent}")
+    serve_metrics(settings.prometheus_port)
+    asyncio.run(serve(args.agent, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
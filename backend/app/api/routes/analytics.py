@@ -0,0 +1,48 @@
+import asyncio
+from dataclasses import asdict
+from datetime import date
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.core.security import get_current_user
+from app.schemas.analytics import CohortStatsOut
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/cohort", response_model=CohortStatsOut)
+async def cohort(
+    start: date,
+    end: date,
+    grain: Literal["plans", "days", "meals", "logs"] = "days",
+    metric: str = "calories",
+    condition: List[str] = Query(default=[], description="clinical.medicalConditions entries; all must match."),
+    medication: List[str] = Query(default=[], description="clinical.medications entries; all must match."),
+    goal: Optional[str] = Query(default=None, description="goals.primary"),
+    activity_level: Optional[str] = Query(default=None, description="lifestyle.activityLevel"),
+    language: Optional[str] = None,
+    user=Depends(get_current_user),
+) -> CohortStatsOut:
+    """Aggregate a metric over a cohort from the Parquet export; Postgres is not queried."""
+    # pyarrow loads with the first analytics request, not when the API starts.
+    from app.services import analytics
+
+    if end < start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end is before start")
+    query = analytics.CohortQuery(
+        grain=grain,
+        metric=metric,
+        start=start,
+        end=end,
+        conditions=tuple(condition),
+        medications=tuple(medication),
+        goal=goal,
+        activity_level=activity_level,
+        language=language,
+    )
+    try:
+        stats = await asyncio.to_thread(analytics.cohort_stats, query)
+    except analytics.UnknownMetric as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return CohortStatsOut.model_validate(asdict(stats))
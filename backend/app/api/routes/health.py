@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
+
+from app.core.resources import resources
 
 router = APIRouter(tags=["health"])
 
@@ -6,3 +8,14 @@ router = APIRouter(tags=["health"])
 @router.get("/health")
 async def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(response: Response) -> dict[str, str]:
+    """503 until the connection pools are warm, and again once shutdown starts draining."""
+    if not resources.ready and not resources.closing:
+        await resources.warmup()
+    if not resources.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "draining" if resources.closing else "warming"}
+    return {"status": "ready"}
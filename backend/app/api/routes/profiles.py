@@ -1,44 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import http_cache
 from app.core.database import get_session
+from app.core.resources import resources
 from app.core.security import get_current_user
 from app.schemas.plan import UserProfile, WeeklyPlan
-from app.schemas.profile import MealLogIn, MealLogOut, ProfileOut, ProfileCreate, ReportOut, PlanOut
-from app.services.profile_service import ProfileService
+from app.models.profile import PROFILE_METRIC_COLUMNS, Profile
+from app.schemas.profile import (
+    MealLogIn,
+    MealLogOut,
+    PlanOut,
+    ProfileCreate,
+    ProfileMetrics,
+    ProfileOut,
+    ProfileSummary,
+    ReportOut,
+)
+from app.services.agent_memory import entry_calories, memory_store
+from app.services.profile_service import InvalidCursor, ProfileFilters, ProfileService, encode_cursor
 
 router = APIRouter(prefix="/profiles", tags=["profiles"])
 
 
+def profile_out(profile: Profile) -> ProfileOut:
+    """The stored payload plus its derived metrics; blank ``bmr``/``tdee`` are filled from them."""
+    metrics = None
+    data = profile.data
+    if profile.metrics_version is not None:
+        metrics = ProfileMetrics(
+            **{field: getattr(profile, column) for field, column in PROFILE_METRIC_COLUMNS.items()},
+            version=profile.metrics_version,
+        )
+        data = {**data, "bmr": data.get("bmr") or metrics.bmr, "tdee": data.get("tdee") or metrics.tdee}
+    return ProfileOut(
+        id=profile.id,
+        name=profile.name,
+        language=profile.language,
+        data=data,
+        metrics=metrics,
+        created_at=profile.created_at,
+        updated_at=profile.updated_at,
+    )
+
+
 @router.post("", response_model=ProfileOut, status_code=status.HTTP_201_CREATED)
 async def create_profile(payload: ProfileCreate, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     service = ProfileService(session)
     db_obj = await service.create_profile(payload.profile)
-    return ProfileOut(
-        id=db_obj.id,
-        name=db_obj.name,
-        language=db_obj.language,
-        data=db_obj.data,
-        created_at=db_obj.created_at,
-        updated_at=db_obj.updated_at,
-    )
+    return profile_out(db_obj)
 
 
-@router.get("", response_model=list[ProfileOut])
-async def list_profiles(session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+@router.get("", response_model=list[Union[ProfileOut, ProfileSummary]])
+async def list_profiles(
+    response: Response,
+    language: Optional[str] = None,
+    condition: List[str] = Query(default=[], description="clinical.medicalConditions entries; all must match."),
+    medication: List[str] = Query(default=[], description="clinical.medications entries; all must match."),
+    goal: Optional[str] = Query(default=None, description="goals.primary"),
+    activity_level: Optional[str] = Query(default=None, description="lifestyle.activityLevel"),
+    min_bmi: Optional[float] = Query(default=None, ge=0),
+    max_bmi: Optional[float] = Query(default=None, ge=0),
+    min_calories: Optional[float] = Query(default=None, ge=0, description="Derived daily calorie target."),
+    max_calories: Optional[float] = Query(default=None, ge=0, description="Derived daily calorie target."),
+    limit: int = Query(default=50, ge=1, le=500),
+    after: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page."),
+    slim: bool = Query(default=False, description="Leave out the profile data."),
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """Filtered profiles, newest first, one keyset page at a time.
+
+    A full page carries ``X-Next-Cursor``; pass it back as ``after`` for the next one.
+    """
     service = ProfileService(session)
-    profiles = await service.list_profiles()
-    return [
-        ProfileOut(
-            id=p.id,
-            name=p.name,
-            language=p.language,
-            data=p.data,
-            created_at=p.created_at,
-            updated_at=p.updated_at,
-        )
-        for p in profiles
-    ]
+    filters = ProfileFilters(
+        language, tuple(condition), tuple(medication), goal, activity_level, min_bmi, max_bmi, min_calories, max_calories
+    )
+    try:
+        profiles = await service.list_profiles(filters, limit=limit, after=after, slim=slim)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if len(profiles) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(profiles[-1])
+    if slim:
+        return [
+            ProfileSummary(id=p.id, name=p.name, language=p.language, created_at=p.created_at, updated_at=p.updated_at)
+            for p in profiles
+        ]
+    return [profile_out(p) for p in profiles]
 
 
 @router.get("/{profile_id}", response_model=ProfileOut)
@@ -47,14 +99,7 @@ async def get_profile(profile_id: str, session: AsyncSession = Depends(get_sessi
     db_obj = await service.get_profile(profile_id)
     if not db_obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
-    return ProfileOut(
-        id=db_obj.id,
-        name=db_obj.name,
-        language=db_obj.language,
-        data=db_obj.data,
-        created_at=db_obj.created_at,
-        updated_at=db_obj.updated_at,
-    )
+    return profile_out(db_obj)
 
 
 @router.put("/{profile_id}", response_model=ProfileOut)
@@ -65,14 +110,7 @@ async def update_profile(
     db_obj = await service.update_profile(profile_id, payload.profile)
     if not db_obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
-    return ProfileOut(
-        id=db_obj.id,
-        name=db_obj.name,
-        language=db_obj.language,
-        data=db_obj.data,
-        created_at=db_obj.created_at,
-        updated_at=db_obj.updated_at,
-    )
+    return profile_out(db_obj)
 
 
 @router.delete("/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -92,6 +130,10 @@ async def add_log(
 ):
     service = ProfileService(session)
     log = await service.add_log(profile_id, payload.entry)
+    calories = entry_calories(log.entry)
+    if calories:
+        # Off the request path; shutdown drains it.
+        resources.track(memory_store.update(profile_id, lambda memory: memory.record_meal(calories, log.logged_at.date())))
     return MealLogOut(id=log.id, entry=log.entry, logged_at=log.logged_at)
 
 
@@ -103,32 +145,117 @@ async def list_logs(profile_id: str, session: AsyncSession = Depends(get_session
 
 
 @router.get("/{profile_id}/reports/latest", response_model=ReportOut)
-async def latest_report(profile_id: str, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+async def latest_report(
+    profile_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
     service = ProfileService(session)
-    report = await service.latest_report(profile_id)
+    report = await service.latest_report(profile_id, content=False)
     if not report:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+    cached = http_cache.not_modified(request, response, http_cache.etag(report.id, report.content_hash), http_cache.REVALIDATE)
+    if cached:
+        return cached
+    await service.load_content(report)
     return ReportOut(id=report.id, report=report.report, created_at=report.created_at)
 
 
 @router.get("/{profile_id}/reports", response_model=list[ReportOut])
-async def list_reports(profile_id: str, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+async def list_reports(
+    profile_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
     service = ProfileService(session)
+    versions = await service.list_reports(profile_id, content=False)
+    tag = http_cache.collection_etag((r.id, r.content_hash) for r in versions)
+    cached = http_cache.not_modified(request, response, tag, http_cache.REVALIDATE)
+    if cached:
+        return cached
     reports = await service.list_reports(profile_id)
     return [ReportOut(id=r.id, report=r.report, created_at=r.created_at) for r in reports]
 
 
 @router.get("/{profile_id}/plans/latest", response_model=PlanOut)
-async def latest_plan(profile_id: str, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+async def latest_plan(
+    profile_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
     service = ProfileService(session)
-    plan = await service.latest_plan(profile_id)
+    plan = await service.latest_plan(profile_id, content=False)
     if not plan:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found")
-    return PlanOut(id=plan.id, plan=WeeklyPlan.model_validate(plan.plan), created_at=plan.created_at)
+    await service.serve_plan(plan)
+    cached = http_cache.not_modified(request, response, http_cache.etag(plan.id, plan.content_hash), http_cache.REVALIDATE)
+    if cached:
+        return cached
+    await service.load_content(plan)
+    return PlanOut(id=plan.id, plan=WeeklyPlan.model_validate(plan.plan), created_at=plan.created_at, source=plan.source)
 
 
 @router.get("/{profile_id}/plans", response_model=list[PlanOut])
-async def list_plans(profile_id: str, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+async def list_plans(
+    profile_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
     service = ProfileService(session)
+    versions = await service.list_plans(profile_id, content=False)
+    tag = http_cache.collection_etag((p.id, p.content_hash) for p in versions)
+    cached = http_cache.not_modified(request, response, tag, http_cache.REVALIDATE)
+    if cached:
+        return cached
     plans = await service.list_plans(profile_id)
-    return [PlanOut(id=p.id, plan=WeeklyPlan.model_validate(p.plan), created_at=p.created_at) for p in plans]
+    return [PlanOut(id=p.id, plan=WeeklyPlan.model_validate(p.plan), created_at=p.created_at, source=p.source) for p in plans]
+
+
+@router.get("/{profile_id}/plans/{plan_id}", response_model=PlanOut)
+async def get_plan(
+    profile_id: str,
+    plan_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """A stored plan by id; it never changes, so clients may cache it indefinitely."""
+    service = ProfileService(session)
+    plan = await service.get_plan(profile_id, plan_id, content=False)
+    if not plan:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found")
+    cached = http_cache.not_modified(request, response, http_cache.etag(plan.id, plan.content_hash), http_cache.IMMUTABLE)
+    if cached:
+        return cached
+    await service.load_content(plan)
+    return PlanOut(id=plan.id, plan=WeeklyPlan.model_validate(plan.plan), created_at=plan.created_at, source=plan.source)
+
+
+@router.get("/{profile_id}/reports/{report_id}", response_model=ReportOut)
+async def get_report(
+    profile_id: str,
+    report_id: str,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user),
+):
+    """A stored report by id; immutable like plans."""
+    service = ProfileService(session)
+    report = await service.get_report(profile_id, report_id, content=False)
+    if not report:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Report not found")
+    cached = http_cache.not_modified(request, response, http_cache.etag(report.id, report.content_hash), http_cache.IMMUTABLE)
+    if cached:
+        return cached
+    await service.load_content(report)
+    return ReportOut(id=report.id, report=report.report, created_at=report.created_at)
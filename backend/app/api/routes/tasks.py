@@ -1,23 +1,33 @@
+import time
 import uuid
-from fastapi import APIRouter, HTTPException, Depends
-from celery.result import AsyncResult
 
-from app.tasks.agent_tasks import generate_plan_task
+import structlog
+from fastapi import APIRouter, HTTPException, Depends, status
+
 from app.schemas.plan import PlanRequest, PlanTaskResponse
 from app.services.profile_service import ProfileService
 from app.schemas.plan import WeeklyPlan, ClinicalReport
 from app.core.database import get_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import get_current_user
-from app.agents.registry import AgentRegistry
-from app.agents.orchestrator import OrchestratorAgent
-from app.agents.nutrition_plan_agent import NutritionPlanAgent
-from app.agents.clinical_safety_agent import ClinicalSafetyAgent
-from app.agents.meal_log_agent import MealLogAgent
-from app.agents.base_agent import AgentConfig
+from app.services.scheduling import AdmissionRejected, scheduler
+from app.services import llm_usage
+from app.core.config import settings
+from app.core.resources import resources
+from app.core.tracing import inject_headers, tracer
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
+# Sent by name: the API never imports the agent stack (LangGraph, Gemini) behind it.
+PLAN_TASK = "agent.generate_plan"
+
+
+def _celery():
+    """Celery loads on the first enqueue or status check, not when the API starts."""
+    from app.core.celery_app import celery_app
+
+    return celery_app
+
 
 @router.post("/plan", response_model=PlanTaskResponse)
 async def enqueue_plan(
@@ -25,20 +35,94 @@ async def enqueue_plan(
     session: AsyncSession = Depends(get_session),
     user=Depends(get_current_user),
 ) -> PlanTaskResponse:
-    """Enqueue plan generation via Celery worker."""
+    """Enqueue plan generation via Celery worker, routed to a fair-share priority lane.
+
+    A plan precomputed off-peak that still fits the profile is returned at once instead.
+    Tenants or profiles over their daily LLM budget are rejected or downgraded to a
+    smaller model or the local engine (``settings.llm_budget_action``) before queueing.
+    """
     correlation_id = request.correlation_id or str(uuid.uuid4())
-    payload = request.model_copy(update={"correlation_id": correlation_id}).model_dump()
-    task = generate_plan_task.delay(payload)
+    tenant_id = user["sub"]
+    if settings.precompute_enabled and not request.replan:
+        service = ProfileService(session)
+        ready = await service.ready_plan(request.profile.id, request.profile)
+        if ready is not None:
+            await service.serve_plan(ready)
+            report = await service.latest_report(request.profile.id)
+            return PlanTaskResponse(
+                task_id=ready.id,
+                status="success",
+                correlation_id=correlation_id,
+                plan=WeeklyPlan.model_validate(ready.plan),
+                clinical_report=ClinicalReport.model_validate(report.report) if report else None,
+            )
+    with (
+        structlog.contextvars.bound_contextvars(correlation_id=correlation_id),
+        tracer.start_as_current_span("api.enqueue_plan") as span,
+    ):
+        span.set_attribute("correlation_id", correlation_id)
+        span.set_attribute("tenant_id", tenant_id)
+        budget = await llm_usage.check_budget(resources.redis, tenant_id, request.profile.id)
+        span.set_attribute("llm_budget", budget.action)
+        if budget.action == "reject":
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"LLM budget exhausted ({budget.reason}); retry later",
+                headers={"Retry-After": str(budget.retry_after)},
+            )
+        # The Celery task id doubles as the admission slot the worker releases.
+        job_id = str(uuid.uuid4())
+        try:
+            admission = await scheduler.admit(tenant_id, request.priority, job_id)
+        except AdmissionRejected as exc:
+            span.set_attribute("admission.rejected", True)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Plan queue is full ({exc.lane}); retry later",
+                headers={"Retry-After": str(exc.retry_after)},
+            ) from exc
+        span.set_attribute("queue", admission.queue)
+        span.set_attribute("priority", admission.priority)
+        seconds = settings.plan_deadline_interactive if admission.lane == "interactive" else settings.plan_deadline_batch
+        payload = request.model_copy(
+            update={
+                "correlation_id": correlation_id,
+                "tenant_id": tenant_id,
+                "priority": admission.lane,
+                "deadline": time.time() + seconds if seconds else None,
+                "source": "request",
+                "engine": budget.engine,
+                "llm_model": budget.model,
+            }
+        ).model_dump()
+        task = _celery().send_task(
+            PLAN_TASK,
+            args=[payload],
+            task_id=job_id,
+            queue=admission.queue,
+            priority=admission.priority,
+            headers=inject_headers(),
+        )
     return PlanTaskResponse(task_id=task.id, correlation_id=correlation_id)
 
 
 @router.get("/plan/{task_id}", response_model=PlanTaskResponse)
 async def plan_status(task_id: str, session: AsyncSession = Depends(get_session), user=Depends(get_current_user)) -> PlanTaskResponse:
     """Check status of a plan generation task."""
-    result = AsyncResult(task_id)
+    result = _celery().AsyncResult(task_id)
     if result is None:
         raise HTTPException(status_code=404, detail="Task not found")
     if result.successful():
         data = result.result or {}
         return PlanTaskResponse.model_validate(data)
     return PlanTaskResponse(task_id=task_id, status=result.status.lower())
+
+
+@router.get("/usage")
+async def usage(user=Depends(get_current_user)) -> dict:
+    """The caller's Gemini usage today (UTC) and the daily budgets it counts against."""
+    return {
+        "tenant_id": user["sub"],
+        "usage": await llm_usage.usage_today(resources.redis, "tenant", user["sub"]),
+        "budget": {"tokens": settings.llm_budget_tenant_tokens, "seconds": settings.llm_budget_tenant_seconds},
+    }
@@ -1,11 +1,12 @@
 import asyncio
+import time
 from typing import Dict, List
 
 import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from redis.asyncio import Redis
 
-from app.core.config import settings
+from app.core.metrics import WS_ACTIVE, WS_BROADCAST_LAG
+from app.core.resources import resources
 
 router = APIRouter(tags=["ws"])
 
@@ -14,17 +15,22 @@ class ConnectionManager:
     def __init__(self) -> None:
         self.active: List[WebSocket] = []
         self._listener_task: asyncio.Task | None = None
-        self.redis: Redis = Redis.from_url(settings.redis_url)
+
+    async def close(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
 
     async def connect(self, websocket: WebSocket) -> None:
         await websocket.accept()
         self.active.append(websocket)
+        WS_ACTIVE.inc()
         if not self._listener_task or self._listener_task.done():
             self._listener_task = asyncio.create_task(self._stream_listener())
 
     def disconnect(self, websocket: WebSocket) -> None:
         if websocket in self.active:
             self.active.remove(websocket)
+            WS_ACTIVE.dec()
 
     async def broadcast(self, message: Dict) -> None:
         dead = []
@@ -40,7 +46,7 @@ class ConnectionManager:
         last_id = "0-0"
         while True:
             try:
-                streams = await self.redis.xread({"agent:events": last_id}, block=1000, count=10)
+                streams = await resources.redis.xread({"agent:events": last_id}, block=1000, count=10)
                 if not streams:
                     await asyncio.sleep(0.1)
                     continue
@@ -50,6 +56,8 @@ class ConnectionManager:
                         if b"json" in data:
                             payload = orjson.loads(data[b"json"])
                             await self.broadcast(payload)
+                            if isinstance(payload.get("timestamp"), (int, float)):
+                                WS_BROADCAST_LAG.observe(max(time.time() - payload["timestamp"], 0.0))
             except Exception:  # pragma: no cover - keep running
                 await asyncio.sleep(1)
 
@@ -1,17 +1,64 @@
+import os
+
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
 
 from app.core.config import settings
+from app.core.logging import configure_logging
+from app.core.metrics import mark_process_dead, serve_metrics
+from app.core.resources import resources
+from app.core.tracing import configure_tracing
 
 celery_app = Celery(
     "mas",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
+    include=["app.tasks.agent_tasks", "app.tasks.analytics_tasks", "app.tasks.profile_tasks"],
 )
 
 celery_app.conf.task_routes = {
-    "agent.generate_plan": {"queue": "agents"},
+    "agent.generate_plan": {"queue": settings.plan_queue_interactive},
+    "agent.precompute_plans": {"queue": "default"},
+    "analytics.export": {"queue": "default"},
+    "profiles.recompute_metrics": {"queue": "default"},
     "app.tasks.ingest.*": {"queue": "ingest"},
     "app.tasks.*": {"queue": "default"},
 }
 
+# Redis emulates priorities with one list per step ("<queue>:<step>"); 0 is served first.
+# Prefetching a single message keeps a worker from hoarding low-priority jobs.
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+celery_app.conf.task_default_priority = 5
+celery_app.conf.worker_prefetch_multiplier = 1
+
+# Run by `celery beat`; the task itself does nothing outside the off-peak window.
+celery_app.conf.beat_schedule = {
+    "precompute-plans": {"task": "agent.precompute_plans", "schedule": settings.precompute_interval},
+    "analytics-export": {"task": "analytics.export", "schedule": settings.analytics_export_interval},
+    "recompute-profile-metrics": {"task": "profiles.recompute_metrics", "schedule": settings.metrics_recompute_interval},
+}
+
 celery_app.autodiscover_tasks(["app.tasks"])
+
+
+@worker_init.connect
+def _init_worker_metrics(**_kwargs) -> None:
+    # Main worker process: aggregates the pool's children from PROMETHEUS_MULTIPROC_DIR.
+    serve_metrics(settings.prometheus_port)
+
+
+@worker_process_init.connect
+def _init_worker(**_kwargs) -> None:
+    configure_logging()
+    configure_tracing("mas-worker")
+    resources.start_worker()
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker(pid: int | None = None, **_kwargs) -> None:
+    resources.stop_worker()
+    mark_process_dead(pid or os.getpid())
@@ -0,0 +1,107 @@
+"""Negotiated response compression: zstd, brotli or gzip.
+
+Only complete (non-streaming) bodies of at least ``settings.compression_min_size``
+bytes are compressed. brotli and zstd are used when their packages are installed;
+gzip always is. Strong ETags get an encoding suffix so each representation keeps a
+distinct validator (``app.core.http_cache`` strips it when comparing).
+"""
+
+import gzip
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = zstandard.ZstdCompressor(level=3).compress
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=4)
+ENCODERS["gzip"] = lambda body: gzip.compress(body, compresslevel=6)
+
+SUFFIXES = {"zstd": "-zstd", "br": "-br", "gzip": "-gzip"}
+SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def negotiate(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """Best encoding the client accepts, by its q-values then by ``available`` order."""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    ranked: List[Tuple[float, int, str]] = []
+    for rank, name in enumerate(available):
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > 0:
+            ranked.append((-q, rank, name))
+    return min(ranked)[2] if ranked else None
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None) -> None:
+        self.app = app
+        self.minimum_size = settings.compression_min_size if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""), list(ENCODERS))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            if (
+                message.get("more_body")
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or headers.get("content-type", "").startswith(SKIP_TYPES)
+            ):
+                # Streaming, small or already encoded bodies go out untouched.
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            body = ENCODERS[encoding](body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            tag = headers.get("etag")
+            if tag and tag.endswith('"') and not tag.startswith("W/"):
+                headers["ETag"] = f'{tag[:-1]}{SUFFIXES[encoding]}"'
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
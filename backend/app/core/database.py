@@ -1,9 +1,9 @@
 from typing import AsyncIterator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeBase, declared_attr
 
-from app.core.config import settings
+from app.core.resources import resources
 
 
 class Base(DeclarativeBase):
@@ -14,10 +14,7 @@ class Base(DeclarativeBase):
         return cls.__name__.lower()
 
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
-
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async with AsyncSessionLocal() as session:
+    """Request-scoped session on the process's pooled engine."""
+    async with resources.session() as session:
         yield session
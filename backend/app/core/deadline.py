@@ -0,0 +1,52 @@
+"""End-to-end request deadline carried in a context variable.
+
+The API stamps an absolute (epoch) deadline on the plan request, the Celery task
+enters it with ``deadline_scope`` and every coroutine, task and ``to_thread`` call
+below inherits it, so agents and Gemini retries can size timeouts and backoff to
+the time actually left.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request's deadline has passed before work could start."""
+
+
+def current() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, never negative; None when no deadline is set."""
+    at = _deadline.get()
+    return None if at is None else max(at - time.time(), 0.0)
+
+
+def bounded(timeout: float) -> float:
+    """``timeout`` capped by the time left."""
+    left = remaining()
+    return timeout if left is None else min(timeout, left)
+
+
+def check(what: str = "request") -> None:
+    if remaining() == 0.0:
+        raise DeadlineExceeded(f"Deadline passed before {what}")
+
+
+@contextmanager
+def deadline_scope(at: Optional[float]) -> Iterator[None]:
+    """Run the block under an absolute epoch deadline; an outer, earlier deadline wins."""
+    outer = _deadline.get()
+    if at is not None and outer is not None:
+        at = min(at, outer)
+    token = _deadline.set(at if at is not None else outer)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
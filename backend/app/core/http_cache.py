@@ -0,0 +1,58 @@
+"""Strong ETags and conditional GET for stored plans and reports.
+
+Plan and report rows never change after insert, so an ETag built from the row id and
+the hash of its content stays valid forever. Routes compute it from those two
+columns alone and answer ``If-None-Match`` with 304 before the JSONB is loaded.
+"""
+
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response, status
+
+# By-id documents never change; listings and "latest" must be revalidated.
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+# Suffixes the compression middleware adds to ETags of encoded representations.
+ENCODING_SUFFIXES = ("-zstd", "-br", "-gzip")
+
+
+def content_hash(document: dict) -> str:
+    return hashlib.sha256(orjson.dumps(document, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def etag(entity_id: str, digest: Optional[str]) -> str:
+    return f'"{entity_id}-{(digest or "")[:16]}"'
+
+
+def collection_etag(versions: Iterable[Tuple[str, Optional[str]]]) -> str:
+    """One ETag over an ordered listing of (id, content hash) pairs."""
+    digest = hashlib.sha256("\n".join(f"{i}:{h or ''}" for i, h in versions).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def matches(if_none_match: Optional[str], tag: str) -> bool:
+    """Weak comparison, as RFC 9110 prescribes for If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque(candidate) == tag for candidate in if_none_match.split(","))
+
+
+def not_modified(request: Request, response: Response, tag: str, cache_control: str) -> Optional[Response]:
+    """Tag the response; return a 304 to send instead when the client already has ``tag``."""
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = cache_control
+    if matches(request.headers.get("if-none-match"), tag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": tag, "Cache-Control": cache_control})
+    return None
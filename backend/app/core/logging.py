@@ -1,24 +1,161 @@
+"""Structured JSON logging that stays off the event loop.
+
+Events render to bytes with orjson and go onto a bounded queue; a daemon thread
+writes them to stdout in batches, so a log call never waits on the terminal or the
+container runtime. When the queue is full the record is dropped and counted.
+
+High-frequency events are sampled per event name (``settings.log_sample_rates``).
+Sampling keys on the bound correlation id, so a request's events are kept or dropped
+together. Warnings and errors are never sampled.
+"""
+
+import atexit
 import logging
+import os
+import queue
+import random
 import sys
-from typing import Optional
+import threading
+import zlib
+from typing import Any, BinaryIO, Dict, List, Optional
 
+import orjson
 import structlog
 
+from app.core.config import settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+from app.core.tracing import add_trace_context
+
+BATCH_SIZE = 256
+_ALWAYS_KEPT = {"warning", "error", "critical", "exception"}
+
+
+def _serialize(event_dict: Dict[str, Any], **kwargs: Any) -> bytes:
+    return orjson.dumps(event_dict, default=kwargs.get("default", str))
+
+
+class EventSampler:
+    """structlog processor keeping ``rate`` of each sampled event name."""
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = {name: min(max(rate, 0.0), 1.0) for name, rate in rates.items() if rate < 1.0}
+
+    def __call__(self, _logger: Any, method: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is None or method in _ALWAYS_KEPT:
+            return event_dict
+        correlation_id = event_dict.get("correlation_id")
+        draw = zlib.crc32(correlation_id.encode()) / 0xFFFFFFFF if correlation_id else random.random()
+        if draw >= rate:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+class QueuedWriter:
+    """Thread-backed sink for rendered log lines; ``write`` never blocks.
+
+    The thread is started on first write in each process, so forked Celery workers
+    get their own.
+    """
+
+    def __init__(self, stream: Optional[BinaryIO] = None, maxsize: int = 10000):
+        self.stream = stream
+        self.queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=maxsize)
+        self._pid: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.queue.maxsize)
+            self._thread = threading.Thread(target=self._drain, name="log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def write(self, line: bytes) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def _drain(self) -> None:
+        stream = self.stream or sys.stdout.buffer
+        while True:
+            line = self.queue.get()
+            batch: List[bytes] = []
+            while line is not None:
+                batch.append(line)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                stream.write(b"\n".join(batch) + b"\n")
+                stream.flush()
+            if line is None:
+                return
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush what is queued; called at exit."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.queue.put(None)
+        self._thread.join(timeout)
+        self._pid = None
+
+
+class QueuedLogger:
+    """structlog logger handing rendered events to a ``QueuedWriter``."""
+
+    def __init__(self, writer: QueuedWriter):
+        self._writer = writer
+
+    def msg(self, message: bytes) -> None:
+        self._writer.write(message)
+
+    log = debug = info = warn = warning = error = critical = exception = fatal = msg
+
+
+class QueuedLoggerFactory:
+    def __init__(self, writer: QueuedWriter):
+        self._logger = QueuedLogger(writer)
+
+    def __call__(self, *_args: Any) -> QueuedLogger:
+        return self._logger
+
+
+def build_processors(sample_rates: Optional[Dict[str, float]] = None) -> list:
+    processors: list = [structlog.contextvars.merge_contextvars]
+    if sample_rates:
+        processors.append(EventSampler(sample_rates))
+    processors += [
+        structlog.processors.add_log_level,
+        add_trace_context,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.JSONRenderer(serializer=_serialize),
+    ]
+    return processors
+
+
+writer = QueuedWriter(maxsize=settings.log_queue_size)
+atexit.register(writer.close)
+
 
 def configure_logging(level: Optional[str] = None) -> None:
     """Configure structured logging for the application."""
-    chosen_level = level or "INFO"
-    timestamper = structlog.processors.TimeStamper(fmt="iso")
+    chosen_level = level or settings.log_level
 
     structlog.configure(
-        processors=[
-            structlog.contextvars.merge_contextvars,
-            structlog.processors.add_log_level,
-            timestamper,
-            structlog.processors.JSONRenderer(),
-        ],
+        processors=build_processors(settings.log_sample_rates),
         wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(chosen_level)),
-        logger_factory=structlog.PrintLoggerFactory(file=sys.stdout),
+        logger_factory=QueuedLoggerFactory(writer) if settings.log_async else structlog.BytesLoggerFactory(),
         cache_logger_on_first_use=True,
     )
 
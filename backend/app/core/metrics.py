@@ -0,0 +1,174 @@
+import os
+from typing import Iterable, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.scheduling import LANES, pending_key, slot_cutoff
+
+# Multi-process mode (uvicorn --workers N, Celery prefork) is enabled by pointing
+# PROMETHEUS_MULTIPROC_DIR at an empty directory shared by the processes of one
+# service (one container). Files are named by PID, so services never share it.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+AGENT_RUN_SECONDS = Histogram(
+    "agent_run_duration_seconds", "BaseAgent.run wall time.", ["agent", "outcome"], buckets=LATENCY_BUCKETS
+)
+AGENT_BUS_REQUEST_SECONDS = Histogram(
+    "agent_bus_request_seconds", "Round trip of a request to a remote agent pool.", ["agent"], buckets=LATENCY_BUCKETS
+)
+AGENT_HEDGES = Counter("agent_hedges_total", "Hedged agent attempts, by which call finished first.", ["agent", "winner"])
+AGENT_RUN_ATTEMPTS = Histogram("agent_run_attempts", "Attempts used per BaseAgent.run.", ["agent"], buckets=(1, 2, 3, 4, 5))
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total", "Log lines dropped because the writer queue was full.")
+
+GEMINI_CALL_SECONDS = Histogram(
+    "gemini_call_duration_seconds", "Gemini call time including retries.", ["operation", "outcome"], buckets=LATENCY_BUCKETS
+)
+GEMINI_RETRIES = Counter("gemini_retries_total", "Gemini attempts beyond the first.", ["operation"])
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Gemini tokens by direction.", ["operation", "kind"])
+GEMINI_PROMPT_TOKENS = Histogram(
+    "gemini_prompt_estimated_tokens",
+    "Estimated prompt tokens per Gemini call, before sending.",
+    ["operation"],
+    buckets=(50, 100, 200, 400, 800, 1200, 1600, 2400, 3200, 6400),
+)
+GEMINI_CIRCUIT_OPEN = Gauge("gemini_circuit_open", "1 while the Gemini circuit breaker is open.", multiprocess_mode="max")
+LLM_USAGE_RECORDS = Counter("llm_usage_records_total", "Gemini usage records by ledger write result.", ["result"])
+LLM_BUDGET_DECISIONS = Counter("llm_budget_decisions_total", "Plan requests by LLM budget decision.", ["action"])
+
+PLAN_REUSE_LOOKUPS = Counter("plan_reuse_lookups_total", "Nearest-plan reuse lookups.", ["outcome"])
+PLAN_REUSE_SIMILARITY = Histogram(
+    "plan_reuse_similarity",
+    "Cosine similarity of the nearest stored plan with the same constraints.",
+    buckets=(0.5, 0.7, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.98, 0.99, 1.0),
+)
+PLAN_REPLAN_FRACTION = Histogram(
+    "plan_replan_regenerated_fraction",
+    "Share of meals regenerated by an incremental re-plan (1 = full generation).",
+    buckets=(0, 0.05, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0),
+)
+PLAN_PRECOMPUTE = Counter(
+    "plan_precompute_total",
+    "Off-peak precomputed plans: scheduled, over_budget, hit (served) or miss (superseded unserved).",
+    ["outcome"],
+)
+
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "SQLAlchemy connections in use.", multiprocess_mode="livesum")
+DB_POOL_CAPACITY = Gauge("db_pool_capacity", "SQLAlchemy pool size plus overflow.", multiprocess_mode="livesum")
+
+WS_ACTIVE = Gauge("ws_active_connections", "Open /ws/agents sockets.", multiprocess_mode="livesum")
+WS_BROADCAST_LAG = Histogram(
+    "ws_broadcast_lag_seconds",
+    "Delay between an event being published and broadcast to sockets.",
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+
+def _queue_keys(queue: str) -> Iterable[str]:
+    # Kombu's Redis transport keeps one list per priority step: "<queue>", "<queue>:1" ... "<queue>:9".
+    yield queue
+    for step in range(1, 10):
+        yield f"{queue}:{step}"
+
+
+class QueueDepthCollector(Collector):
+    """Read Celery queue depth and the scheduler backlog from Redis at scrape time."""
+
+    def __init__(self, queues: Tuple[str, ...]):
+        self.queues = queues
+        self._redis: Redis | None = None
+
+    def _client(self) -> Redis:
+        if self._redis is None:
+            self._redis = Redis.from_url(settings.celery_broker_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+
+    def collect(self):
+        depth = GaugeMetricFamily("celery_queue_depth", "Messages waiting in each Celery queue.", labels=["queue"])
+        try:
+            client = self._client()
+            pipe = client.pipeline(transaction=False)
+            for queue in self.queues:
+                for key in _queue_keys(queue):
+                    pipe.llen(key)
+            cutoff = slot_cutoff()
+            for lane in LANES:
+                pipe.zcount(pending_key(lane), cutoff, "+inf")
+            results = pipe.execute()
+        except RedisError:
+            return
+        lengths, pending = results[: -len(LANES)], results[-len(LANES) :]
+        per_queue = len(lengths) // max(len(self.queues), 1)
+        for index, queue in enumerate(self.queues):
+            depth.add_metric([queue], sum(lengths[index * per_queue : (index + 1) * per_queue]))
+        yield depth
+
+        backlog = GaugeMetricFamily("plan_pending_jobs", "Admitted plan jobs not yet finished, per lane.", labels=["lane"])
+        for lane, count in zip(LANES, pending):
+            backlog.add_metric([lane], count)
+        yield backlog
+
+
+queue_depth_collector = QueueDepthCollector((settings.plan_queue_interactive, settings.plan_queue_batch, "default"))
+if not MULTIPROCESS:
+    REGISTRY.register(queue_depth_collector)
+
+
+def instrument_pool(engine) -> None:
+    """Track pool checkouts through SQLAlchemy pool events."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    size = getattr(pool, "size", lambda: 0)()
+    overflow = getattr(pool, "_max_overflow", 0)
+    DB_POOL_CAPACITY.set(size + max(overflow, 0))
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(*_args) -> None:
+        DB_POOL_CHECKED_OUT.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(*_args) -> None:
+        DB_POOL_CHECKED_OUT.dec()
+
+
+def _process_registry() -> CollectorRegistry:
+    if not MULTIPROCESS:
+        return REGISTRY
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Exposition payload for /metrics, aggregating every process when multi-process mode is on."""
+    if MULTIPROCESS:
+        registry = _process_registry()
+        registry.register(queue_depth_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def serve_metrics(port: int) -> None:
+    """Serve this service's metrics on ``port`` from a background thread (workers have no /metrics)."""
+    if port:
+        from prometheus_client import start_http_server
+
+        start_http_server(port, registry=_process_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
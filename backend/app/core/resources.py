@@ -0,0 +1,198 @@
+"""Process-wide connection resources: the database engine, Redis and the Gemini client.
+
+One container per process owns the pools. The API opens it in its lifespan and
+Celery workers in ``worker_process_init``. Both warm the pools before taking work,
+and both drain in-flight work before closing the pools on shutdown.
+
+Async pools are bound to the event loop that first uses them and are rebuilt if the
+loop changes. Celery tasks therefore run on one long-lived loop per worker process
+(``run``) rather than a fresh ``asyncio.run`` each, so connections outlive a task.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional, Set, TypeVar
+
+import structlog
+from redis import BlockingConnectionPool as SyncBlockingConnectionPool
+from redis import Redis as SyncRedis
+from redis.asyncio import BlockingConnectionPool, Redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Celery gives worker_process_init handlers 4s before it kills the child.
+WORKER_WARMUP_TIMEOUT = 3.0
+
+
+class Resources:
+    """Owner of the pooled clients; everything is created on first use, not at import."""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._engine: Optional[AsyncEngine] = None
+        self._sessions: Optional[async_sessionmaker] = None
+        self._redis: Optional[Redis] = None
+        self._sync_redis: Optional[SyncRedis] = None
+        self._llm_lock = threading.Lock()
+        self._llm_configured = False
+        self._worker_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        if self._engine is not None:
+            # Connections of a finished loop cannot be closed from this one; drop them.
+            self._engine.sync_engine.dispose(close=False)
+        self._loop = loop
+        self._engine = self._sessions = self._redis = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        self._bind()
+        if self._engine is None:
+            from app.core.metrics import instrument_pool  # metrics imports the scheduler, which uses this module
+
+            self._engine = create_async_engine(
+                settings.database_url,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_recycle=settings.db_pool_recycle,
+                pool_pre_ping=True,
+            )
+            instrument_pool(self._engine)
+        return self._engine
+
+    def session(self) -> AsyncSession:
+        """A session on the shared engine; use it as ``async with resources.session() as session``."""
+        engine = self.engine
+        if self._sessions is None:
+            self._sessions = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        return self._sessions()
+
+    @property
+    def redis(self) -> Redis:
+        """Async client on a shared pool; callers wait for a free connection instead of failing."""
+        self._bind()
+        if self._redis is None:
+            pool = BlockingConnectionPool.from_url(
+                settings.redis_url,
+                max_connections=settings.redis_max_connections,
+                timeout=settings.redis_socket_timeout,
+                socket_timeout=settings.redis_socket_timeout,
+                socket_connect_timeout=settings.redis_socket_timeout,
+            )
+            self._redis = Redis(connection_pool=pool)
+        return self._redis
+
+    @property
+    def sync_redis(self) -> SyncRedis:
+        """Blocking client for synchronous Celery code; its pool is thread-safe and loop-free."""
+        if self._sync_redis is None:
+            pool = SyncBlockingConnectionPool.from_url(
+                settings.redis_url,
+                max_connections=settings.redis_max_connections,
+                timeout=settings.redis_socket_timeout,
+                socket_timeout=settings.redis_socket_timeout,
+                socket_connect_timeout=settings.redis_socket_timeout,
+            )
+            self._sync_redis = SyncRedis(connection_pool=pool)
+        return self._sync_redis
+
+    def llm(self, model: Optional[str] = None) -> Any:
+        """A Gemini model on the process's client, which is configured once.
+
+        ``genai.configure`` replaces the SDK's client (and its connection), so it must not
+        run per call.
+        """
+        import google.generativeai as genai
+
+        with self._llm_lock:
+            if not self._llm_configured:
+                options = {}
+                if settings.gemini_transport:
+                    options["transport"] = settings.gemini_transport
+                if settings.gemini_api_endpoint:
+                    options["client_options"] = {"api_endpoint": settings.gemini_api_endpoint}
+                genai.configure(api_key=settings.gemini_api_key, **options)
+                self._llm_configured = True
+        return genai.GenerativeModel(model or settings.gemini_model)
+
+    async def warmup(self, timeout: Optional[float] = None) -> bool:
+        """Open ``db_pool_warm`` database connections and a Redis connection; sets ``ready``."""
+
+        async def database() -> None:
+            async def ping() -> None:
+                async with self.engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+
+            await asyncio.gather(*(ping() for _ in range(max(settings.db_pool_warm, 1))))
+
+        checks = {"database": database(), "redis": self.redis.ping()}
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*checks.values(), return_exceptions=True), timeout or settings.warmup_timeout
+            )
+        except asyncio.TimeoutError:
+            results = [asyncio.TimeoutError("warmup timed out")] * len(checks)
+        failed = {name: str(result) for name, result in zip(checks, results) if isinstance(result, BaseException)}
+        self.ready = not failed and not self.closing
+        if failed:
+            logger.warning("resources_warmup_failed", **failed)
+        else:
+            logger.info("resources_ready", db_connections=settings.db_pool_warm)
+        return self.ready
+
+    def track(self, work: Awaitable[T]) -> "asyncio.Task[T]":
+        """Run ``work`` in the background; shutdown waits for it before closing the pools."""
+        task = asyncio.ensure_future(work)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+        return task
+
+    async def shutdown(self) -> None:
+        """Stop reporting ready, let tracked work finish within the drain timeout, then close."""
+        self.ready = False
+        self.closing = True
+        if self._inflight:
+            done, pending = await asyncio.wait(set(self._inflight), timeout=settings.shutdown_drain_timeout)
+            for task in pending:
+                task.cancel()
+            logger.info("resources_drained", finished=len(done), cancelled=len(pending))
+        await self.close()
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose(close_connection_pool=True)
+        if self._engine is not None:
+            await self._engine.dispose()
+        if self._sync_redis is not None:
+            self._sync_redis.connection_pool.disconnect()
+        self._loop = self._engine = self._sessions = self._redis = self._sync_redis = None
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run ``coro`` on this process's long-lived loop (Celery tasks)."""
+        if self._worker_loop is None or self._worker_loop.is_closed():
+            self._worker_loop = asyncio.new_event_loop()
+        return self._worker_loop.run_until_complete(coro)
+
+    def start_worker(self) -> None:
+        self.run(self.warmup(WORKER_WARMUP_TIMEOUT))
+
+    def stop_worker(self) -> None:
+        if self._worker_loop is None or self._worker_loop.is_closed():
+            return
+        self.run(self.shutdown())
+        self._worker_loop.close()
+
+
+resources = Resources()
@@ -0,0 +1,136 @@
+import functools
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+from opentelemetry import propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+
+from app.core.config import settings
+
+ENQUEUED_AT_HEADER = "enqueued_at"
+TRACE_HEADERS = ("traceparent", "tracestate", ENQUEUED_AT_HEADER)
+
+tracer = trace.get_tracer("mas-backend")
+_configured = False
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans as OTLP-shaped JSON lines, one span per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = [span.to_json(indent=None) for span in spans]
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        return None
+
+
+def _build_exporter() -> Optional[SpanExporter]:
+    kind = settings.tracing_exporter.lower()
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "file":
+        return JsonLinesSpanExporter(settings.tracing_file_path)
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    return None
+
+
+def configure_tracing(service_name: str = "mas-backend") -> None:
+    """Install the global tracer provider once per process; a no-op when tracing is disabled."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    exporter = _build_exporter()
+    if exporter is None:
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name, "service.version": settings.version}),
+        sampler=ParentBasedTraceIdRatio(settings.tracing_sample_ratio),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """Wrap a sync or async callable in a span named after it."""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(span_name, attributes=attributes):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name, attributes=attributes):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def inject_headers() -> Dict[str, Any]:
+    """Task headers carrying the current trace context and the enqueue time."""
+    carrier: Dict[str, Any] = {}
+    propagate.inject(carrier)
+    carrier[ENQUEUED_AT_HEADER] = time.time()
+    return carrier
+
+
+def task_headers(request: Any) -> Dict[str, Any]:
+    """Collect trace headers from a Celery task request, wherever the protocol put them."""
+    headers: Dict[str, Any] = dict(getattr(request, "headers", None) or {})
+    getter = getattr(request, "get", None)
+    if getter:
+        for key in TRACE_HEADERS:
+            value = getter(key)
+            if value is not None:
+                headers.setdefault(key, value)
+    return headers
+
+
+def extract_context(headers: Mapping[str, Any]) -> Context:
+    return propagate.extract(dict(headers))
+
+
+def record_queue_wait(headers: Mapping[str, Any], parent: Context) -> Optional[float]:
+    """Emit a span covering the time a task sat in the broker; returns the wait in seconds."""
+    enqueued_at = headers.get(ENQUEUED_AT_HEADER)
+    if enqueued_at is None:
+        return None
+    now = time.time()
+    span = tracer.start_span("celery.queue_wait", context=parent, start_time=int(float(enqueued_at) * 1e9))
+    span.end(end_time=int(now * 1e9))
+    return max(now - float(enqueued_at), 0.0)
+
+
+def add_trace_context(_logger: Any, _method: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """structlog processor adding the active trace and span ids."""
+    ctx = trace.get_current_span().get_span_context()
+    if ctx.is_valid:
+        event_dict.setdefault("trace_id", format(ctx.trace_id, "032x"))
+        event_dict.setdefault("span_id", format(ctx.span_id, "016x"))
+    return event_dict
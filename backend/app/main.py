@@ -1,19 +1,41 @@
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
 from app.core.logging import configure_logging
-from app.api.routes import health, tasks, ws, profiles
+from app.core.resources import resources
+from app.core.tracing import configure_tracing
+from app.api.routes import analytics, health, metrics, tasks, ws, profiles
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Process-wide setup on start-up and connection cleanup on shutdown.
+
+    Nothing here runs at import, so importing the app (tests, tooling) stays cheap.
+    Start-up warms the database and Redis pools before ``/api/ready`` answers 200;
+    shutdown stops the websocket listener and drains background work before closing them.
+    """
+    configure_logging()
+    configure_tracing("mas-backend")
+    await resources.warmup()
+    yield
+    await ws.manager.close()
+    await resources.shutdown()
 
 
 def create_app() -> FastAPI:
     """Application factory to build the FastAPI app."""
-    configure_logging()
     app = FastAPI(
         title="MAS Backend",
         version=settings.version,
         description="Multi-Agent System backend with FastAPI, Redis Streams, and Gemini-powered agents.",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -22,12 +44,16 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
+    app.add_middleware(CompressionMiddleware)
 
     app.include_router(health.router, prefix="/api")
     app.include_router(tasks.router, prefix="/api")
     app.include_router(profiles.router, prefix="/api")
+    app.include_router(analytics.router, prefix="/api")
     app.include_router(ws.router)
+    app.include_router(metrics.router)
 
     @app.get("/health", tags=["system"])
     async def healthcheck() -> dict[str, str]:
@@ -1,20 +1,60 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import CheckConstraint, Column, DateTime, Float, ForeignKey, Index, SmallInteger, String, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
 
+# Length of app.services.plan_reuse.encode_profile vectors; changing it needs a migration.
+PROFILE_EMBEDDING_DIM = 38
+
+# Indexed expressions; queries must use the same text for the planner to match the index.
+PROFILE_GOAL = "(data -> 'goals' ->> 'primary')"
+PROFILE_ACTIVITY_LEVEL = "(data -> 'lifestyle' ->> 'activityLevel')"
+
+# NutritionTargets field -> Profile column holding it (app.services.nutrition_metrics).
+PROFILE_METRIC_COLUMNS = {
+    "bmr": "bmr",
+    "tdee": "tdee",
+    "calories": "target_calories",
+    "protein": "target_protein",
+    "carbs": "target_carbs",
+    "fats": "target_fats",
+    "bmi": "bmi",
+}
+
 
 class Profile(Base):
+    __table_args__ = (
+        Index("ix_profile_data_gin", "data", postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}),
+        Index("ix_profile_goal", text(PROFILE_GOAL)),
+        Index("ix_profile_activity_level", text(PROFILE_ACTIVITY_LEVEL)),
+        Index("ix_profile_language", "language"),
+        Index("ix_profile_created_at_id", "created_at", "id"),
+        Index("ix_profile_bmi", "bmi"),
+        Index("ix_profile_tdee", "tdee"),
+        Index("ix_profile_target_calories", "target_calories"),
+        Index("ix_profile_metrics_version", "metrics_version"),
+    )
+
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name: Mapped[str] = mapped_column(String(255))
     language: Mapped[str] = mapped_column(String(10))
     data = Column(JSONB, nullable=False)  # full profile payload
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Derived from ``data`` on every write; NULL or an old version until recomputed.
+    bmr: Mapped[float | None] = mapped_column(Float, nullable=True)
+    tdee: Mapped[float | None] = mapped_column(Float, nullable=True)
+    target_calories: Mapped[float | None] = mapped_column(Float, nullable=True)
+    target_protein: Mapped[float | None] = mapped_column(Float, nullable=True)
+    target_carbs: Mapped[float | None] = mapped_column(Float, nullable=True)
+    target_fats: Mapped[float | None] = mapped_column(Float, nullable=True)
+    bmi: Mapped[float | None] = mapped_column(Float, nullable=True)
+    metrics_version: Mapped[int | None] = mapped_column(SmallInteger, nullable=True)
 
     plans: Mapped[list["WeeklyPlanEntity"]] = relationship(back_populates="profile")
     reports: Mapped[list["ClinicalReportEntity"]] = relationship(back_populates="profile")
@@ -22,19 +62,75 @@ class Profile(Base):
 
 
 class WeeklyPlanEntity(Base):
+    __table_args__ = (
+        Index("ix_weeklyplanentity_profile_id_status", "profile_id", "status"),
+        CheckConstraint("plan IS NOT NULL OR body_hash IS NOT NULL", name="ck_weeklyplanentity_plan_or_body"),
+        Index(
+            "ix_weeklyplanentity_profile_embedding_hnsw",
+            "profile_embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"profile_embedding": "vector_cosine_ops"},
+        ),
+        Index("ix_weeklyplanentity_profile_job", "profile_id", "job_id", unique=True),
+    )
+
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     profile_id: Mapped[str] = mapped_column(String, ForeignKey("profile.id"))
-    plan = Column(JSONB, nullable=False)
+    # Inline document of rows written before the meal catalog; newer rows reference a
+    # shared body instead and get ``plan`` filled by app.services.plan_store.load.
+    plan = Column(JSONB, nullable=True)
+    body_hash: Mapped[str | None] = mapped_column(String(64), ForeignKey("planbody.hash"), nullable=True, index=True)
+    # Per-plan fields left out of the shared body: id, generatedAt and the meal ids.
+    instance = Column(JSONB, nullable=True)
+    # sha256 of the full document; rows are immutable, so it backs strong ETags.
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Features of the profile the plan was generated for, for nearest-plan reuse.
+    profile_embedding = Column(Vector(PROFILE_EMBEDDING_DIM), nullable=True)
+    constraint_signature: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    # Constraints the plan was built for and the plan it was re-planned from.
+    constraints = Column(JSONB, nullable=True)
+    parent_id: Mapped[str | None] = mapped_column(
+        String, ForeignKey("weeklyplanentity.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # "request" or "precomputed"; precomputed plans go ready -> served | missed.
+    source: Mapped[str] = mapped_column(String(16), default="request", server_default="request")
+    status: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    # Client trace id of the request that produced the plan.
+    correlation_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    # Plan task that stored the plan; unique per profile, so a retried or redelivered task stores it once.
+    job_id: Mapped[str | None] = mapped_column(String, nullable=True)
 
     profile: Mapped[Profile] = relationship(back_populates="plans")
 
 
+class CatalogMeal(Base):
+    """A meal as served in plans, keyed by the hash of its name, description, calories and macros."""
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    data = Column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PlanBody(Base):
+    """A plan without its ids, meals replaced by catalog keys; shared by identical plans."""
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    body = Column(JSONB, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 class ClinicalReportEntity(Base):
+    __table_args__ = (Index("ix_clinicalreportentity_profile_job", "profile_id", "job_id", unique=True),)
+
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     profile_id: Mapped[str] = mapped_column(String, ForeignKey("profile.id"))
     report = Column(JSONB, nullable=False)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    correlation_id: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    job_id: Mapped[str | None] = mapped_column(String, nullable=True)
 
     profile: Mapped[Profile] = relationship(back_populates="reports")
 
@@ -46,3 +142,11 @@ class MealLog(Base):
     logged_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     profile: Mapped[Profile] = relationship(back_populates="meal_logs")
+
+
+class AgentMemory(Base):
+    """Persisted copy of a profile's bounded agent memory (see app.services.agent_memory)."""
+
+    profile_id: Mapped[str] = mapped_column(String, ForeignKey("profile.id", ondelete="CASCADE"), primary_key=True)
+    data = Column(JSONB, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
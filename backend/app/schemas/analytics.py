@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class DailyStat(BaseModel):
+    date: str
+    rows: int
+    mean: float
+
+
+class CohortStatsOut(BaseModel):
+    profiles: int
+    rows: int
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    daily: List[DailyStat] = []
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -9,6 +9,13 @@ class MacroBreakdown(BaseModel):
     fats: float
 
 
+class MealEstimate(BaseModel):
+    calories: float
+    protein: float
+    carbs: float
+    fats: float
+
+
 class MealItem(BaseModel):
     id: str
     name: str
@@ -63,6 +70,13 @@ class UserProfile(BaseModel):
 class PlanRequest(BaseModel):
     profile: UserProfile
     correlation_id: Optional[str] = Field(default=None, description="Trace ID for orchestration.")
+    priority: Literal["interactive", "batch"] = Field(default="interactive", description="Scheduling lane.")
+    tenant_id: Optional[str] = Field(default=None, description="Fair-share key; set server-side from the caller.")
+    replan: bool = Field(default=False, description="Regenerate only what the latest plan no longer satisfies.")
+    deadline: Optional[float] = Field(default=None, description="Epoch seconds the plan must be ready by; set server-side.")
+    source: Literal["request", "precomputed"] = Field(default="request", description="Who asked for the plan; set server-side.")
+    engine: Optional[str] = Field(default=None, description="Plan engine override for tenants over budget; set server-side.")
+    llm_model: Optional[str] = Field(default=None, description="Gemini model override for tenants over budget; set server-side.")
 
 
 class PlanTaskResponse(BaseModel):
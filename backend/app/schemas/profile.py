@@ -10,15 +10,32 @@ class ProfileCreate(BaseModel):
     profile: UserProfile
 
 
-class ProfileOut(BaseModel):
+class ProfileSummary(BaseModel):
     id: str
     name: str
     language: str
-    data: dict
     created_at: datetime
     updated_at: datetime
 
 
+class ProfileMetrics(BaseModel):
+    """Derived from the profile payload when it is written (app.services.nutrition_metrics)."""
+
+    bmr: float
+    tdee: float
+    calories: float
+    protein: float
+    carbs: float
+    fats: float
+    bmi: float
+    version: int
+
+
+class ProfileOut(ProfileSummary):
+    data: dict
+    metrics: Optional[ProfileMetrics] = None
+
+
 class MealLogIn(BaseModel):
     entry: dict
 
@@ -33,6 +50,7 @@ class PlanOut(BaseModel):
     id: str
     plan: WeeklyPlan
     created_at: datetime
+    source: str = "request"
 
 
 class ReportOut(BaseModel):
@@ -0,0 +1,197 @@
+"""Bounded per-profile agent memory.
+
+A profile's memory is one small JSON document: summaries of the last few plans,
+daily logged calories for a rolling window, the adherence derived from them and the
+latest coach insights. Every event (plan stored, meal logged, insights produced)
+folds into the document in place and trims it, so its size never depends on how
+much history the profile has. Agents read it with a single Redis GET; Postgres keeps
+a copy so an evicted or expired key is rebuilt without replaying history.
+"""
+
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+import structlog
+from redis.exceptions import WatchError
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.resources import resources
+from app.models.profile import AgentMemory
+from app.schemas.plan import WeeklyPlan
+from app.services import meal_parser
+
+logger = structlog.get_logger()
+
+KEY = "memory:profile:{}"
+MAX_PLANS = 3
+MAX_DAYS = 14
+MAX_INSIGHTS = 5
+UPDATE_ATTEMPTS = 5
+
+
+@dataclass
+class ProfileMemory:
+    plans: List[Dict[str, Any]] = field(default_factory=list)
+    days: Dict[str, float] = field(default_factory=dict)
+    insights: List[str] = field(default_factory=list)
+    updated_at: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ProfileMemory":
+        data = data or {}
+        return cls(
+            plans=list(data.get("plans") or []),
+            days=dict(data.get("days") or {}),
+            insights=list(data.get("insights") or []),
+            updated_at=float(data.get("updated_at") or 0.0),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def record_plan(self, plan: WeeklyPlan) -> None:
+        m = plan.averageMacros
+        summary = {
+            "id": plan.id,
+            "at": plan.generatedAt[:10],
+            "kcal": round(plan.averageCalories),
+            "p": round(m.protein),
+            "c": round(m.carbs),
+            "f": round(m.fats),
+            "meals": list(dict.fromkeys(meal.name for meal in (plan.days[0].meals if plan.days else [])))[:4],
+        }
+        self.plans = [summary, *(p for p in self.plans if p.get("id") != plan.id)][:MAX_PLANS]
+        self._touch()
+
+    def record_meal(self, calories: float, logged_on: date) -> None:
+        day = logged_on.isoformat()
+        self.days[day] = round(self.days.get(day, 0.0) + calories, 1)
+        for stale in sorted(self.days)[:-MAX_DAYS]:
+            del self.days[stale]
+        self._touch()
+
+    def record_insights(self, insights: List[str]) -> None:
+        self.insights = list(dict.fromkeys([*insights, *self.insights]))[:MAX_INSIGHTS]
+        self._touch()
+
+    def _touch(self) -> None:
+        # Strictly increasing across the Redis-serialised updates, whatever the worker clocks say.
+        self.updated_at = max(time.time(), self.updated_at + 1e-6)
+
+    @property
+    def adherence(self) -> Optional[Dict[str, Any]]:
+        """Logged days in the window and mean intake as a share of the latest plan's calories."""
+        if not self.days:
+            return None
+        result: Dict[str, Any] = {"logged_days": len(self.days), "window": MAX_DAYS}
+        target = self.plans[0]["kcal"] if self.plans else None
+        if target:
+            result["intake_ratio"] = round(sum(self.days.values()) / len(self.days) / target, 2)
+        return result
+
+    def context(self) -> str:
+        """Compact text for prompts; empty when there is nothing to remember."""
+        lines = []
+        if self.plans:
+            lines.append(
+                "previous plans: "
+                + "; ".join(f"{p['at']} {p['kcal']} kcal p{p['p']}/c{p['c']}/f{p['f']} ({', '.join(p['meals'])})" for p in self.plans)
+            )
+        adherence = self.adherence
+        if adherence:
+            line = f"meal logs: {adherence['logged_days']} of last {adherence['window']} days"
+            if "intake_ratio" in adherence:
+                line += f", intake {adherence['intake_ratio']:.0%} of plan calories"
+            lines.append(line)
+        if self.insights:
+            lines.append("coach notes: " + "; ".join(self.insights))
+        return "\n".join(lines)
+
+
+def entry_calories(entry: Dict[str, Any]) -> Optional[float]:
+    """Calories of a meal-log entry: its own ``calories`` or a local parse of its ``text``.
+
+    None when neither is usable; a text the parser fails on never reaches the caller.
+    """
+    calories = entry.get("calories")
+    if isinstance(calories, (int, float)):
+        return float(calories)
+    if entry.get("text"):
+        try:
+            return meal_parser.parse_entry(entry["text"]).calories or None
+        except Exception as exc:
+            logger.warning("meal_entry_parse_failed", error=str(exc))
+    return None
+
+
+class MemoryStore:
+    """Redis-first store with Postgres write-through; errors never reach the caller.
+
+    Both live on the process's shared pools (``app.core.resources``).
+    """
+
+    async def _load_persisted(self, profile_id: str) -> ProfileMemory:
+        async with resources.session() as session:
+            row = await session.get(AgentMemory, profile_id)
+        return ProfileMemory.from_dict(row.data if row else None)
+
+    async def _persist(self, profile_id: str, memory: ProfileMemory) -> None:
+        data = memory.to_dict()
+        statement = insert(AgentMemory).values(profile_id=profile_id, data=data, updated_at=datetime.utcnow())
+        # Updates commit to Redis in order but may reach Postgres out of it; never replace a newer copy.
+        statement = statement.on_conflict_do_update(
+            index_elements=[AgentMemory.profile_id],
+            set_={"data": data, "updated_at": statement.excluded.updated_at},
+            where=func.coalesce(AgentMemory.data["updated_at"].as_float(), 0) < statement.excluded.data["updated_at"].as_float(),
+        )
+        async with resources.session() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def get(self, profile_id: str) -> ProfileMemory:
+        """One GET; on a miss the persisted copy is loaded and cached."""
+        try:
+            client = resources.redis
+            raw = await client.get(KEY.format(profile_id))
+            if raw is not None:
+                return ProfileMemory.from_dict(orjson.loads(raw))
+            memory = await self._load_persisted(profile_id)
+            await client.set(KEY.format(profile_id), orjson.dumps(memory.to_dict()), ex=settings.agent_memory_ttl, nx=True)
+            return memory
+        except Exception as exc:
+            logger.warning("agent_memory_read_failed", profile_id=profile_id, error=str(exc))
+            return ProfileMemory()
+
+    async def update(self, profile_id: str, apply: Callable[[ProfileMemory], None]) -> Optional[ProfileMemory]:
+        """Fold an event into the memory with an optimistic WATCH/MULTI loop, then persist it."""
+        key = KEY.format(profile_id)
+        try:
+            client = resources.redis
+            for _ in range(UPDATE_ATTEMPTS):
+                async with client.pipeline(transaction=True) as pipe:
+                    try:
+                        await pipe.watch(key)
+                        raw = await pipe.get(key)
+                        memory = (
+                            ProfileMemory.from_dict(orjson.loads(raw)) if raw is not None else await self._load_persisted(profile_id)
+                        )
+                        apply(memory)
+                        pipe.multi()
+                        pipe.set(key, orjson.dumps(memory.to_dict()), ex=settings.agent_memory_ttl)
+                        await pipe.execute()
+                    except WatchError:
+                        continue
+                await self._persist(profile_id, memory)
+                return memory
+            logger.warning("agent_memory_update_contended", profile_id=profile_id)
+        except Exception as exc:
+            logger.warning("agent_memory_update_failed", profile_id=profile_id, error=str(exc))
+        return None
+
+
+memory_store = MemoryStore()
@@ -0,0 +1,405 @@
+"""Columnar export of plans and meal logs, and vectorised cohort aggregation over it.
+
+``export`` flattens plans, their days and meals, and meal logs written since the last
+run into Parquet files under ``settings.analytics_dir``. Each table is a directory
+partitioned by date (``meals/date=2026-10-18/part-<id>.parquet``). A profile snapshot
+(``profiles/profiles.parquet``) carries the cohort attributes.
+
+Runs continue from a per-source watermark kept in ``_state.json``: the newest
+``created_at``/``logged_at`` exported, plus the ids exported within
+``settings.analytics_export_overlap`` seconds of it. Those timestamps are set before
+commit, so a row can become visible after a newer one was exported; every run
+re-scans the overlap window and skips the ids already exported. Part files are named
+after the saved state they were written from, so a run that dies before saving it
+replaces the same files (stale dates included) instead of duplicating rows.
+
+``cohort_stats`` answers dashboard questions from those files only: the profile
+filters, the date-partition pruning and the aggregates all run in pyarrow and NumPy,
+never against the OLTP tables.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import structlog
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from app.core.config import settings
+from app.models.profile import MealLog, Profile, WeeklyPlanEntity
+from app.services import meal_parser, plan_store
+
+logger = structlog.get_logger()
+
+STATE_FILE = "_state.json"
+PROFILES = "profiles"
+MACROS = ("protein", "carbs", "fats")
+
+_IDS = [("plan_id", pa.string()), ("profile_id", pa.string())]
+_NUTRIENTS = [("calories", pa.float64())] + [(name, pa.float64()) for name in MACROS]
+SCHEMAS: Dict[str, pa.Schema] = {
+    "plans": pa.schema(_IDS + [("created_at", pa.timestamp("us")), ("source", pa.string()), ("days", pa.int16())] + _NUTRIENTS),
+    "days": pa.schema(_IDS + [("created_at", pa.timestamp("us")), ("day_index", pa.int16()), ("day", pa.string())] + _NUTRIENTS),
+    "meals": pa.schema(
+        _IDS
+        + [("created_at", pa.timestamp("us")), ("day_index", pa.int16()), ("slot", pa.int16()), ("name", pa.string())]
+        + _NUTRIENTS
+    ),
+    "logs": pa.schema([("log_id", pa.string()), ("profile_id", pa.string()), ("logged_at", pa.timestamp("us"))] + _NUTRIENTS),
+    PROFILES: pa.schema(
+        [
+            ("profile_id", pa.string()),
+            ("language", pa.string()),
+            ("goal", pa.string()),
+            ("activity_level", pa.string()),
+            ("conditions", pa.list_(pa.string())),
+            ("medications", pa.list_(pa.string())),
+        ]
+    ),
+}
+GRAINS = ("plans", "days", "meals", "logs")
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.date32())]), flavor="hive")
+
+
+class UnknownMetric(ValueError):
+    """Raised when a cohort query names a grain or column the export does not have."""
+
+
+def _root(root: Optional[str]) -> Path:
+    return Path(root or settings.analytics_dir)
+
+
+def load_state(root: Path) -> Dict[str, Any]:
+    path = root / STATE_FILE
+    return orjson.loads(path.read_bytes()) if path.exists() else {}
+
+
+def save_state(root: Path, state: Dict[str, Any]) -> None:
+    tmp = root / f"{STATE_FILE}.tmp"
+    tmp.write_bytes(orjson.dumps(state))
+    os.replace(tmp, root / STATE_FILE)
+
+
+def _macros(macros: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    macros = macros or {}
+    return {name: float(macros.get(name) or 0.0) for name in MACROS}
+
+
+def flatten_plan(entity: WeeklyPlanEntity) -> Dict[str, List[Dict[str, Any]]]:
+    """Rows for the plans, days and meals tables from one stored plan."""
+    plan = entity.plan
+    ids = {"plan_id": entity.id, "profile_id": entity.profile_id, "created_at": entity.created_at}
+    rows: Dict[str, List[Dict[str, Any]]] = {"plans": [], "days": [], "meals": []}
+    rows["plans"].append(
+        {
+            **ids,
+            "source": entity.source,
+            "days": len(plan["days"]),
+            "calories": float(plan["averageCalories"]),
+            **_macros(plan["averageMacros"]),
+        }
+    )
+    for day_index, day in enumerate(plan["days"]):
+        rows["days"].append(
+            {
+                **ids,
+                "day_index": day_index,
+                "day": day["day"],
+                "calories": float(day["dailyCalories"]),
+                **_macros(day["dailyMacros"]),
+            }
+        )
+        for slot, meal in enumerate(day["meals"]):
+            rows["meals"].append(
+                {
+                    **ids,
+                    "day_index": day_index,
+                    "slot": slot,
+                    "name": meal["name"],
+                    "calories": float(meal["calories"]),
+                    **_macros(meal.get("macros")),
+                }
+            )
+    return rows
+
+
+def _log_nutrients(entry: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    if entry.get("calories") is None and entry.get("text"):
+        parsed = meal_parser.parse_entry(entry["text"])
+        return {"calories": parsed.calories, **parsed.macros.model_dump()}
+    return {"calories": float(entry.get("calories") or 0.0), **_macros(entry.get("macros"))}
+
+
+def flatten_log(log: MealLog) -> Dict[str, Any]:
+    """One logs row; nutrients are null when the entry cannot be read, so one bad log never stalls the export."""
+    try:
+        nutrients = _log_nutrients(log.entry or {})
+    except Exception as exc:
+        logger.warning("analytics_log_unreadable", log_id=log.id, error=str(exc))
+        nutrients = {"calories": None, **{name: None for name in MACROS}}
+    return {"log_id": log.id, "profile_id": log.profile_id, "logged_at": log.logged_at, **nutrients}
+
+
+def write_partitions(root: Path, table: str, rows: List[Dict[str, Any]], time_column: str, part: str) -> int:
+    """Write rows into one part file per date partition; returns the number of files.
+
+    Files of the same part in other dates (left by an interrupted earlier attempt) are removed.
+    """
+    by_date: Dict[date, List[Dict[str, Any]]] = {}
+    for row in rows:
+        by_date.setdefault(row[time_column].date(), []).append(row)
+    written = set()
+    for day, day_rows in by_date.items():
+        directory = root / table / f"date={day.isoformat()}"
+        directory.mkdir(parents=True, exist_ok=True)
+        data = pa.Table.from_pylist(day_rows, schema=SCHEMAS[table])
+        tmp = directory / f"part-{part}.parquet.tmp"
+        pq.write_table(data, tmp, compression="zstd")
+        os.replace(tmp, directory / f"part-{part}.parquet")
+        written.add(directory / f"part-{part}.parquet")
+    for stale in set((root / table).glob(f"date=*/part-{part}.parquet")) - written:
+        stale.unlink()
+    return len(by_date)
+
+
+def _part_name(table: str, saved: Any) -> str:
+    return hashlib.sha256(orjson.dumps([table, saved])).hexdigest()[:16]
+
+
+@dataclass
+class Watermark:
+    """Export position of one source: newest timestamp exported and the ids exported near it."""
+
+    at: Optional[datetime] = None
+    seen: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, saved: Any) -> "Watermark":
+        if not saved:
+            return cls()
+        if isinstance(saved, list):  # [timestamp, id] keyset from before the overlap window
+            return cls(datetime.fromisoformat(saved[0]), {saved[1]: saved[0]})
+        return cls(datetime.fromisoformat(saved["at"]), dict(saved["seen"]))
+
+    def dump(self) -> Dict[str, Any]:
+        return {"at": self.at.isoformat() if self.at else None, "seen": self.seen}
+
+    def start(self) -> Optional[datetime]:
+        """Oldest timestamp a row not exported yet can still have."""
+        return self.at - timedelta(seconds=settings.analytics_export_overlap) if self.at else None
+
+    def advance(self, rows: Iterable[Tuple[str, datetime]]) -> None:
+        for row_id, at in rows:
+            self.seen[row_id] = at.isoformat()
+            self.at = max(self.at, at) if self.at else at
+        start = self.start().isoformat()
+        self.seen = {row_id: at for row_id, at in self.seen.items() if at >= start}
+
+
+async def _pages(session: AsyncSession, statement: Select, column, id_column, start: Optional[datetime]) -> AsyncIterator[list]:
+    """Rows from ``start`` on in (timestamp, id) order, one keyset page at a time."""
+    where = [column >= start] if start else []
+    while True:
+        result = await session.execute(
+            statement.where(*where).order_by(column, id_column).limit(settings.analytics_export_batch)
+        )
+        rows = list(result.scalars().all())
+        if not rows:
+            return
+        last = rows[-1]
+        where = [tuple_(column, id_column) > tuple_(getattr(last, column.key), last.id)]
+        yield rows
+
+
+async def _export_plans(session: AsyncSession, root: Path, state: Dict[str, Any]) -> int:
+    exported = 0
+    mark = Watermark.load(state.get("plans"))
+    statement = select(WeeklyPlanEntity).options(defer(WeeklyPlanEntity.profile_embedding), defer(WeeklyPlanEntity.constraints))
+    async for page in _pages(session, statement, WeeklyPlanEntity.created_at, WeeklyPlanEntity.id, mark.start()):
+        entities = [entity for entity in page if entity.id not in mark.seen]
+        if entities:
+            await plan_store.load(session, entities)
+            rows: Dict[str, List[Dict[str, Any]]] = {"plans": [], "days": [], "meals": []}
+            for entity in entities:
+                for table, table_rows in flatten_plan(entity).items():
+                    rows[table] += table_rows
+            for table, table_rows in rows.items():
+                write_partitions(root, table, table_rows, "created_at", _part_name(table, state.get("plans")))
+            mark.advance((entity.id, entity.created_at) for entity in entities)
+            state["plans"] = mark.dump()
+            save_state(root, state)
+            exported += len(entities)
+        session.expunge_all()
+    return exported
+
+
+async def _export_logs(session: AsyncSession, root: Path, state: Dict[str, Any]) -> int:
+    exported = 0
+    mark = Watermark.load(state.get("logs"))
+    async for page in _pages(session, select(MealLog), MealLog.logged_at, MealLog.id, mark.start()):
+        logs = [log for log in page if log.id not in mark.seen]
+        if logs:
+            write_partitions(root, "logs", [flatten_log(log) for log in logs], "logged_at", _part_name("logs", state.get("logs")))
+            mark.advance((log.id, log.logged_at) for log in logs)
+            state["logs"] = mark.dump()
+            save_state(root, state)
+            exported += len(logs)
+        session.expunge_all()
+    return exported
+
+
+async def _export_profiles(session: AsyncSession, root: Path) -> int:
+    """Rewrite the profile snapshot; cohort attributes are extracted by Postgres."""
+    clinical = Profile.data["clinical"]
+    result = await session.execute(
+        select(
+            Profile.id,
+            Profile.language,
+            Profile.data["goals"]["primary"].astext,
+            Profile.data["lifestyle"]["activityLevel"].astext,
+            clinical["medicalConditions"],
+            clinical["medications"],
+        )
+    )
+    table = pa.Table.from_pylist(
+        [
+            {
+                "profile_id": profile_id,
+                "language": language,
+                "goal": goal,
+                "activity_level": activity_level,
+                "conditions": conditions if isinstance(conditions, list) else [],
+                "medications": medications if isinstance(medications, list) else [],
+            }
+            for profile_id, language, goal, activity_level, conditions, medications in result.all()
+        ],
+        schema=SCHEMAS[PROFILES],
+    )
+    directory = root / PROFILES
+    directory.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, directory / "profiles.parquet.tmp", compression="zstd")
+    os.replace(directory / "profiles.parquet.tmp", directory / "profiles.parquet")
+    return table.num_rows
+
+
+async def export(session: AsyncSession, root: Optional[str] = None) -> Dict[str, int]:
+    """Export everything written since the last run; returns rows exported per source."""
+    path = _root(root)
+    path.mkdir(parents=True, exist_ok=True)
+    state = load_state(path)
+    counts = {
+        "plans": await _export_plans(session, path, state),
+        "logs": await _export_logs(session, path, state),
+        PROFILES: await _export_profiles(session, path),
+    }
+    logger.info("analytics_exported", **counts)
+    return counts
+
+
+@dataclass(frozen=True)
+class CohortQuery:
+    grain: str
+    metric: str
+    start: date
+    end: date
+    conditions: Tuple[str, ...] = ()
+    medications: Tuple[str, ...] = ()
+    goal: Optional[str] = None
+    activity_level: Optional[str] = None
+    language: Optional[str] = None
+
+
+@dataclass
+class CohortStats:
+    profiles: int = 0
+    rows: int = 0
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    daily: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _has_all(column: pa.ChunkedArray, wanted: Tuple[str, ...]) -> np.ndarray:
+    """Rows of a list<string> column containing every wanted value."""
+    mask = np.ones(len(column), dtype=bool)
+    if not wanted:
+        return mask
+    column = column.combine_chunks()
+    parents = pc.list_parent_indices(column).to_numpy()
+    values = pc.utf8_lower(pc.list_flatten(column))
+    for value in wanted:
+        hits = pc.equal(values, value.lower()).to_numpy(zero_copy_only=False)
+        present = np.zeros(len(column), dtype=bool)
+        present[parents[hits]] = True
+        mask &= present
+    return mask
+
+
+def cohort_profiles(query: CohortQuery, root: Path) -> Optional[pa.Array]:
+    """Ids of profiles in the cohort; None when no profile filter is set."""
+    scalar = {"goal": query.goal, "activity_level": query.activity_level, "language": query.language}
+    if not (query.conditions or query.medications or any(scalar.values())):
+        return None
+    path = root / PROFILES / "profiles.parquet"
+    if not path.exists():
+        return pa.array([], pa.string())
+    profiles = pq.read_table(path)
+    mask = _has_all(profiles["conditions"], query.conditions) & _has_all(profiles["medications"], query.medications)
+    for column, value in scalar.items():
+        if value:
+            mask &= pc.equal(profiles[column], value).to_numpy(zero_copy_only=False).astype(bool)
+    return pa.array(profiles["profile_id"].to_numpy(zero_copy_only=False)[mask], pa.string())
+
+
+def cohort_stats(query: CohortQuery, root: Optional[str] = None) -> CohortStats:
+    """Aggregate ``metric`` over the cohort's rows of ``grain`` between ``start`` and ``end``."""
+    if query.grain not in GRAINS:
+        raise UnknownMetric(f"Unknown grain {query.grain!r}; expected one of {', '.join(GRAINS)}")
+    schema = SCHEMAS[query.grain]
+    if schema.get_field_index(query.metric) < 0 or not pa.types.is_floating(schema.field(query.metric).type):
+        raise UnknownMetric(f"{query.grain} has no numeric column {query.metric!r}")
+    path = _root(root)
+    directory = path / query.grain
+    if not directory.exists():
+        return CohortStats()
+    dataset = ds.dataset(directory, format="parquet", partitioning=PARTITIONING)
+    condition = (ds.field("date") >= query.start) & (ds.field("date") <= query.end) & ds.field(query.metric).is_valid()
+    profiles = cohort_profiles(query, path)
+    if profiles is not None:
+        condition &= ds.field("profile_id").isin(profiles)
+    table = dataset.to_table(columns=["profile_id", "date", query.metric], filter=condition)
+    if table.num_rows == 0:
+        return CohortStats()
+
+    values = table[query.metric].to_numpy(zero_copy_only=False).astype(np.float64)
+    days = table["date"].to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    buckets, inverse = np.unique(days, return_inverse=True)
+    counts = np.bincount(inverse)
+    sums = np.bincount(inverse, weights=values)
+    p50, p90 = np.percentile(values, [50, 90])
+    return CohortStats(
+        profiles=len(pc.unique(table["profile_id"])),
+        rows=int(values.size),
+        mean=round(float(values.mean()), 2),
+        p50=round(float(p50), 2),
+        p90=round(float(p90), 2),
+        minimum=round(float(values.min()), 2),
+        maximum=round(float(values.max()), 2),
+        daily=[
+            {"date": str(bucket), "rows": int(count), "mean": round(float(total / count), 2)}
+            for bucket, count, total in zip(buckets, counts, sums)
+        ],
+    )
@@ -0,0 +1,53 @@
+"""Per-request checkpoints of plan pipeline steps.
+
+Each completed step's output is written to one Redis hash per plan task
+(``plan:ckpt:<profile_id>:<job_id>``, field = step id). The job id is the Celery task
+id minted by the server, never the client's correlation id, and the key is scoped to
+the profile, so one request can never restore another's outputs. A retried or redelivered plan task
+reads the hash first and only runs the steps that are missing, so a failure in the
+clinical report or in persistence does not repeat the weekly plan's Gemini call.
+Checkpoints expire after ``settings.plan_checkpoint_ttl``; errors never reach the
+caller, a pipeline without checkpoints simply runs every step.
+"""
+
+from typing import Any, Dict, Optional
+
+import orjson
+import structlog
+from pydantic_core import to_jsonable_python
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.resources import resources
+
+logger = structlog.get_logger()
+
+KEY = "plan:ckpt:{}:{}"
+
+
+class PlanCheckpoints:
+    def __init__(self, profile_id: str, job_id: str, redis: Optional[Redis] = None):
+        self.key = KEY.format(profile_id, job_id)
+        self._redis = redis
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis or resources.redis
+
+    async def load(self) -> Dict[str, Any]:
+        """Outputs of the steps already completed, by step id, as JSON data."""
+        try:
+            raw = await self.redis.hgetall(self.key)
+        except Exception as exc:
+            logger.warning("plan_checkpoint_read_failed", key=self.key, error=str(exc))
+            return {}
+        return {step.decode(): orjson.loads(value) for step, value in raw.items()}
+
+    async def save(self, step: str, output: Any) -> None:
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(self.key, step, orjson.dumps(to_jsonable_python(output)))
+                pipe.expire(self.key, settings.plan_checkpoint_ttl)
+                await pipe.execute()
+        except Exception as exc:
+            logger.warning("plan_checkpoint_write_failed", key=self.key, step=step, error=str(exc))
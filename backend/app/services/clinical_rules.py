@@ -0,0 +1,243 @@
+"""Deterministic clinical pre-screen of a weekly plan.
+
+Everything in a ``ClinicalReport`` that is arithmetic (energy balance, weight
+projection, macro adequacy, plan consistency, hard safety flags) is computed here
+over day x meal arrays for the whole week at once. Gemini is left with the
+narrative, from a compact summary, or skipped entirely for a template narrative.
+"""
+
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.plan import ClinicalReport, UserProfile, WeeklyPlan
+from app.services.food_db import FoodTable, load_foods, restriction_tags
+from app.services.food_index import normalize, term_pattern
+from app.services.nutrition_metrics import KCAL_PER_G, compute_targets, profile_factors
+
+KCAL_PER_KG = 7700.0
+MAX_SAFE_DEFICIT = 1000.0
+MAX_SURPLUS = 750.0
+DECLARED_TOLERANCE = 0.05
+ATWATER_TOLERANCE = 0.20
+PROTEIN_RANGE = (0.8, 2.2)
+PROTEIN_EXCESS = 2.5
+FAT_SHARE_RANGE = (0.20, 0.40)
+CARB_SHARE_MIN = 0.30
+SHARE_SLACK = 0.05
+DIABETES_CARB_SHARE = 0.50
+
+
+@dataclass
+class ClinicalAssessment:
+    tdee: float
+    average_calories: float
+    daily_deficit: float
+    weight_projection: float
+    macro_shares: Dict[str, float]
+    protein_per_kg: float
+    adequacies: List[str] = field(default_factory=list)
+    deficiencies: List[str] = field(default_factory=list)
+    risks: List[str] = field(default_factory=list)
+    warnings: List[str] = field(default_factory=list)
+    insights: List[str] = field(default_factory=list)
+    profile_summary: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def score(self) -> float:
+        penalty = 15 * len(self.risks) + 5 * len(self.warnings) + 5 * len(self.deficiencies)
+        return float(max(0, min(100, 100 - penalty)))
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact input for the narrative prompt: a few hundred bytes instead of profile + plan JSON."""
+        return {
+            **self.profile_summary,
+            "tdee": round(self.tdee),
+            "avgCalories": round(self.average_calories),
+            "dailyDeficit": round(self.daily_deficit),
+            "weeklyChangeKg": self.weight_projection,
+            "macroPct": {k: round(v * 100) for k, v in self.macro_shares.items()},
+            "proteinPerKg": self.protein_per_kg,
+            "flags": self.risks + self.warnings,
+        }
+
+    def to_report(self, narrative: Optional[Dict[str, Any]] = None) -> ClinicalReport:
+        """Report from the computed fields, with the template narrative unless Gemini supplied one."""
+        narrative = narrative or {}
+        extra_risks = [r for r in narrative.get("risks") or [] if r not in self.risks]
+        return ClinicalReport(
+            id=str(uuid.uuid4()),
+            generatedAt=datetime.now(timezone.utc).isoformat(),
+            overallScore=self.score,
+            weightProjection=self.weight_projection,
+            dailyDeficit=round(self.daily_deficit, 1),
+            micronutrientAnalysis={
+                "deficiencies": self.deficiencies,
+                "adequacies": self.adequacies,
+                "notes": narrative.get("notes") or self._notes(),
+                "macroShares": {k: round(v, 3) for k, v in self.macro_shares.items()},
+                "proteinPerKg": self.protein_per_kg,
+            },
+            behavioralInsights=list(narrative.get("behavioralInsights") or self.insights),
+            risks=self.risks + self.warnings + extra_risks,
+        )
+
+    def _notes(self) -> str:
+        shares = ", ".join(f"{k} {v * 100:.0f}%" for k, v in self.macro_shares.items())
+        return f"Energy from {shares}; micronutrients are not estimated by the local screen."
+
+
+def _plan_arrays(plan: WeeklyPlan) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(days, meals, 4) meal values, a validity mask and the (days, 4) declared day totals."""
+    max_meals = max((len(day.meals) for day in plan.days), default=0)
+    meals = np.zeros((len(plan.days), max_meals, 4))
+    mask = np.zeros((len(plan.days), max_meals), dtype=bool)
+    declared = np.zeros((len(plan.days), 4))
+    for d, day in enumerate(plan.days):
+        declared[d] = (day.dailyCalories, day.dailyMacros.protein, day.dailyMacros.carbs, day.dailyMacros.fats)
+        for m, meal in enumerate(day.meals):
+            meals[d, m] = (meal.calories, meal.macros.protein, meal.macros.carbs, meal.macros.fats)
+            mask[d, m] = True
+    return meals, mask, declared
+
+
+def _day_names(plan: WeeklyPlan, flags: np.ndarray) -> str:
+    return ", ".join(plan.days[i].day for i in np.flatnonzero(flags))
+
+
+def _allergen_pattern(profile: UserProfile, table: FoodTable) -> Optional[re.Pattern]:
+    routine = profile.routine or {}
+    phrases = [*(routine.get("allergies") or []), *((profile.clinical or {}).get("allergies") or [])]
+    return term_pattern(table, restriction_tags(phrases), phrases)
+
+
+def assess(profile: UserProfile, plan: WeeklyPlan, table: Optional[FoodTable] = None) -> ClinicalAssessment:
+    payload = profile.model_dump()
+    targets = compute_targets(payload)
+    factors = profile_factors(payload)
+    conditions = " ".join(str(c).lower() for c in (profile.clinical or {}).get("medicalConditions") or [])
+    goal = str((profile.goals or {}).get("primary") or "maintain").lower()
+
+    meals, mask, declared = _plan_arrays(plan)
+    summed = meals.sum(axis=1)  # padded meals are zeros
+    days = max(len(plan.days), 1)
+    average = summed.sum(axis=0) / days
+    avg_kcal, avg_protein, avg_carbs, avg_fats = (float(v) for v in average)
+    macro_kcal = np.array([KCAL_PER_G["protein"], KCAL_PER_G["carbs"], KCAL_PER_G["fats"]]) * average[1:]
+    shares = macro_kcal / max(macro_kcal.sum(), 1.0)
+
+    deficit = targets.tdee - avg_kcal
+    result = ClinicalAssessment(
+        tdee=targets.tdee,
+        average_calories=round(avg_kcal, 1),
+        daily_deficit=deficit,
+        weight_projection=round(-deficit * 7 / KCAL_PER_KG, 2),
+        macro_shares={"protein": float(shares[0]), "carbs": float(shares[1]), "fats": float(shares[2])},
+        protein_per_kg=round(avg_protein / factors["weight"], 2),
+        profile_summary={
+            "goal": goal,
+            "age": factors["age"],
+            "sex": (profile.biometrics or {}).get("gender"),
+            "conditions": (profile.clinical or {}).get("medicalConditions") or [],
+            "medications": (profile.clinical or {}).get("medications") or [],
+        },
+    )
+    if not plan.days:
+        result.risks.append("Plan has no days to evaluate.")
+        return result
+
+    # Consistency: declared day totals vs the sum of meals, and meal kcal vs Atwater energy of its macros.
+    mismatch = np.abs(declared[:, 0] - summed[:, 0]) > np.maximum(DECLARED_TOLERANCE * summed[:, 0], 10.0)
+    if mismatch.any():
+        result.warnings.append(f"dailyCalories differs from the sum of meals on {_day_names(plan, mismatch)}.")
+    atwater = meals[:, :, 1:] @ np.array([KCAL_PER_G["protein"], KCAL_PER_G["carbs"], KCAL_PER_G["fats"]])
+    inconsistent = mask & (meals[:, :, 0] > 50) & (np.abs(atwater - meals[:, :, 0]) > ATWATER_TOLERANCE * meals[:, :, 0])
+    if inconsistent.any():
+        result.warnings.append(f"{int(inconsistent.sum())} meals list calories that do not match their macros.")
+
+    # Hard safety flags.
+    low_days = summed[:, 0] < factors["floor"]
+    if low_days.any():
+        result.risks.append(f"Intake below the {factors['floor']:.0f} kcal safety floor on {_day_names(plan, low_days)}.")
+    if deficit > MAX_SAFE_DEFICIT:
+        result.risks.append(f"Average deficit of {deficit:.0f} kcal/day exceeds {MAX_SAFE_DEFICIT:.0f} kcal.")
+    elif -deficit > MAX_SURPLUS:
+        result.warnings.append(f"Average surplus of {-deficit:.0f} kcal/day.")
+    if ("kidney" in conditions or "renal" in conditions) and result.protein_per_kg > 0.9:
+        result.risks.append(f"Protein {result.protein_per_kg} g/kg is high for kidney disease (target <= 0.8 g/kg).")
+    if "diabet" in conditions and shares[1] > DIABETES_CARB_SHARE:
+        result.risks.append(f"Carbohydrates provide {shares[1] * 100:.0f}% of energy; keep below 50% with diabetes.")
+    allergens = _allergen_pattern(profile, table or load_foods())
+    if allergens:
+        hits = [
+            f"{meal.name} ({day.day})"
+            for day in plan.days
+            for meal in day.meals
+            if allergens.search(normalize(f"{meal.name} {meal.description or ''}"))
+        ]
+        if hits:
+            result.risks.append(f"Possible allergen in: {', '.join(hits[:5])}.")
+
+    # Macro adequacy.
+    low_protein, high_protein = PROTEIN_RANGE
+    if result.protein_per_kg < low_protein:
+        result.deficiencies.append("protein")
+    elif result.protein_per_kg > PROTEIN_EXCESS:
+        result.warnings.append(f"Protein {result.protein_per_kg} g/kg is above {PROTEIN_EXCESS} g/kg.")
+    elif result.protein_per_kg <= high_protein:
+        result.adequacies.append("protein")
+    keto = factors["carb_cap"] <= 0.1
+    carb_low, carb_high = (0.0 if keto else CARB_SHARE_MIN), factors["carb_cap"] + SHARE_SLACK
+    if shares[1] < carb_low:
+        result.deficiencies.append("carbohydrates")
+    elif shares[1] > carb_high:
+        result.warnings.append(f"Carbohydrates provide {shares[1] * 100:.0f}% of energy, above the {carb_high * 100:.0f}% target.")
+    else:
+        result.adequacies.append("carbohydrates")
+    if keto or FAT_SHARE_RANGE[0] <= shares[2] <= FAT_SHARE_RANGE[1]:
+        result.adequacies.append("fats")
+    else:
+        result.deficiencies.append("fats" if shares[2] < FAT_SHARE_RANGE[0] else "fat excess")
+
+    result.insights = _template_insights(result, summed[:, 0], profile, goal)
+    return result
+
+
+def _template_insights(result: ClinicalAssessment, daily_kcal: np.ndarray, profile: UserProfile, goal: str) -> List[str]:
+    direction = "deficit" if result.daily_deficit >= 0 else "surplus"
+    insights = [
+        f"Average intake is {result.average_calories:.0f} kcal against about {result.tdee:.0f} kcal expended "
+        f"({abs(result.daily_deficit):.0f} kcal {direction} per day).",
+        f"At this intake body weight changes about {result.weight_projection:+.2f} kg per week.",
+    ]
+    variation = float(daily_kcal.std() / max(daily_kcal.mean(), 1.0))
+    if variation > 0.15:
+        insights.append("Calories swing a lot between days; steadier days make hunger easier to manage.")
+    else:
+        insights.append("Daily calories are consistent across the week, which supports adherence.")
+    weight = (profile.biometrics or {}).get("weight")
+    target = (profile.goals or {}).get("targetWeight")
+    try:
+        gap = float(target) - float(weight)
+    except (TypeError, ValueError):
+        gap = 0.0
+    if gap and result.weight_projection and gap * result.weight_projection > 0:
+        insights.append(f"At this pace the target weight is about {abs(gap / result.weight_projection):.0f} weeks away.")
+    elif goal == "loss" and result.weight_projection >= 0:
+        insights.append("The plan does not create a deficit yet; portions need to shrink to reach the goal.")
+    return insights
+
+
+def narrative_needed(assessment: ClinicalAssessment, mode: Optional[str] = None) -> bool:
+    """``auto`` asks Gemini only when there is something clinical to explain."""
+    mode = mode or settings.clinical_narrative_mode
+    if mode == "template":
+        return False
+    if mode == "llm":
+        return True
+    return bool(assessment.risks or assessment.profile_summary.get("conditions"))
@@ -0,0 +1,181 @@
+"""Bundled food composition table.
+
+``foods.csv`` is the editable source; it is compiled once into a structured ``.npy``
+file that every process memory-maps read-only, so API and worker processes share the
+same pages instead of each parsing the CSV. The file lives in
+``settings.food_db_cache_dir`` (the system temp dir by default, never the package) and
+is named by the CSV's content hash, so an edited CSV gets a new file instead of a stale
+check. The image builds it with ``python -m app.services.food_db``; a process that finds
+it missing writes it atomically, and on a read-only filesystem parses the CSV in memory.
+"""
+
+import csv
+import hashlib
+import re
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+FOODS_CSV = Path(__file__).resolve().parent.parent / "data" / "foods.csv"
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("name", "U48"),
+        ("aliases", "U256"),
+        ("category", "U16"),
+        ("slots", "U8"),
+        ("per_100g", "f8", (4,)),
+        ("portion_g", "f8"),
+        ("tags", "U96"),
+    ]
+)
+
+# Columns of FoodTable.per_100g.
+KCAL, PROTEIN, CARBS, FAT = range(4)
+
+# Free-text allergy/intolerance/cultural words mapped to the tags they exclude.
+RESTRICTION_TAGS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    (r"peanuts?|amendoim", ("peanut",)),
+    (r"nuts?|tree nuts?|castanhas?|nozes|amendoas?", ("nuts",)),
+    (r"gluten|wheat|trigo|celiac|cel[ií]aca?", ("gluten",)),
+    (r"lactose|dairy|milk|leite|latic[ií]nios", ("lactose",)),
+    (r"eggs?|ovos?", ("egg",)),
+    (r"soy|soja", ("soy",)),
+    (r"fish|peixes?", ("fish",)),
+    (r"shellfish|shrimp|crustaceans?|camar[aã]o|frutos do mar|seafood", ("shellfish",)),
+    (r"sesame|gergelim", ("sesame",)),
+    (r"pork|porco|halal", ("pork",)),
+    (r"kosher", ("pork", "shellfish")),
+)
+_RESTRICTION_PATTERNS = [(re.compile(rf"\b(?:{words})\b"), tags) for words, tags in RESTRICTION_TAGS]
+
+
+@dataclass(frozen=True)
+class FoodTable:
+    """Column-oriented food composition table; nutrient values are per 100 g.
+
+    The array columns are views of the (memory-mapped) records; only the split alias
+    and tag sets are built per process.
+    """
+
+    names: np.ndarray
+    aliases: Tuple[Tuple[str, ...], ...]
+    categories: np.ndarray
+    slots: np.ndarray
+    per_100g: np.ndarray
+    portion_g: np.ndarray
+    tags: Tuple[frozenset, ...]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def mask(self, categories: Iterable[str], slot: str = "") -> np.ndarray:
+        selected = np.isin(self.categories, list(categories))
+        if slot:
+            selected &= np.char.find(self.slots, slot) >= 0
+        return selected
+
+    def allowed(self, preference: str = "", excluded_tags: Iterable[str] = (), dislikes: Iterable[str] = ()) -> np.ndarray:
+        """Boolean mask of foods compatible with a dietary preference, excluded tags and disliked words."""
+        excluded = set(excluded_tags)
+        words = [w.strip().lower() for w in dislikes if w and w.strip()]
+        keep = np.ones(len(self), dtype=bool)
+        for i, tags in enumerate(self.tags):
+            if preference == "vegan" and "vegan" not in tags:
+                keep[i] = False
+            elif preference == "vegetarian" and not tags & {"vegan", "vegetarian"}:
+                keep[i] = False
+            elif preference == "pescatarian" and "meat" in tags:
+                keep[i] = False
+            elif tags & excluded:
+                keep[i] = False
+            elif words and any(w in name for w in words for name in (self.names[i], *self.aliases[i])):
+                keep[i] = False
+        return keep
+
+
+def restriction_tags(phrases: Iterable[str]) -> set:
+    """Tags excluded by free-text allergies, intolerances or cultural restrictions."""
+    excluded: set = set()
+    for phrase in phrases:
+        text = str(phrase or "").lower()
+        for pattern, tags in _RESTRICTION_PATTERNS:
+            if pattern.search(text):
+                excluded.update(tags)
+    return excluded
+
+
+def _records_from_csv(path: Path) -> np.ndarray:
+    with open(path, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    for i, r in enumerate(rows):
+        records[i] = (
+            r["name"],
+            r["aliases"],
+            r["category"],
+            r["slots"],
+            (float(r["kcal"]), float(r["protein"]), float(r["carbs"]), float(r["fat"])),
+            float(r["portion_g"]),
+            r["tags"],
+        )
+    return records
+
+
+def cache_dir() -> Path:
+    return Path(settings.food_db_cache_dir or Path(tempfile.gettempdir()) / "mas-food-db")
+
+
+def cache_path(csv_path: Path = FOODS_CSV) -> Path:
+    digest = hashlib.sha256(csv_path.read_bytes()).hexdigest()[:16]
+    return cache_dir() / f"{csv_path.stem}-{digest}.npy"
+
+
+def compile_cache(csv_path: Path = FOODS_CSV, target: Path | None = None) -> Path:
+    """Write the CSV as a structured array through a temp file and rename.
+
+    Readers never see a partial file, and workers racing to build it each rename a
+    complete, identical copy.
+    """
+    target = target or cache_path(csv_path)
+    records = _records_from_csv(csv_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=target.parent, suffix=".npy.tmp", delete=False) as fh:
+        np.save(fh, records)
+    Path(fh.name).replace(target)
+    return target
+
+
+def _load_records(csv_path: Path) -> np.ndarray:
+    try:
+        target = cache_path(csv_path)
+        if not target.exists():
+            compile_cache(csv_path, target)
+        return np.load(target, mmap_mode="r")
+    except OSError:
+        # Read-only filesystem without a prebuilt cache: fall back to parsing in memory.
+        return _records_from_csv(csv_path)
+
+
+@lru_cache(maxsize=1)
+def load_foods(path: str = str(FOODS_CSV)) -> FoodTable:
+    records = _load_records(Path(path))
+    return FoodTable(
+        names=records["name"],
+        aliases=tuple(tuple(a for a in str(r).split("|") if a) for r in records["aliases"]),
+        categories=records["category"],
+        slots=records["slots"],
+        per_100g=records["per_100g"],
+        portion_g=records["portion_g"],
+        tags=tuple(frozenset(t for t in str(r).split(";") if t) for r in records["tags"]),
+    )
+
+
+if __name__ == "__main__":
+    print(compile_cache())
@@ -0,0 +1,120 @@
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+from app.services.food_db import FoodTable, load_foods
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents: "Pão Francês" -> "pao frances"."""
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", str(text).lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize(text: str) -> str:
+    """``fold`` plus punctuation removal; the form index terms and queries are compared in."""
+    return _NON_WORD.sub(" ", fold(text)).strip()
+
+
+def term_pattern(table: FoodTable, tags: Set[str], phrases: Iterable[str] = ()) -> Optional[re.Pattern]:
+    """Whole-word regex over normalised text for ``phrases`` and every name/alias of foods tagged ``tags``."""
+    terms = {normalize(p) for p in phrases}
+    for name, aliases, food_tags in zip(table.names, table.aliases, table.tags):
+        if food_tags & tags:
+            terms.update(normalize(t) for t in (name, *aliases))
+    terms.discard("")
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(sorted(map(re.escape, terms), key=len, reverse=True)) + r")\b")
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class FoodMatch:
+    food: int
+    term: str
+    score: float
+
+
+class FoodIndex:
+    """Trigram inverted index over food names and aliases.
+
+    Exact (normalised) names resolve with a dict lookup; everything else scores the
+    terms sharing trigrams with the query, blending Dice similarity with how much of
+    the term appears in the query so "large ripe banana" still finds "banana".
+    """
+
+    def __init__(self, table: FoodTable):
+        terms: List[str] = []
+        foods: List[int] = []
+        for index, (name, aliases) in enumerate(zip(table.names, table.aliases)):
+            for term in {normalize(name), *(normalize(a) for a in aliases)}:
+                if term:
+                    terms.append(term)
+                    foods.append(index)
+        self.terms = terms
+        self.term_food = np.array(foods)
+        self.exact: Dict[str, int] = {}
+        for term, food in zip(terms, foods):
+            self.exact.setdefault(term, food)
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        sizes = []
+        for term_id, term in enumerate(terms):
+            grams = trigrams(term)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(term_id)
+        self.postings = {gram: np.array(ids) for gram, ids in postings.items()}
+        self.gram_counts = np.array(sizes, dtype=float)
+
+    def search(self, query: str, limit: int = 3) -> List[FoodMatch]:
+        """Best distinct foods for ``query``, highest score first (scores in [0, 1])."""
+        text = normalize(query)
+        if not text:
+            return []
+        if text in self.exact:
+            return [FoodMatch(self.exact[text], text, 1.0)]
+        grams = trigrams(text)
+        hits_by_gram = [self.postings[g] for g in grams if g in self.postings]
+        if not hits_by_gram:
+            return []
+        hits = np.bincount(np.concatenate(hits_by_gram), minlength=len(self.terms))
+        dice = 2.0 * hits / (len(grams) + self.gram_counts)
+        containment = hits / self.gram_counts
+        scores = 0.5 * dice + 0.5 * containment
+
+        matches: List[FoodMatch] = []
+        seen: Set[int] = set()
+        for term_id in np.argsort(-scores, kind="stable")[: limit * 4]:
+            food = int(self.term_food[term_id])
+            if scores[term_id] <= 0 or food in seen:
+                continue
+            seen.add(food)
+            matches.append(FoodMatch(food, self.terms[term_id], round(float(scores[term_id]), 3)))
+            if len(matches) == limit:
+                break
+        return matches
+
+    def best(self, query: str) -> Optional[FoodMatch]:
+        matches = self.search(query, limit=1)
+        return matches[0] if matches else None
+
+
+@lru_cache(maxsize=1)
+def default_index() -> FoodIndex:
+    return FoodIndex(load_foods())
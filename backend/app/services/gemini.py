@@ -1,16 +1,15 @@
 import json
 import time
-import uuid
 from typing import Optional
 
-import google.generativeai as genai
-
+from app.core import deadline
 from app.core.config import settings
-from app.schemas.plan import ClinicalReport, PlanRequest, WeeklyPlan
-
-
-def _configure_client() -> None:
-    genai.configure(api_key=settings.gemini_api_key)
+from app.core.resources import resources
+from app.core.metrics import GEMINI_CALL_SECONDS, GEMINI_CIRCUIT_OPEN, GEMINI_RETRIES, GEMINI_TOKENS
+from app.core.tracing import tracer
+from app.schemas.plan import ClinicalReport, MealEstimate, PlanRequest, WeeklyPlan
+from app.services import llm_usage, prompts
+from app.services.clinical_rules import ClinicalAssessment
 
 
 _circuit_state = {"failures": 0, "opened_at": 0.0}
@@ -24,11 +23,13 @@ def _record_failure() -> None:
     _circuit_state["failures"] += 1
     if _circuit_state["failures"] >= settings.gemini_circuit_threshold:
         _circuit_state["opened_at"] = time.time()
+        GEMINI_CIRCUIT_OPEN.set(1)
 
 
 def _record_success() -> None:
     _circuit_state["failures"] = 0
     _circuit_state["opened_at"] = 0.0
+    GEMINI_CIRCUIT_OPEN.set(0)
 
 
 def _ensure_circuit_closed() -> None:
@@ -38,22 +39,71 @@ def _ensure_circuit_closed() -> None:
         _record_success()
 
 
-def _retry_call(fn, attempts: int, backoff: float):
-    last_exc: Exception | None = None
-    _ensure_circuit_closed()
-    for i in range(attempts):
+def _record_usage(response, operation: str) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    counts = {
+        "prompt": getattr(usage, "prompt_token_count", 0) or 0,
+        "response": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached": getattr(usage, "cached_content_token_count", 0) or 0,
+    }
+    GEMINI_TOKENS.labels(operation=operation, kind="prompt").inc(counts["prompt"])
+    GEMINI_TOKENS.labels(operation=operation, kind="response").inc(counts["response"])
+    return counts
+
+
+def _request_options() -> dict:
+    """Per-request timeout capped by the deadline, so a call whose caller gave up (a timed-out
+    or losing hedged attempt; the thread itself cannot be cancelled) stops with it."""
+    return {"timeout": max(deadline.bounded(settings.gemini_timeout), 0.1)}
+
+
+def _retry_call(fn, attempts: int, backoff: float, operation: str = "generate", model: Optional[str] = None) -> str:
+    """Call ``fn`` (returning a Gemini response) with retries; returns the response text.
+
+    Every call, failed or not, ends in one usage ledger record.
+    """
+    model = model or settings.gemini_model
+    started = time.perf_counter()
+    outcome = "error"
+    tried = 0
+    usage: dict = {}
+    with tracer.start_as_current_span("gemini.call") as span:
+        span.set_attribute("model", model)
+        span.set_attribute("operation", operation)
         try:
-            result = fn()
-            _record_success()
-            return result
-        except Exception as exc:  # pragma: no cover - external call
-            _record_failure()
-            last_exc = exc
-            if i == attempts - 1:
-                raise
-            time.sleep(backoff**i)
-    if last_exc:
-        raise last_exc
+            last_exc: Exception | None = None
+            _ensure_circuit_closed()
+            deadline.check(f"gemini {operation}")
+            for i in range(attempts):
+                tried = i + 1
+                span.set_attribute("attempts", tried)
+                if i:
+                    GEMINI_RETRIES.labels(operation=operation).inc()
+                try:
+                    response = fn()
+                    usage = _record_usage(response, operation)
+                    _record_success()
+                    outcome = "success"
+                    return response.text or "{}"
+                except Exception as exc:  # pragma: no cover - external call
+                    _record_failure()
+                    span.record_exception(exc)
+                    last_exc = exc
+                    left = deadline.remaining()
+                    if i == attempts - 1 or (left is not None and backoff**i >= left):
+                        raise
+                    time.sleep(backoff**i)
+            if last_exc:
+                raise last_exc
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            GEMINI_CALL_SECONDS.labels(operation=operation, outcome=outcome).observe(elapsed)
+            llm_usage.record_call(model, operation, outcome, tried, elapsed, usage)
 
 
 def _parse_weekly_plan(text: str) -> WeeklyPlan:
@@ -66,44 +116,115 @@ def _parse_clinical_report(text: str) -> ClinicalReport:
     return ClinicalReport.model_validate(data)
 
 
-def generate_weekly_plan(req: PlanRequest) -> Optional[WeeklyPlan]:
-    """Call Gemini to generate a weekly plan with retry and schema validation."""
-    _configure_client()
-    model = genai.GenerativeModel(settings.gemini_model)
-    prompt = (
-        "Return ONLY valid JSON for a 7-day meal plan matching this profile. "
-        "Fields: days[{day, meals[{name,description,calories,macros{protein,carbs,fats}}]}, "
-        "recommendations]."
-        f"Profile: {req.profile.model_dump_json()}"
-    )
+def generate_weekly_plan(
+    req: PlanRequest, skeleton: Optional[WeeklyPlan] = None, history: str = "", model: Optional[str] = None
+) -> Optional[WeeklyPlan]:
+    """Call Gemini to generate a weekly plan with retry and schema validation.
+
+    With a ``skeleton`` (from the local plan engine) Gemini only personalises it.
+    ``history`` is the profile's agent memory; it is dropped first when over budget.
+    ``model`` overrides ``settings.gemini_model`` (a smaller model for tenants over budget).
+    """
+    llm = resources.llm(model)
+    profile = prompts.Section("Profile", prompts.profile_context(req.profile, prompts.PLAN_PROFILE))
+    memory = [prompts.Section("History", history, required=False)] if history else []
+    if skeleton is not None:
+        prompt = prompts.build(
+            "weekly_plan",
+            "Return ONLY valid JSON shaped "
+            f"{prompts.PLAN_SCHEMA} personalising this draft 7-day meal plan for the profile: rename dishes, "
+            "adjust descriptions and recommendations to its preferences, keeping each meal's calories and "
+            "macros within 10% of the draft row.",
+            [
+                profile,
+                prompts.Section(f"Draft ({prompts.MEAL_HEADER})", prompts.meal_rows(skeleton)),
+                prompts.Section("Draft descriptions", prompts.meal_descriptions(skeleton), required=False),
+                *memory,
+            ],
+        )
+    else:
+        prompt = prompts.build(
+            "weekly_plan",
+            f"Return ONLY valid JSON shaped {prompts.PLAN_SCHEMA} for a 7-day meal plan matching this profile.",
+            [profile, *memory],
+        )
 
     def _call():
-        response = model.generate_content(prompt)
-        return response.text or "{}"
+        return llm.generate_content(prompt, request_options=_request_options())
 
-    raw = _retry_call(_call, attempts=settings.gemini_retries, backoff=settings.gemini_backoff_base)
+    raw = _retry_call(
+        _call, attempts=settings.gemini_retries, backoff=settings.gemini_backoff_base, operation="weekly_plan", model=model
+    )
     try:
         return _parse_weekly_plan(raw)
     except Exception as exc:  # pragma: no cover - validation path
         raise ValueError(f"Failed to parse weekly plan: {exc}") from exc
 
 
-def generate_clinical_report(req: PlanRequest, plan: WeeklyPlan) -> Optional[ClinicalReport]:
-    _configure_client()
-    model = genai.GenerativeModel(settings.gemini_model)
-    prompt = (
-        "Return ONLY valid JSON for a clinical report with fields: "
-        "overallScore, weightProjection, dailyDeficit, micronutrientAnalysis{deficiencies,adequacies,notes}, "
-        "behavioralInsights, risks."
-        f"Profile: {req.profile.model_dump_json()} Plan: {plan.model_dump_json()}"
-    )
+def generate_clinical_report(
+    req: PlanRequest, plan: WeeklyPlan, assessment: Optional[ClinicalAssessment] = None, model: Optional[str] = None
+) -> Optional[ClinicalReport]:
+    """Clinical report from Gemini.
+
+    With an ``assessment`` from ``clinical_rules`` the numbers are already computed and
+    Gemini only writes the narrative from a compact summary.
+    """
+    llm = resources.llm(model)
+    if assessment is not None:
+        prompt = prompts.build(
+            "clinical_narrative",
+            "Return ONLY valid JSON with fields behavioralInsights (3-5 short strings), "
+            "risks (clinical cautions beyond the listed flags, may be empty) and notes (one sentence) "
+            "for this nutrition plan summary.",
+            [prompts.Section("Summary", prompts.compact_json(assessment.summary()))],
+        )
+    else:
+        prompt = prompts.build(
+            "clinical_report",
+            "Return ONLY valid JSON for a clinical report with fields: "
+            "overallScore, weightProjection, dailyDeficit, micronutrientAnalysis{deficiencies,adequacies,notes}, "
+            "behavioralInsights, risks.",
+            [
+                prompts.Section("Profile", prompts.profile_context(req.profile, prompts.CLINICAL_PROFILE)),
+                prompts.Section("Daily totals (day|kcal|p|c|f)", prompts.day_totals(plan)),
+                prompts.Section(f"Meals ({prompts.MEAL_HEADER})", prompts.meal_rows(plan), required=False),
+            ],
+        )
 
     def _call():
-        response = model.generate_content(prompt)
-        return response.text or "{}"
-
-    raw = _retry_call(_call, attempts=settings.gemini_retries, backoff=settings.gemini_backoff_base)
+        return llm.generate_content(prompt, request_options=_request_options())
+
+    raw = _retry_call(
+        _call,
+        attempts=settings.gemini_retries,
+        backoff=settings.gemini_backoff_base,
+        operation="clinical_narrative" if assessment is not None else "clinical_report",
+        model=model,
+    )
     try:
+        if assessment is not None:
+            return assessment.to_report(json.loads(raw))
         return _parse_clinical_report(raw)
     except Exception as exc:  # pragma: no cover - validation path
         raise ValueError(f"Failed to parse clinical report: {exc}") from exc
+
+
+def estimate_meal(description: str, model: Optional[str] = None) -> MealEstimate:
+    """Ask Gemini for calories and macros of a free-text meal the local parser could not resolve."""
+    llm = resources.llm(model)
+    prompt = prompts.build(
+        "meal_estimate",
+        "Return ONLY valid JSON with fields calories, protein, carbs, fats (grams) estimating this meal.",
+        [prompts.Section("Meal", description)],
+    )
+
+    def _call():
+        return llm.generate_content(prompt, request_options=_request_options())
+
+    raw = _retry_call(
+        _call, attempts=settings.gemini_retries, backoff=settings.gemini_backoff_base, operation="meal_estimate", model=model
+    )
+    try:
+        return MealEstimate.model_validate(json.loads(raw))
+    except Exception as exc:  # pragma: no cover - validation path
+        raise ValueError(f"Failed to parse meal estimate: {exc}") from exc
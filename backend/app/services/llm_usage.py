@@ -0,0 +1,244 @@
+"""Gemini usage ledger, per-day counters and budgets.
+
+Every Gemini call produces one ``UsageRecord``, attributed to the tenant, profile and
+correlation id of the ``usage_scope`` it runs in. Records are buffered per process and
+written in batches, one Redis pipeline per batch:
+- appended to the ``llm:usage`` stream, the append-only ledger (trimmed to about
+  ``settings.llm_usage_retention`` entries);
+- added to the tenant's and the profile's counters for the UTC day.
+
+``check_budget`` reads those counters before a plan is queued. Counters lag by at most
+one buffered batch, so a budget is a soft limit, not a hard cap.
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+import orjson
+import structlog
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.metrics import LLM_BUDGET_DECISIONS, LLM_USAGE_RECORDS
+from app.core.resources import resources
+
+logger = structlog.get_logger()
+
+STREAM_KEY = "llm:usage"
+COUNTER_TTL_SECONDS = 2 * 24 * 3600
+COUNTER_FIELDS = ("calls", "tokens", "prompt_tokens", "response_tokens", "latency_ms", "attempts")
+
+
+@dataclass(frozen=True)
+class Account:
+    tenant_id: Optional[str] = None
+    profile_id: Optional[str] = None
+    correlation_id: Optional[str] = None
+
+
+_account: ContextVar[Account] = ContextVar("llm_account", default=Account())
+
+
+@contextmanager
+def usage_scope(tenant_id: Optional[str] = None, profile_id: Optional[str] = None, correlation_id: Optional[str] = None) -> Iterator[None]:
+    """Attribute Gemini calls made in the block (including ``to_thread`` calls) to this account."""
+    token = _account.set(Account(tenant_id, profile_id, correlation_id))
+    try:
+        yield
+    finally:
+        _account.reset(token)
+
+
+def current_account() -> Account:
+    return _account.get()
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    ts: float
+    model: str
+    operation: str
+    outcome: str
+    attempts: int
+    latency_ms: int
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    cached_tokens: int = 0
+    tenant_id: Optional[str] = None
+    profile_id: Optional[str] = None
+    correlation_id: Optional[str] = None
+
+    @property
+    def cache(self) -> str:
+        """Whether Gemini served part of the prompt from its context cache."""
+        return "hit" if self.cached_tokens else "miss"
+
+
+def day_window(at: Optional[float] = None) -> str:
+    return datetime.fromtimestamp(at if at is not None else time.time(), timezone.utc).strftime("%Y%m%d")
+
+
+def counter_key(scope: str, owner: str, window: str) -> str:
+    return f"llm:usage:{scope}:{owner}:{window}"
+
+
+def seconds_to_window_end(at: Optional[float] = None) -> int:
+    now = datetime.fromtimestamp(at if at is not None else time.time(), timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+class UsageLedger:
+    """Per-process buffer of usage records; ``record`` never raises and rarely does I/O.
+
+    A batch is written when it holds ``settings.llm_usage_batch`` records or its oldest
+    record is ``settings.llm_usage_flush_interval`` old, and on ``flush`` (end of a plan
+    task, process exit). Writes use the blocking client, so they are safe from the
+    threads Gemini calls run in.
+    """
+
+    def __init__(self, client: Optional[SyncRedis] = None):
+        self.client = client
+        self._buffer: List[UsageRecord] = []
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, record: UsageRecord) -> None:
+        with self._lock:
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(record)
+            due = len(self._buffer) >= settings.llm_usage_batch or time.monotonic() - self._oldest >= settings.llm_usage_flush_interval
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+        client = self.client or resources.sync_redis
+        pipe = client.pipeline(transaction=False)
+        touched = set()
+        for record in batch:
+            pipe.xadd(STREAM_KEY, {"json": orjson.dumps(asdict(record))}, maxlen=settings.llm_usage_retention, approximate=True)
+            window = day_window(record.ts)
+            counts = {
+                "calls": 1,
+                "tokens": record.prompt_tokens + record.response_tokens,
+                "prompt_tokens": record.prompt_tokens,
+                "response_tokens": record.response_tokens,
+                "latency_ms": record.latency_ms,
+                "attempts": record.attempts,
+            }
+            for scope, owner in (("tenant", record.tenant_id), ("profile", record.profile_id)):
+                if not owner:
+                    continue
+                key = counter_key(scope, owner, window)
+                for name, value in counts.items():
+                    if value:
+                        pipe.hincrby(key, name, value)
+                touched.add(key)
+        for key in touched:
+            pipe.expire(key, COUNTER_TTL_SECONDS)
+        try:
+            pipe.execute()
+        except RedisError as exc:
+            LLM_USAGE_RECORDS.labels(result="dropped").inc(len(batch))
+            logger.warning("llm_usage_flush_failed", records=len(batch), error=str(exc))
+            return 0
+        LLM_USAGE_RECORDS.labels(result="written").inc(len(batch))
+        return len(batch)
+
+
+ledger = UsageLedger()
+atexit.register(ledger.flush)
+
+
+def record_call(
+    model: str, operation: str, outcome: str, attempts: int, seconds: float, usage: Optional[Dict[str, int]] = None
+) -> None:
+    """Ledger entry for one Gemini call (all attempts), attributed to the current ``usage_scope``."""
+    account = _account.get()
+    usage = usage or {}
+    ledger.record(
+        UsageRecord(
+            ts=time.time(),
+            model=model,
+            operation=operation,
+            outcome=outcome,
+            attempts=attempts,
+            latency_ms=int(seconds * 1000),
+            prompt_tokens=usage.get("prompt", 0),
+            response_tokens=usage.get("response", 0),
+            cached_tokens=usage.get("cached", 0),
+            tenant_id=account.tenant_id,
+            profile_id=account.profile_id,
+            correlation_id=account.correlation_id,
+        )
+    )
+
+
+async def usage_today(redis: Redis, scope: str, owner: str) -> Dict[str, int]:
+    raw = await redis.hgetall(counter_key(scope, owner, day_window()))
+    return {name: int(raw.get(name.encode(), 0)) for name in COUNTER_FIELDS}
+
+
+@dataclass(frozen=True)
+class BudgetDecision:
+    """``allow``, ``downgrade`` (to ``model``, or to the local ``engine``) or ``reject``."""
+
+    action: str = "allow"
+    reason: Optional[str] = None
+    engine: Optional[str] = None
+    model: Optional[str] = None
+    retry_after: int = 0
+
+
+ALLOW = BudgetDecision()
+
+
+def _limits(tenant_id: Optional[str], profile_id: Optional[str]) -> List[tuple]:
+    limits = [
+        ("tenant", tenant_id, "tokens", settings.llm_budget_tenant_tokens),
+        ("tenant", tenant_id, "latency_ms", int(settings.llm_budget_tenant_seconds * 1000)),
+        ("profile", profile_id, "tokens", settings.llm_budget_profile_tokens),
+    ]
+    return [limit for limit in limits if limit[1] and limit[3] > 0]
+
+
+async def check_budget(redis: Redis, tenant_id: Optional[str], profile_id: Optional[str]) -> BudgetDecision:
+    """Compare today's counters with the configured budgets; allows when Redis cannot answer."""
+    limits = _limits(tenant_id, profile_id)
+    if not limits:
+        return ALLOW
+    window = day_window()
+    pipe = redis.pipeline(transaction=False)
+    for scope, owner, name, _ in limits:
+        pipe.hget(counter_key(scope, owner, window), name)
+    try:
+        values = await pipe.execute()
+    except RedisError as exc:
+        logger.warning("llm_budget_unavailable", error=str(exc))
+        return ALLOW
+    over = [f"{scope} {name} {int(value)}/{limit}" for (scope, _, name, limit), value in zip(limits, values) if int(value or 0) >= limit]
+    if not over:
+        decision = ALLOW
+    elif settings.llm_budget_action == "reject":
+        decision = BudgetDecision("reject", "; ".join(over), retry_after=seconds_to_window_end())
+    elif settings.llm_budget_fallback_model:
+        decision = BudgetDecision("downgrade", "; ".join(over), model=settings.llm_budget_fallback_model)
+    else:
+        decision = BudgetDecision("downgrade", "; ".join(over), engine="local")
+    LLM_BUDGET_DECISIONS.labels(action=decision.action).inc()
+    if over:
+        logger.info("llm_budget_exceeded", tenant_id=tenant_id, profile_id=profile_id, action=decision.action, reason=decision.reason)
+    return decision
@@ -0,0 +1,158 @@
+"""Free-text meal log parsing against the local food index.
+
+"2 slices of whole grain bread, 150g frango e uma banana" is split into items, each
+item's quantity and unit are normalised to grams, and the food is resolved through
+the trigram index. Every item carries its match score as confidence so callers can
+send only the uncertain ones to an LLM.
+"""
+
+import re
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import List, Optional
+
+import numpy as np
+
+from app.schemas.plan import MacroBreakdown
+from app.services.food_db import CARBS, FAT, KCAL, PROTEIN, FoodTable, load_foods
+from app.services.food_index import FoodIndex, default_index, fold
+
+# Canonical unit -> aliases (accent-free, as produced by ``fold``).
+UNIT_ALIASES = {
+    "g": ("g", "gr", "grams", "gram", "gramas", "grama"),
+    "kg": ("kg", "kilo", "kilos", "quilo", "quilos"),
+    "mg": ("mg",),
+    "ml": ("ml", "mls"),
+    "l": ("l", "litre", "liter", "litro", "litros"),
+    "oz": ("oz", "ounce", "ounces"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "cup": ("cup", "cups", "xicara", "xicaras", "copo", "copos"),
+    "tbsp": ("tbsp", "tablespoon", "tablespoons", "colher de sopa", "colheres de sopa", "colher", "colheres"),
+    "tsp": ("tsp", "teaspoon", "teaspoons", "colher de cha", "colheres de cha"),
+    "slice": ("slice", "slices", "fatia", "fatias"),
+    "piece": ("piece", "pieces", "pc", "pcs", "unit", "units", "unidade", "unidades", "pedaco", "pedacos"),
+    "serving": ("serving", "servings", "portion", "portions", "porcao", "porcoes", "prato", "pratos"),
+}
+UNIT_GRAMS = {"g": 1.0, "kg": 1000.0, "mg": 0.001, "ml": 1.0, "l": 1000.0, "oz": 28.35, "lb": 453.6, "tbsp": 15.0, "tsp": 5.0}
+CUP_GRAMS = {"carb": 160.0, "protein": 170.0, "vegetable": 90.0, "fruit": 150.0, "dairy": 245.0, "drink": 240.0}
+DEFAULT_CUP_GRAMS = 200.0
+SLICE_GRAMS = 30.0
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "um": 1, "uma": 1, "two": 2, "dois": 2, "duas": 2,
+    "three": 3, "tres": 3, "half": 0.5, "meia": 0.5, "meio": 0.5,
+}
+
+_UNIT_LOOKUP = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+_UNIT_RE = "|".join(sorted((re.escape(a) for a in _UNIT_LOOKUP), key=len, reverse=True))
+_WORD_RE = "|".join(NUMBER_WORDS)
+_LEADING = re.compile(
+    rf"^(?:(?P<qty>\d+(?:\.\d+)?(?:/\d+)?)\s*|(?P<word>{_WORD_RE})\s+)?"
+    rf"(?:(?P<unit>{_UNIT_RE})\b\s*)?(?:(?:of|de|do|da|dos|das)\s+)?(?P<food>.+)$"
+)
+_TRAILING = re.compile(rf"^(?P<food>.+?)\s+(?P<qty>\d+(?:\.\d+)?)\s*(?P<unit>{_UNIT_RE})?$")
+_NON_QUANTITY = re.compile(r"[^a-z0-9./]+")
+_SEPARATORS = re.compile(r"\s*(?:[,;+&\n]|\band\b|\bwith\b|\bplus\b|\be\b|\bcom\b|\bmais\b)\s*")
+
+
+@dataclass(frozen=True)
+class ParsedItem:
+    text: str
+    food: Optional[str]
+    grams: float
+    calories: float
+    macros: MacroBreakdown
+    confidence: float
+
+
+@dataclass
+class ParsedEntry:
+    items: List[ParsedItem] = field(default_factory=list)
+
+    @property
+    def calories(self) -> float:
+        return round(sum(i.calories for i in self.items), 1)
+
+    @property
+    def macros(self) -> MacroBreakdown:
+        return MacroBreakdown(
+            protein=round(sum(i.macros.protein for i in self.items), 1),
+            carbs=round(sum(i.macros.carbs for i in self.items), 1),
+            fats=round(sum(i.macros.fats for i in self.items), 1),
+        )
+
+    @property
+    def confidence(self) -> float:
+        return min((i.confidence for i in self.items), default=0.0)
+
+    def uncertain(self, threshold: float) -> List[ParsedItem]:
+        return [i for i in self.items if i.confidence < threshold]
+
+
+def _quantity(qty: Optional[str], word: Optional[str]) -> Optional[float]:
+    """The amount written before or after the food; None when it is not a number ("1/0", "2.5/3")."""
+    if qty:
+        try:
+            return float(Fraction(qty)) if "/" in qty else float(qty)
+        except (ValueError, ZeroDivisionError):
+            return None
+    if word:
+        return float(NUMBER_WORDS[word])
+    return 1.0
+
+
+def unit_grams(unit: Optional[str], table: FoodTable, food: int) -> float:
+    """Grams in one ``unit`` of a food; no unit means one typical portion."""
+    if unit in UNIT_GRAMS:
+        return UNIT_GRAMS[unit]
+    category = str(table.categories[food])
+    if unit == "cup":
+        return CUP_GRAMS.get(category, DEFAULT_CUP_GRAMS)
+    if unit == "slice" and category != "dish":
+        return SLICE_GRAMS
+    return float(table.portion_g[food])
+
+
+def _split(text: str) -> List[str]:
+    # Decimal commas ("1,5 kg") would otherwise be taken as item separators.
+    text = re.sub(r"(\d),(\d)", r"\1.\2", text)
+    return [part for part in _SEPARATORS.split(text) if part]
+
+
+def parse_item(text: str, index: FoodIndex, table: FoodTable) -> ParsedItem:
+    normalized = _NON_QUANTITY.sub(" ", fold(text)).strip()
+    qty = word = unit = None
+    food_text = normalized
+    trailing = _TRAILING.match(normalized)
+    leading = _LEADING.match(normalized)
+    if leading and (leading["qty"] or leading["word"] or leading["unit"]):
+        qty, word, unit, food_text = leading["qty"], leading["word"], leading["unit"], leading["food"]
+    elif trailing:
+        qty, unit, food_text = trailing["qty"], trailing["unit"], trailing["food"]
+
+    match = index.best(food_text)
+    quantity = _quantity(qty, word)
+    if match is None or quantity is None:
+        # Unmatched: confidence 0 sends the item to Gemini.
+        return ParsedItem(text, None, 0.0, 0.0, MacroBreakdown(protein=0, carbs=0, fats=0), 0.0)
+    unit = _UNIT_LOOKUP.get(unit) if unit else None
+    grams = quantity * unit_grams(unit, table, match.food)
+    values = np.asarray(table.per_100g[match.food]) * grams / 100.0
+    return ParsedItem(
+        text=text,
+        food=str(table.names[match.food]),
+        grams=round(grams, 1),
+        calories=round(float(values[KCAL]), 1),
+        macros=MacroBreakdown(
+            protein=round(float(values[PROTEIN]), 1),
+            carbs=round(float(values[CARBS]), 1),
+            fats=round(float(values[FAT]), 1),
+        ),
+        confidence=match.score,
+    )
+
+
+def parse_entry(text: str, index: Optional[FoodIndex] = None, table: Optional[FoodTable] = None) -> ParsedEntry:
+    index = index or default_index()
+    table = table or load_foods()
+    return ParsedEntry([parse_item(part, index, table) for part in _split(str(text or "").strip())])
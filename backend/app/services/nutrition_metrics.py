@@ -0,0 +1,159 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Mapping, Sequence
+
+import numpy as np
+
+# Mifflin-St Jeor sex constant; "other"/unknown uses the midpoint.
+SEX_CONSTANT = {"male": 5.0, "female": -161.0}
+DEFAULT_SEX_CONSTANT = -78.0
+
+ACTIVITY_FACTORS = {
+    "sedentary": 1.2,
+    "lightly active": 1.375,
+    "moderately active": 1.55,
+    "very active": 1.725,
+    "extra active": 1.9,
+}
+DEFAULT_ACTIVITY_FACTOR = 1.375
+
+# Fraction of TDEE added per primary goal; loss deficits are capped at 500 kcal.
+GOAL_ADJUSTMENT = {"loss": -0.20, "maintain": 0.0, "gain": 0.10, "longevity": -0.05, "performance": 0.05}
+MAX_DEFICIT_KCAL = 500.0
+PROTEIN_G_PER_KG = {"loss": 1.6, "maintain": 1.2, "gain": 1.8, "longevity": 1.0, "performance": 1.8}
+FAT_ENERGY_SHARE = 0.30
+KCAL_PER_G = {"protein": 4.0, "carbs": 4.0, "fats": 9.0}
+
+DEFAULTS = {"age": 30.0, "height": 170.0, "weight": 70.0}
+FACTORS = ("weight", "height", "age", "sex_constant", "activity", "adjustment", "floor", "protein_per_kg", "fat_share", "carb_cap")
+
+# Bump when a formula or constant in this module changes; profiles whose stored
+# metrics carry an older version are recomputed by ``ProfileService.recompute_metrics``.
+METRICS_VERSION = 1
+
+
+@dataclass(frozen=True)
+class NutritionTargets:
+    bmr: float
+    tdee: float
+    calories: float
+    protein: float
+    carbs: float
+    fats: float
+    bmi: float
+
+    def as_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def _number(value: Any, default: float) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return default
+    return number if number > 0 else default
+
+
+def _lower(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _conditions(clinical: Mapping[str, Any]) -> str:
+    return " ".join(_lower(c) for c in clinical.get("medicalConditions") or [])
+
+
+def bmr(weight_kg, height_cm, age, sex_constant):
+    """Mifflin-St Jeor; accepts scalars or NumPy arrays."""
+    return 10.0 * np.asarray(weight_kg) + 6.25 * np.asarray(height_cm) - 5.0 * np.asarray(age) + np.asarray(sex_constant)
+
+
+def bmi(weight_kg, height_cm):
+    height_m = np.asarray(height_cm) / 100.0
+    return np.asarray(weight_kg) / (height_m * height_m)
+
+
+def calorie_target(tdee, adjustment, floor):
+    """TDEE moved by the goal adjustment, with deficits capped and a sex-specific floor."""
+    tdee = np.asarray(tdee, dtype=float)
+    delta = np.maximum(tdee * np.asarray(adjustment), -MAX_DEFICIT_KCAL)
+    return np.maximum(tdee + delta, np.asarray(floor))
+
+
+def macro_targets(calories, weight_kg, protein_g_per_kg, fat_share, carb_cap_share):
+    """Protein from body weight, fat as a share of energy, carbs fill the rest up to a cap.
+
+    Energy left over by the carb cap goes to fat. Returns (protein, carbs, fats) in grams.
+    """
+    calories = np.asarray(calories, dtype=float)
+    protein = np.asarray(protein_g_per_kg) * np.asarray(weight_kg)
+    protein = np.minimum(protein, calories * 0.35 / KCAL_PER_G["protein"])
+    fats = calories * np.asarray(fat_share) / KCAL_PER_G["fats"]
+    carb_kcal = np.maximum(calories - protein * KCAL_PER_G["protein"] - fats * KCAL_PER_G["fats"], 0.0)
+    capped = np.minimum(carb_kcal, calories * np.asarray(carb_cap_share))
+    fats = fats + (carb_kcal - capped) / KCAL_PER_G["fats"]
+    return protein, capped / KCAL_PER_G["carbs"], fats
+
+
+def profile_factors(profile: Mapping[str, Any]) -> Dict[str, float]:
+    """Flatten the inputs the formulas need from a profile payload, applying defaults."""
+    biometrics = profile.get("biometrics") or {}
+    lifestyle = profile.get("lifestyle") or {}
+    goals = profile.get("goals") or {}
+    clinical = profile.get("clinical") or {}
+    routine = profile.get("routine") or {}
+
+    sex = _lower(biometrics.get("gender") or biometrics.get("sex"))
+    goal = _lower(goals.get("primary")) or "maintain"
+    conditions = _conditions(clinical)
+    preference = _lower(routine.get("dietaryPreference"))
+
+    protein_per_kg = PROTEIN_G_PER_KG.get(goal, 1.2)
+    if "kidney" in conditions or "renal" in conditions:
+        protein_per_kg = min(protein_per_kg, 0.8)
+
+    carb_cap = 0.60
+    fat_share = FAT_ENERGY_SHARE
+    if "diabet" in conditions:
+        carb_cap = 0.45
+    if preference == "low_carb":
+        carb_cap = 0.25
+    if preference == "keto":
+        carb_cap, fat_share = 0.08, 0.65
+
+    return {
+        "weight": _number(biometrics.get("weight"), DEFAULTS["weight"]),
+        "height": _number(biometrics.get("height"), DEFAULTS["height"]),
+        "age": _number(biometrics.get("age"), DEFAULTS["age"]),
+        "sex_constant": SEX_CONSTANT.get(sex, DEFAULT_SEX_CONSTANT),
+        "activity": ACTIVITY_FACTORS.get(_lower(lifestyle.get("activityLevel")), DEFAULT_ACTIVITY_FACTOR),
+        "adjustment": GOAL_ADJUSTMENT.get(goal, 0.0),
+        "floor": 1500.0 if sex == "male" else 1200.0,
+        "protein_per_kg": protein_per_kg,
+        "fat_share": fat_share,
+        "carb_cap": carb_cap,
+    }
+
+
+def compute_targets_batch(profiles: Sequence[Mapping[str, Any]]) -> Dict[str, np.ndarray]:
+    """``NutritionTargets`` fields for many profile payloads at once, one array per field."""
+    rows = [profile_factors(profile) for profile in profiles]
+    f = {name: np.array([row[name] for row in rows], dtype=float) for name in FACTORS}
+    base = bmr(f["weight"], f["height"], f["age"], f["sex_constant"])
+    tdee = base * f["activity"]
+    calories = calorie_target(tdee, f["adjustment"], f["floor"])
+    protein, carbs, fats = macro_targets(calories, f["weight"], f["protein_per_kg"], f["fat_share"], f["carb_cap"])
+    values = {
+        "bmr": base,
+        "tdee": tdee,
+        "calories": calories,
+        "protein": protein,
+        "carbs": carbs,
+        "fats": fats,
+        "bmi": bmi(f["weight"], f["height"]),
+    }
+    return {name: np.round(np.asarray(value, dtype=float), 1) for name, value in values.items()}
+
+
+def compute_targets(profile: Mapping[str, Any]) -> NutritionTargets:
+    """Energy and macro targets for one profile payload (``UserProfile.model_dump()`` shape)."""
+    values = compute_targets_batch([profile])
+    return NutritionTargets(**{name: float(column[0]) for name, column in values.items()})
@@ -0,0 +1,305 @@
+"""Deterministic, in-process weekly plan generator.
+
+Targets come from ``nutrition_metrics``; each meal slot is a (protein, energy, fat)
+food combination plus a fixed side. For every slot kind all candidate combinations
+are solved at once as a batch of regularised 3x3 least-squares problems (portion
+multipliers that best hit the slot's protein/carb/fat targets), then each day picks
+the best-scoring combination with a penalty on foods already used that week.
+"""
+
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.schemas.plan import DayPlan, MacroBreakdown, MealItem, UserProfile, WeeklyPlan
+from app.services.food_db import CARBS, FAT, KCAL, PROTEIN, FoodTable, load_foods, restriction_tags
+from app.services.nutrition_metrics import NutritionTargets, compute_targets, profile_factors
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snack": 0.10}
+SLOT_LAYOUTS = {
+    1: ("lunch",),
+    2: ("lunch", "dinner"),
+    3: ("breakfast", "lunch", "dinner"),
+    4: ("breakfast", "lunch", "snack", "dinner"),
+    5: ("breakfast", "snack", "lunch", "snack", "dinner"),
+    6: ("breakfast", "snack", "lunch", "snack", "dinner", "snack"),
+}
+DEFAULT_TIMES = {"breakfast": ["07:30"], "lunch": ["12:30"], "dinner": ["19:30"], "snack": ["10:00", "16:00", "21:30"]}
+
+
+@dataclass(frozen=True)
+class SlotSpec:
+    code: str
+    roles: Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]
+    side: Tuple[str, ...] = ()
+
+
+SLOT_SPECS = {
+    "breakfast": SlotSpec("b", (("protein",), ("carb",), ("fat", "dairy")), ("fruit",)),
+    "lunch": SlotSpec("l", (("protein",), ("carb",), ("fat",)), ("vegetable",)),
+    "dinner": SlotSpec("d", (("protein",), ("carb",), ("fat",)), ("vegetable",)),
+    "snack": SlotSpec("s", (("protein", "dairy"), ("fruit", "carb"), ("fat",))),
+}
+# Keto swaps starchy energy sources for low-carb vegetables.
+KETO_ENERGY = ("vegetable",)
+
+MAX_CANDIDATES = 16
+REGULARISATION = 0.05
+MIN_PORTIONS, MAX_PORTIONS = 0.5, 2.5
+VARIETY_PENALTY = 0.04
+SKIP_PENALTY = 0.05
+
+
+@dataclass(frozen=True)
+class SlotSolution:
+    """Candidate combinations for one slot kind and their solved grams and fit error."""
+
+    foods: np.ndarray  # (n, 3) food indices, -1 for "no food in this role"
+    grams: np.ndarray  # (n, 3)
+    error: np.ndarray  # (n,)
+    sides: np.ndarray  # side food indices to rotate through
+
+
+def restrictions(profile: UserProfile) -> Tuple[str, set, List[str]]:
+    routine = profile.routine or {}
+    clinical = profile.clinical or {}
+    preference = str(routine.get("dietaryPreference") or "").strip().lower()
+    phrases = [
+        *(routine.get("allergies") or []),
+        *(routine.get("intolerances") or []),
+        *(routine.get("culturalRestrictions") or []),
+        *(clinical.get("allergies") or []),
+    ]
+    return preference, restriction_tags(phrases), list(routine.get("dislikes") or [])
+
+
+def _candidates(table: FoodTable, allowed: np.ndarray, categories: Sequence[str], slot_code: str) -> np.ndarray:
+    """Allowed foods for one role, capped and spread across the table; -1 marks 'skip this role'."""
+    idx = np.flatnonzero(allowed & table.mask(categories, slot_code))
+    if len(idx) > MAX_CANDIDATES:
+        idx = idx[np.linspace(0, len(idx) - 1, MAX_CANDIDATES).round().astype(int)]
+    return np.append(idx, -1)
+
+
+def solve_slot(table: FoodTable, allowed: np.ndarray, spec: SlotSpec, target: np.ndarray, keto: bool = False) -> SlotSolution:
+    """Solve every (protein, energy, fat) combination of a slot in one batch.
+
+    ``target`` is [kcal, protein, carbs, fat] for the slot. Returns grams clipped to
+    sensible portions and a relative squared error per combination.
+    """
+    roles = list(spec.roles)
+    if keto:
+        roles[1] = KETO_ENERGY
+    pools = [_candidates(table, allowed, categories, spec.code) for categories in roles]
+    sides = np.flatnonzero(allowed & table.mask(spec.side, spec.code)) if spec.side else np.array([], dtype=int)
+
+    # Padded lookup tables: the extra last row is the zero "skip" food addressed by -1.
+    per_portion = np.vstack([table.per_100g * (table.portion_g[:, None] / 100.0), np.zeros((1, 4))])
+    portions = np.append(table.portion_g, 0.0)
+
+    target = np.asarray(target, dtype=float).copy()
+    if len(sides):
+        target -= per_portion[sides].mean(axis=0)
+    target = np.maximum(target, 1.0)
+
+    grid = np.stack(np.meshgrid(*pools, indexing="ij"), axis=-1).reshape(-1, 3)
+    macros = per_portion[grid][:, :, [PROTEIN, CARBS, FAT]].transpose(0, 2, 1)  # (n, macro, role)
+    weights = 1.0 / target[[PROTEIN, CARBS, FAT]] ** 2
+
+    # (A^T W A + lambda I) x = A^T W t + lambda * 1  -> portion multipliers near 1.
+    ata = np.einsum("nki,k,nkj->nij", macros, weights, macros) + REGULARISATION * np.eye(3)
+    atb = np.einsum("nki,k,k->ni", macros, weights, target[[PROTEIN, CARBS, FAT]]) + REGULARISATION
+    multipliers = np.clip(np.linalg.solve(ata, atb[..., None])[..., 0], MIN_PORTIONS, MAX_PORTIONS)
+
+    grams = multipliers * portions[grid]
+    totals = np.einsum("nr,nrc->nc", multipliers, per_portion[grid])
+    relative = (totals - target) / target
+    error = (relative**2).sum(axis=1) + SKIP_PENALTY * (grid < 0).sum(axis=1)
+    return SlotSolution(foods=grid, grams=grams, error=error, sides=sides)
+
+
+def _round_grams(grams: float, portion: float) -> float:
+    step = 1.0 if portion <= 30 else 5.0
+    return max(round(grams / step) * step, step)
+
+
+def meal_times(profile: UserProfile, layout: Sequence[str]) -> List[str]:
+    preferred = [
+        t for t in ((profile.routine or {}).get("preferredMealTimes") or []) if re.fullmatch(r"\d{1,2}:\d{2}", str(t))
+    ]
+    if len(preferred) == len(layout):
+        return [str(t) for t in preferred]
+    times: List[str] = []
+    for slot in layout:
+        # HH:MM strings compare chronologically; take the first default after the previous meal.
+        later = [t for t in DEFAULT_TIMES[slot] if not times or t > times[-1]]
+        times.append(later[0] if later else DEFAULT_TIMES[slot][-1])
+    return times
+
+
+def _title(names: List[str], slot: str) -> str:
+    if not names:
+        # Every food of the slot was excluded by restrictions or dislikes.
+        return slot.capitalize()
+    if len(names) == 1:
+        return names[0].capitalize()
+    sides = ", ".join(names[1:-1])
+    return f"{names[0].capitalize()} with {sides + ' and ' if sides else ''}{names[-1]}"
+
+
+def _build_meal(table: FoodTable, items: List[Tuple[int, float]], timestamp: str, slot: str) -> MealItem:
+    names, parts = [], []
+    totals = np.zeros(4)
+    for index, grams in items:
+        grams = _round_grams(grams, table.portion_g[index])
+        totals += table.per_100g[index] * grams / 100.0
+        names.append(str(table.names[index]))
+        parts.append(f"{grams:g} g {table.names[index]}")
+    return MealItem(
+        id=str(uuid.uuid4()),
+        name=_title(names, slot),
+        description=", ".join(parts),
+        calories=round(float(totals[KCAL]), 1),
+        macros=MacroBreakdown(
+            protein=round(float(totals[PROTEIN]), 1),
+            carbs=round(float(totals[CARBS]), 1),
+            fats=round(float(totals[FAT]), 1),
+        ),
+        timestamp=timestamp,
+    )
+
+
+def _recommendations(profile: UserProfile, targets: NutritionTargets) -> List[str]:
+    conditions = " ".join(str(c).lower() for c in (profile.clinical or {}).get("medicalConditions") or [])
+    tips = [
+        f"Daily target: about {targets.calories:.0f} kcal with {targets.protein:.0f} g protein, "
+        f"{targets.carbs:.0f} g carbs and {targets.fats:.0f} g fat.",
+        "Drink water through the day, roughly 35 ml per kg of body weight.",
+    ]
+    goal = str((profile.goals or {}).get("primary") or "").lower()
+    if goal == "loss":
+        tips.append("Keep protein at every meal to protect lean mass during the deficit.")
+    elif goal in ("gain", "performance"):
+        tips.append("Place the largest carbohydrate portions around training sessions.")
+    if "diabet" in conditions:
+        tips.append("Pair carbohydrates with protein and vegetables and keep meal times regular.")
+    if "hypertens" in conditions:
+        tips.append("Limit sodium to under 2 g per day; season with herbs instead of salt.")
+    if "kidney" in conditions or "renal" in conditions:
+        tips.append("Protein is capped for kidney health; confirm targets with your nephrologist.")
+    return tips
+
+
+@dataclass
+class PlanContext:
+    """Everything needed to build any day or meal of a profile's plan; ``usage`` drives variety.
+
+    Slots are solved on first use, so rebuilding a single meal only solves its slot kind.
+    """
+
+    table: FoodTable
+    profile: UserProfile
+    targets: NutritionTargets
+    layout: Tuple[str, ...]
+    allowed: np.ndarray
+    slot_targets: Dict[str, np.ndarray]
+    keto: bool
+    times: List[str]
+    usage: np.ndarray
+    solutions: Dict[str, SlotSolution] = field(default_factory=dict)
+
+    def solution(self, slot: str) -> SlotSolution:
+        if slot not in self.solutions:
+            self.solutions[slot] = solve_slot(self.table, self.allowed, SLOT_SPECS[slot], self.slot_targets[slot], self.keto)
+        return self.solutions[slot]
+
+
+def meals_per_day(profile: UserProfile) -> int:
+    """Meals a day as one of the supported layouts; free text like "3-4" takes its first number."""
+    found = re.search(r"\d+", str((profile.routine or {}).get("mealsPerDay") or ""))
+    count = int(found.group()) if found else 4
+    return min(max(count, 1), max(SLOT_LAYOUTS))
+
+
+def meal_layout(profile: UserProfile) -> Tuple[str, ...]:
+    return SLOT_LAYOUTS[meals_per_day(profile)]
+
+
+def plan_context(profile: UserProfile, table: Optional[FoodTable] = None) -> PlanContext:
+    table = table or load_foods()
+    payload = profile.model_dump()
+    targets = compute_targets(payload)
+    preference, excluded, dislikes = restrictions(profile)
+    layout = meal_layout(profile)
+    share_total = sum(SLOT_SHARES[slot] for slot in layout)
+    daily = np.array([targets.calories, targets.protein, targets.carbs, targets.fats])
+    return PlanContext(
+        table=table,
+        profile=profile,
+        targets=targets,
+        layout=layout,
+        allowed=table.allowed(preference, excluded, dislikes),
+        slot_targets={slot: daily * SLOT_SHARES[slot] / share_total for slot in set(layout)},
+        keto=profile_factors(payload)["carb_cap"] <= 0.1,
+        times=meal_times(profile, layout),
+        usage=np.zeros(len(table) + 1),
+    )
+
+
+def build_meal(ctx: PlanContext, day_index: int, slot_index: int) -> MealItem:
+    """Best combination for one slot given the foods already used this week."""
+    solution = ctx.solution(ctx.layout[slot_index])
+    score = solution.error + VARIETY_PENALTY * ctx.usage[solution.foods].sum(axis=1)
+    best = int(np.argmin(score))
+    items = [(int(f), float(g)) for f, g in zip(solution.foods[best], solution.grams[best]) if f >= 0]
+    if len(solution.sides):
+        side = int(solution.sides[(day_index * len(ctx.layout) + slot_index) % len(solution.sides)])
+        items.append((side, float(ctx.table.portion_g[side])))
+    ctx.usage[[f for f, _ in items]] += 1
+    return _build_meal(ctx.table, items, ctx.times[slot_index], ctx.layout[slot_index])
+
+
+def day_plan(day: str, meals: List[MealItem]) -> DayPlan:
+    macros = MacroBreakdown(
+        protein=round(sum(m.macros.protein for m in meals), 1),
+        carbs=round(sum(m.macros.carbs for m in meals), 1),
+        fats=round(sum(m.macros.fats for m in meals), 1),
+    )
+    return DayPlan(day=day, meals=meals, dailyCalories=round(sum(m.calories for m in meals), 1), dailyMacros=macros)
+
+
+def build_day(ctx: PlanContext, day_index: int) -> DayPlan:
+    return day_plan(DAYS[day_index], [build_meal(ctx, day_index, i) for i in range(len(ctx.layout))])
+
+
+def recommendations(ctx: PlanContext) -> List[str]:
+    return _recommendations(ctx.profile, ctx.targets)
+
+
+def profile_recommendations(profile: UserProfile, targets: Optional[NutritionTargets] = None) -> List[str]:
+    """Recommendations for a profile whose plan was not built here (e.g. an adapted neighbour's plan)."""
+    return _recommendations(profile, targets or compute_targets(profile.model_dump()))
+
+
+def generate_weekly_plan(profile: UserProfile, table: Optional[FoodTable] = None) -> WeeklyPlan:
+    """Build a complete 7-day plan for a profile without any network calls."""
+    ctx = plan_context(profile, table)
+    days = [build_day(ctx, day_index) for day_index in range(len(DAYS))]
+    return WeeklyPlan(
+        id=str(uuid.uuid4()),
+        days=days,
+        averageCalories=round(sum(d.dailyCalories for d in days) / len(days), 1),
+        averageMacros=MacroBreakdown(
+            protein=round(sum(d.dailyMacros.protein for d in days) / len(days), 1),
+            carbs=round(sum(d.dailyMacros.carbs for d in days) / len(days), 1),
+            fats=round(sum(d.dailyMacros.fats for d in days) / len(days), 1),
+        ),
+        recommendations=recommendations(ctx),
+        generatedAt=datetime.now(timezone.utc).isoformat(),
+    )
@@ -0,0 +1,235 @@
+"""Nearest-plan reuse over pgvector.
+
+Every stored plan carries a deterministic feature vector of the profile it was made
+for and a signature of that profile's hard constraints (diet, exclusions, conditions,
+meals per day, dislikes). A lookup only considers plans with the same signature and
+ranks them by cosine similarity on the HNSW index; above the threshold the closest
+plan is rescaled to the new calorie target instead of calling Gemini.
+"""
+
+import asyncio
+import hashlib
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+import structlog
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.resources import resources
+from app.core.metrics import PLAN_REUSE_LOOKUPS, PLAN_REUSE_SIMILARITY
+from app.core.tracing import traced
+from app.models.profile import PROFILE_EMBEDDING_DIM, WeeklyPlanEntity
+from app.schemas.plan import DayPlan, MacroBreakdown, UserProfile, WeeklyPlan
+from app.services.food_db import restriction_tags
+from app.services import plan_engine, plan_store
+from app.services.food_index import normalize
+from app.services.nutrition_metrics import compute_targets, profile_factors
+
+logger = structlog.get_logger()
+
+SEXES = ("male", "female")
+GOALS = ("loss", "maintain", "gain", "longevity", "performance")
+PREFERENCES = ("omnivore", "vegetarian", "vegan", "pescatarian", "keto", "low_carb")
+EXCLUSIONS = ("peanut", "nuts", "gluten", "lactose", "egg", "soy", "fish", "shellfish", "sesame", "pork")
+CONDITIONS = (("diabet",), ("hypertens",), ("kidney", "renal"), ("cardi", "heart"), ("thyroid",))
+
+# (centre, spread) for continuous features, so cosine similarity separates profiles
+# instead of every all-positive vector looking alike.
+NUMERIC = {
+    "age": (40.0, 15.0),
+    "height": (170.0, 10.0),
+    "weight": (75.0, 15.0),
+    "bmi": (25.0, 5.0),
+    "activity": (1.55, 0.25),
+    "calories": (2200.0, 400.0),
+    "protein": (120.0, 35.0),
+    "carbs": (230.0, 80.0),
+    "fats": (70.0, 20.0),
+    "meals": (4.0, 1.0),
+}
+CATEGORICAL_WEIGHT = 1.5
+FEATURE_DIM = len(NUMERIC) + len(SEXES) + len(GOALS) + len(PREFERENCES) + len(EXCLUSIONS) + len(CONDITIONS)
+assert FEATURE_DIM == PROFILE_EMBEDDING_DIM, "update the model column and add a migration"
+
+ADAPT_RANGE = (0.85, 1.15)
+_GRAMS = re.compile(r"(\d+(?:\.\d+)?) g\b")
+
+
+def _one_hot(value: str, options: Tuple[str, ...]) -> List[float]:
+    return [CATEGORICAL_WEIGHT if value == option else 0.0 for option in options]
+
+
+def _conditions(profile: UserProfile) -> List[str]:
+    return [str(c).lower() for c in (profile.clinical or {}).get("medicalConditions") or []]
+
+
+def _exclusions(profile: UserProfile) -> set:
+    routine = profile.routine or {}
+    return restriction_tags(
+        [*(routine.get("allergies") or []), *(routine.get("intolerances") or []), *(routine.get("culturalRestrictions") or [])]
+    )
+
+
+def encode_profile(profile: UserProfile) -> np.ndarray:
+    """Deterministic unit-length float32 vector of length ``FEATURE_DIM``."""
+    payload = profile.model_dump()
+    factors = profile_factors(payload)
+    targets = compute_targets(payload)
+    routine = profile.routine or {}
+    values = {
+        "age": factors["age"],
+        "height": factors["height"],
+        "weight": factors["weight"],
+        "bmi": targets.bmi,
+        "activity": factors["activity"],
+        "calories": targets.calories,
+        "protein": targets.protein,
+        "carbs": targets.carbs,
+        "fats": targets.fats,
+        "meals": float(plan_engine.meals_per_day(profile)),
+    }
+    numeric = [(values[k] - centre) / spread for k, (centre, spread) in NUMERIC.items()]
+    sex = str((profile.biometrics or {}).get("gender") or "").lower()
+    goal = str((profile.goals or {}).get("primary") or "maintain").lower()
+    preference = str(routine.get("dietaryPreference") or "omnivore").lower()
+    excluded = _exclusions(profile)
+    conditions = " ".join(_conditions(profile))
+    vector = np.array(
+        numeric
+        + _one_hot(sex, SEXES)
+        + _one_hot(goal, GOALS)
+        + _one_hot(preference, PREFERENCES)
+        + [CATEGORICAL_WEIGHT if tag in excluded else 0.0 for tag in EXCLUSIONS]
+        + [CATEGORICAL_WEIGHT if any(k in conditions for k in keys) else 0.0 for keys in CONDITIONS],
+        dtype=np.float32,
+    )
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+def constraint_signature(profile: UserProfile) -> str:
+    """Hash of the constraints a reused plan must match exactly."""
+    routine = profile.routine or {}
+    parts = [
+        str(routine.get("dietaryPreference") or "omnivore").lower(),
+        ",".join(sorted(_exclusions(profile))),
+        ",".join(sorted(_conditions(profile))),
+        str(plan_engine.meals_per_day(profile)),
+        ",".join(sorted(normalize(d) for d in routine.get("dislikes") or [])),
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def _scale_description(text: Optional[str], ratio: float) -> Optional[str]:
+    if not text:
+        return text
+    return _GRAMS.sub(lambda m: f"{max(round(float(m.group(1)) * ratio / 5) * 5, 1):g} g", text)
+
+
+def adapt_plan(plan: WeeklyPlan, profile: UserProfile) -> Optional[WeeklyPlan]:
+    """Rescale portions of a neighbour's plan to this profile's calorie target; None if too far off.
+
+    The neighbour's recommendations quote its own targets, so they are rebuilt for this profile.
+    """
+    targets = compute_targets(profile.model_dump())
+    target = targets.calories
+    ratio = target / plan.averageCalories if plan.averageCalories else 0.0
+    if not ADAPT_RANGE[0] <= ratio <= ADAPT_RANGE[1]:
+        return None
+    days = []
+    for day in plan.days:
+        meals = [
+            meal.model_copy(
+                update={
+                    "id": str(uuid.uuid4()),
+                    "calories": round(meal.calories * ratio, 1),
+                    "description": _scale_description(meal.description, ratio),
+                    "macros": MacroBreakdown(
+                        protein=round(meal.macros.protein * ratio, 1),
+                        carbs=round(meal.macros.carbs * ratio, 1),
+                        fats=round(meal.macros.fats * ratio, 1),
+                    ),
+                }
+            )
+            for meal in day.meals
+        ]
+        days.append(
+            DayPlan(
+                day=day.day,
+                meals=meals,
+                dailyCalories=round(day.dailyCalories * ratio, 1),
+                dailyMacros=MacroBreakdown(
+                    protein=round(day.dailyMacros.protein * ratio, 1),
+                    carbs=round(day.dailyMacros.carbs * ratio, 1),
+                    fats=round(day.dailyMacros.fats * ratio, 1),
+                ),
+            )
+        )
+    return plan.model_copy(
+        update={
+            "id": str(uuid.uuid4()),
+            "days": days,
+            "averageCalories": round(plan.averageCalories * ratio, 1),
+            "averageMacros": MacroBreakdown(
+                protein=round(plan.averageMacros.protein * ratio, 1),
+                carbs=round(plan.averageMacros.carbs * ratio, 1),
+                fats=round(plan.averageMacros.fats * ratio, 1),
+            ),
+            "recommendations": plan_engine.profile_recommendations(profile, targets),
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+        }
+    )
+
+
+@dataclass(frozen=True)
+class ReuseMatch:
+    plan_id: str
+    profile_id: str
+    similarity: float
+    plan: WeeklyPlan
+
+
+async def nearest(session, profile: UserProfile) -> Optional[ReuseMatch]:
+    """Closest stored plan with the same constraint signature, from another profile."""
+    distance = WeeklyPlanEntity.profile_embedding.cosine_distance(encode_profile(profile).tolist())
+    query = (
+        select(WeeklyPlanEntity, distance.label("distance"))
+        .where(
+            WeeklyPlanEntity.constraint_signature == constraint_signature(profile),
+            WeeklyPlanEntity.profile_id != profile.id,
+        )
+        .order_by(distance)
+        .limit(1)
+    )
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+    entity, dist = row
+    await plan_store.load(session, [entity])
+    return ReuseMatch(entity.id, entity.profile_id, round(1.0 - float(dist), 4), WeeklyPlan.model_validate(entity.plan))
+
+
+@traced("plan_reuse.find_reusable")
+async def find_reusable(profile: UserProfile) -> Optional[WeeklyPlan]:
+    """An adapted neighbour plan above ``plan_reuse_min_similarity``; fails open to None."""
+    try:
+        async with resources.session() as session:
+            match = await asyncio.wait_for(nearest(session, profile), timeout=settings.plan_reuse_timeout)
+    except Exception as exc:
+        PLAN_REUSE_LOOKUPS.labels(outcome="error").inc()
+        logger.warning("plan_reuse_lookup_failed", error=str(exc))
+        return None
+    if match is None:
+        PLAN_REUSE_LOOKUPS.labels(outcome="miss").inc()
+        return None
+    PLAN_REUSE_SIMILARITY.observe(match.similarity)
+    adapted = adapt_plan(match.plan, profile) if match.similarity >= settings.plan_reuse_min_similarity else None
+    PLAN_REUSE_LOOKUPS.labels(outcome="hit" if adapted else "miss").inc()
+    if adapted:
+        logger.info("plan_reused", source_plan=match.plan_id, similarity=match.similarity)
+    return adapted
@@ -0,0 +1,111 @@
+"""Content-addressed storage of weekly plan documents.
+
+A plan is split into three parts:
+- meals, keyed by the hash of their name, description, calories and macros, in the
+  ``CatalogMeal`` table, shared by every plan that serves them;
+- the plan body, everything but per-plan identifiers, with each meal replaced by its
+  catalog key and time, stored once per distinct body in ``PlanBody``;
+- the per-plan instance, kept on the ``WeeklyPlanEntity`` row: the plan id,
+  ``generatedAt`` and the meal ids, one list per day.
+
+``materialize`` reassembles the exact ``WeeklyPlan.model_dump()`` document. Rows
+written before the catalog keep their inline ``plan`` and are read unchanged.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.http_cache import content_hash
+from app.models.profile import CatalogMeal, PlanBody, WeeklyPlanEntity
+
+MEAL_FIELDS = ("name", "description", "calories", "macros")
+INSTANCE_FIELDS = ("id", "generatedAt")
+
+
+def meal_key(meal: Dict[str, Any]) -> str:
+    return content_hash({field: meal.get(field) for field in MEAL_FIELDS})
+
+
+def normalize(document: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Split a plan document into its shared body, the catalog meals it uses, and its instance fields."""
+    meals: Dict[str, Dict[str, Any]] = {}
+    meal_ids: List[List[str]] = []
+    days = []
+    for day in document["days"]:
+        refs = []
+        meal_ids.append([meal["id"] for meal in day["meals"]])
+        for meal in day["meals"]:
+            key = meal_key(meal)
+            meals[key] = {field: meal.get(field) for field in MEAL_FIELDS}
+            refs.append({"ref": key, "timestamp": meal["timestamp"]})
+        days.append({**{k: v for k, v in day.items() if k != "meals"}, "meals": refs})
+    body = {k: v for k, v in document.items() if k not in INSTANCE_FIELDS and k != "days"}
+    body["days"] = days
+    instance = {field: document[field] for field in INSTANCE_FIELDS}
+    instance["mealIds"] = meal_ids
+    return body, meals, instance
+
+
+def materialize(body: Dict[str, Any], meals: Dict[str, Dict[str, Any]], instance: Dict[str, Any]) -> Dict[str, Any]:
+    days = [
+        {
+            **{k: v for k, v in day.items() if k != "meals"},
+            "meals": [
+                {"id": meal_id, **meals[ref["ref"]], "timestamp": ref["timestamp"]}
+                for meal_id, ref in zip(meal_ids, day["meals"])
+            ],
+        }
+        for day, meal_ids in zip(body["days"], instance["mealIds"])
+    ]
+    return {**{field: instance[field] for field in INSTANCE_FIELDS}, **body, "days": days}
+
+
+def body_refs(body: Dict[str, Any]) -> Iterable[str]:
+    return (ref["ref"] for day in body["days"] for ref in day["meals"])
+
+
+async def store(session: AsyncSession, document: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Insert the body and any meals not catalogued yet; returns the body hash and instance.
+
+    Existing rows are left alone (``ON CONFLICT DO NOTHING``), so a repeated meal or
+    body costs an index probe, not a write. The caller commits.
+    """
+    body, meals, instance = normalize(document)
+    digest = content_hash(body)
+    if meals:
+        await session.execute(
+            insert(CatalogMeal)
+            .values([{"hash": key, "data": data} for key, data in meals.items()])
+            .on_conflict_do_nothing(index_elements=[CatalogMeal.hash])
+        )
+    await session.execute(
+        insert(PlanBody).values(hash=digest, body=body).on_conflict_do_nothing(index_elements=[PlanBody.hash])
+    )
+    return digest, instance
+
+
+async def load(session: AsyncSession, entities: Iterable[WeeklyPlanEntity]) -> None:
+    """Fill ``plan`` on catalogued rows: one query for their bodies, one for their meals.
+
+    The value is set as already committed, so later flushes never write it back.
+    """
+    pending = [e for e in entities if e.plan is None and e.body_hash is not None]
+    if not pending:
+        return
+    rows = await session.execute(select(PlanBody.hash, PlanBody.body).where(PlanBody.hash.in_({e.body_hash for e in pending})))
+    bodies = dict(rows.all())
+    refs = {ref for body in bodies.values() for ref in body_refs(body)}
+    rows = await session.execute(select(CatalogMeal.hash, CatalogMeal.data).where(CatalogMeal.hash.in_(refs)))
+    meals = dict(rows.all())
+    for entity in pending:
+        set_committed_value(entity, "plan", materialize(bodies[entity.body_hash], meals, entity.instance))
+
+
+async def load_one(session: AsyncSession, entity: Optional[WeeklyPlanEntity]) -> Optional[WeeklyPlanEntity]:
+    if entity is not None:
+        await load(session, [entity])
+    return entity
@@ -0,0 +1,166 @@
+"""Off-peak precomputation of weekly plans.
+
+Users tend to ask for a new plan on a steady cadence (most of them on Sunday). Each
+profile's next request is predicted from the median gap between the plans it asked
+for; profiles due within ``settings.precompute_horizon_hours`` get a plan generated
+on the batch lane during the off-peak window, within a daily budget of plans. The
+plan is stored with status ``ready`` and handed out instantly by ``/plans/latest`` or
+by the next plan request whose constraints it still satisfies. Served plans count as
+hits, once per plan however often it is read; ready plans superseded by a freshly
+generated one count as misses.
+"""
+
+import statistics
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import structlog
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import PLAN_PRECOMPUTE
+from app.models.profile import Profile, WeeklyPlanEntity
+from app.schemas.plan import PlanRequest, UserProfile
+
+logger = structlog.get_logger()
+
+SOURCE_REQUEST = "request"
+SOURCE_PRECOMPUTED = "precomputed"
+STATUS_READY = "ready"
+STATUS_SERVED = "served"
+STATUS_MISSED = "missed"
+BUDGET_KEY = "precompute:budget:{}"
+# Set while a profile's precomputed plan is queued, so later runs do not queue it again.
+CLAIM_KEY = "precompute:claim:{}"
+CLAIM_TTL = 6 * 3600
+DEFAULT_INTERVAL = timedelta(days=7)
+
+
+@dataclass(frozen=True)
+class Candidate:
+    profile_id: str
+    due_at: datetime
+
+
+def in_window(now: datetime) -> bool:
+    """Whether ``now`` (UTC) falls in the off-peak window; the window may wrap midnight."""
+    start, end = settings.precompute_window_start_hour, settings.precompute_window_end_hour
+    return start <= now.hour < end if start <= end else now.hour >= start or now.hour < end
+
+
+def predict_due(requested: List[datetime]) -> Optional[datetime]:
+    """Next expected request: the last one plus the median gap between past requests."""
+    if not requested:
+        return None
+    gaps = [b - a for a, b in zip(requested, requested[1:]) if b > a]
+    interval = statistics.median(gaps) if gaps else DEFAULT_INTERVAL
+    return requested[-1] + max(interval, timedelta(days=1))
+
+
+def select_candidates(history: Dict[str, List[WeeklyPlanEntity]], now: datetime) -> List[Candidate]:
+    """Profiles due within the horizon, soonest first.
+
+    Profiles whose newest plan is already waiting (``ready``) are skipped, and so are
+    profiles more than one interval overdue: they have most likely stopped asking.
+    """
+    horizon = now + timedelta(hours=settings.precompute_horizon_hours)
+    candidates = []
+    for profile_id, plans in history.items():
+        if plans[-1].status == STATUS_READY:
+            continue
+        # Served precomputed plans stand in for the request they answered.
+        requested = [p.created_at for p in plans if p.source == SOURCE_REQUEST or p.status == STATUS_SERVED]
+        due_at = predict_due(requested)
+        if due_at is None or due_at > horizon:
+            continue
+        if due_at < now and now - due_at > due_at - requested[-1]:
+            continue
+        candidates.append(Candidate(profile_id, due_at))
+    return sorted(candidates, key=lambda c: c.due_at)
+
+
+def reserve_budget(client: Redis, wanted: int, now: datetime) -> int:
+    """Claim up to ``wanted`` plans from today's budget; 0 when Redis is unavailable."""
+    if wanted <= 0:
+        return 0
+    key = BUDGET_KEY.format(now.date().isoformat())
+    try:
+        used = client.incrby(key, wanted)
+        client.expire(key, 2 * 24 * 3600)
+        granted = max(0, min(wanted, settings.precompute_daily_budget - (used - wanted)))
+        if granted < wanted:
+            client.decrby(key, wanted - granted)
+        return granted
+    except RedisError as exc:
+        logger.warning("precompute_budget_unavailable", error=str(exc))
+        return 0
+
+
+def claim(client: Redis, candidates: List[Candidate]) -> List[Candidate]:
+    """Candidates not already queued by an earlier run; none when Redis is unavailable."""
+    if not candidates:
+        return []
+    try:
+        pipe = client.pipeline(transaction=False)
+        for candidate in candidates:
+            pipe.set(CLAIM_KEY.format(candidate.profile_id), 1, nx=True, ex=CLAIM_TTL)
+        return [c for c, claimed in zip(candidates, pipe.execute()) if claimed]
+    except RedisError as exc:
+        logger.warning("precompute_claim_unavailable", error=str(exc))
+        return []
+
+
+def release_claims(client: Redis, candidates: List[Candidate]) -> None:
+    """Let later runs queue these candidates again; a claim that cannot be dropped expires with CLAIM_TTL."""
+    if not candidates:
+        return
+    try:
+        client.delete(*(CLAIM_KEY.format(c.profile_id) for c in candidates))
+    except RedisError as exc:
+        logger.warning("precompute_release_unavailable", error=str(exc))
+
+
+async def plan_history(session: AsyncSession, since: datetime) -> Dict[str, List[WeeklyPlanEntity]]:
+    result = await session.execute(
+        select(WeeklyPlanEntity)
+        .where(WeeklyPlanEntity.created_at >= since)
+        .order_by(WeeklyPlanEntity.profile_id, WeeklyPlanEntity.created_at)
+    )
+    history: Dict[str, List[WeeklyPlanEntity]] = {}
+    for entity in result.scalars():
+        history.setdefault(entity.profile_id, []).append(entity)
+    return history
+
+
+async def schedule(session: AsyncSession, client: Redis, now: Optional[datetime] = None) -> List[PlanRequest]:
+    """Plan requests to precompute in this run; empty outside the off-peak window."""
+    now = now or datetime.utcnow()
+    if not settings.precompute_enabled or not in_window(now):
+        return []
+    history = await plan_history(session, now - timedelta(days=settings.precompute_lookback_days))
+    candidates = claim(client, select_candidates(history, now)[: settings.precompute_batch_size])
+    granted = reserve_budget(client, len(candidates), now)
+    if granted < len(candidates):
+        PLAN_PRECOMPUTE.labels(outcome="over_budget").inc(len(candidates) - granted)
+        release_claims(client, candidates[granted:])
+    candidates = candidates[:granted]
+    if not candidates:
+        return []
+    profiles = await session.execute(select(Profile).where(Profile.id.in_([c.profile_id for c in candidates])))
+    requests = [
+        PlanRequest(
+            profile=UserProfile.model_validate(profile.data),
+            correlation_id=f"precompute-{uuid.uuid4()}",
+            priority="batch",
+            source=SOURCE_PRECOMPUTED,
+        )
+        for profile in profiles.scalars()
+    ]
+    PLAN_PRECOMPUTE.labels(outcome="scheduled").inc(len(requests))
+    logger.info("plan_precompute_scheduled", count=len(requests), profiles=len(history))
+    return requests
@@ -1,10 +1,112 @@
-from typing import List, Optional
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import bindparam, literal_column, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.models.profile import ClinicalReportEntity, MealLog, Profile, WeeklyPlanEntity
+from app.core.http_cache import content_hash
+from app.core.metrics import PLAN_PRECOMPUTE
+from app.core.tracing import traced
+from app.models.profile import (
+    PROFILE_ACTIVITY_LEVEL,
+    PROFILE_GOAL,
+    PROFILE_METRIC_COLUMNS,
+    ClinicalReportEntity,
+    MealLog,
+    Profile,
+    WeeklyPlanEntity,
+)
 from app.schemas.plan import ClinicalReport, WeeklyPlan, UserProfile
+from app.services import nutrition_metrics, plan_reuse, plan_store, precompute, replan
+
+
+def _plan_content(content: bool) -> tuple:
+    if content:
+        return (defer(WeeklyPlanEntity.profile_embedding),)
+    return (
+        defer(WeeklyPlanEntity.plan),
+        defer(WeeklyPlanEntity.profile_embedding),
+        defer(WeeklyPlanEntity.constraints),
+    )
+
+
+def _report_content(content: bool) -> tuple:
+    return () if content else (defer(ClinicalReportEntity.report),)
+
+
+def metric_values(data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Derived metric columns of one profile payload, stamped with the formula version."""
+    targets = nutrition_metrics.compute_targets(data).as_dict()
+    values: Dict[str, Any] = {column: targets[field] for field, column in PROFILE_METRIC_COLUMNS.items()}
+    values["metrics_version"] = nutrition_metrics.METRICS_VERSION
+    return values
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(profile: Profile) -> str:
+    """Opaque keyset cursor: the (created_at, id) of the last profile on a page."""
+    return base64.urlsafe_b64encode(f"{profile.created_at.isoformat()}|{profile.id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        created_at, profile_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), profile_id
+    except ValueError as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from exc
+
+
+@dataclass(frozen=True)
+class ProfileFilters:
+    """Clinician search filters; every filter set must match.
+
+    List filters become one JSONB containment (``@>``) served by the GIN
+    ``jsonb_path_ops`` index; goal and activity level compare the indexed expressions;
+    BMI and calorie ranges use the indexed derived-metric columns.
+    """
+
+    language: Optional[str] = None
+    conditions: Tuple[str, ...] = ()
+    medications: Tuple[str, ...] = ()
+    goal: Optional[str] = None
+    activity_level: Optional[str] = None
+    min_bmi: Optional[float] = None
+    max_bmi: Optional[float] = None
+    min_calories: Optional[float] = None
+    max_calories: Optional[float] = None
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.language:
+            clauses.append(Profile.language == self.language)
+        clinical = {}
+        if self.conditions:
+            clinical["medicalConditions"] = list(self.conditions)
+        if self.medications:
+            clinical["medications"] = list(self.medications)
+        if clinical:
+            clauses.append(Profile.data.contains({"clinical": clinical}))
+        if self.goal:
+            clauses.append(literal_column(PROFILE_GOAL) == bindparam("goal", self.goal))
+        if self.activity_level:
+            clauses.append(literal_column(PROFILE_ACTIVITY_LEVEL) == bindparam("activity_level", self.activity_level))
+        if self.min_bmi is not None:
+            clauses.append(Profile.bmi >= self.min_bmi)
+        if self.max_bmi is not None:
+            clauses.append(Profile.bmi <= self.max_bmi)
+        if self.min_calories is not None:
+            clauses.append(Profile.target_calories >= self.min_calories)
+        if self.max_calories is not None:
+            clauses.append(Profile.target_calories <= self.max_calories)
+        return clauses
 
 
 class ProfileService:
@@ -13,26 +115,46 @@ class ProfileService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @traced("profile_service.create_profile")
     async def create_profile(self, profile: UserProfile) -> Profile:
-        db_obj = Profile(
-            id=profile.id,
-            name=profile.name,
-            language=profile.language,
-            data=profile.model_dump(),
-        )
+        data = profile.model_dump()
+        db_obj = Profile(id=profile.id, name=profile.name, language=profile.language, data=data, **metric_values(data))
         self.session.add(db_obj)
         await self.session.commit()
         await self.session.refresh(db_obj)
         return db_obj
 
+    @traced("profile_service.get_profile")
     async def get_profile(self, profile_id: str) -> Optional[Profile]:
         result = await self.session.execute(select(Profile).where(Profile.id == profile_id))
         return result.scalar_one_or_none()
 
-    async def list_profiles(self) -> List[Profile]:
-        result = await self.session.execute(select(Profile))
+    @traced("profile_service.list_profiles")
+    async def list_profiles(
+        self,
+        filters: ProfileFilters = ProfileFilters(),
+        limit: int = 50,
+        after: Optional[str] = None,
+        slim: bool = False,
+    ) -> List[Profile]:
+        """One page of profiles, newest first, continuing after the ``after`` cursor.
+
+        ``slim`` leaves the ``data`` blob out of the query.
+        """
+        statement = (
+            select(Profile)
+            .where(*filters.clauses())
+            .order_by(Profile.created_at.desc(), Profile.id.desc())
+            .limit(limit)
+        )
+        if after:
+            statement = statement.where(tuple_(Profile.created_at, Profile.id) < tuple_(*decode_cursor(after)))
+        if slim:
+            statement = statement.options(defer(Profile.data, raiseload=True))
+        result = await self.session.execute(statement)
         return list(result.scalars().all())
 
+    @traced("profile_service.update_profile")
     async def update_profile(self, profile_id: str, profile: UserProfile) -> Optional[Profile]:
         db_obj = await self.get_profile(profile_id)
         if not db_obj:
@@ -40,10 +162,46 @@ class ProfileService:
         db_obj.name = profile.name
         db_obj.language = profile.language
         db_obj.data = profile.model_dump()
+        for column, value in metric_values(db_obj.data).items():
+            setattr(db_obj, column, value)
         await self.session.commit()
         await self.session.refresh(db_obj)
         return db_obj
 
+    @traced("profile_service.recompute_metrics")
+    async def recompute_metrics(self, batch_size: int = 1000) -> int:
+        """Refresh the derived metrics of profiles never computed or computed by older formulas.
+
+        Each batch is computed in one vectorised pass and written with one executemany
+        UPDATE. ``updated_at`` is kept: the profile itself did not change.
+        """
+        version = nutrition_metrics.METRICS_VERSION
+        stale = or_(Profile.metrics_version.is_(None), Profile.metrics_version < version)
+        table = Profile.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                updated_at=table.c.updated_at,
+                metrics_version=version,
+                **{column: bindparam(f"b_{column}") for column in PROFILE_METRIC_COLUMNS.values()},
+            )
+        )
+        total = 0
+        while True:
+            rows = (await self.session.execute(select(Profile.id, Profile.data).where(stale).limit(batch_size))).all()
+            if not rows:
+                return total
+            values = nutrition_metrics.compute_targets_batch([data for _, data in rows])
+            params = [
+                {"b_id": profile_id, **{f"b_{column}": float(values[field][i]) for field, column in PROFILE_METRIC_COLUMNS.items()}}
+                for i, (profile_id, _) in enumerate(rows)
+            ]
+            await self.session.execute(statement, params)
+            await self.session.commit()
+            total += len(rows)
+
+    @traced("profile_service.delete_profile")
     async def delete_profile(self, profile_id: str) -> bool:
         obj = await self.get_profile(profile_id)
         if not obj:
@@ -52,20 +210,95 @@ class ProfileService:
         await self.session.commit()
         return True
 
-    async def add_plan(self, profile_id: str, plan: WeeklyPlan) -> WeeklyPlanEntity:
-        db_obj = WeeklyPlanEntity(profile_id=profile_id, plan=plan.model_dump())
+    @traced("profile_service.add_plan")
+    async def add_plan(
+        self,
+        profile_id: str,
+        plan: WeeklyPlan,
+        profile: Optional[UserProfile] = None,
+        parent_id: Optional[str] = None,
+        source: str = precompute.SOURCE_REQUEST,
+        correlation_id: Optional[str] = None,
+        job_id: Optional[str] = None,
+    ) -> WeeklyPlanEntity:
+        """Store a plan; when this profile already has one from ``job_id``, that row is returned."""
+        if job_id:
+            existing = await self._by_job(WeeklyPlanEntity, profile_id, job_id)
+            if existing is not None:
+                return await plan_store.load_one(self.session, existing)
+        document = plan.model_dump()
+        body_hash, instance = await plan_store.store(self.session, document)
+        db_obj = WeeklyPlanEntity(
+            profile_id=profile_id,
+            body_hash=body_hash,
+            instance=instance,
+            content_hash=content_hash(document),
+            parent_id=parent_id,
+            source=source,
+            correlation_id=correlation_id,
+            job_id=job_id,
+        )
+        if source == precompute.SOURCE_PRECOMPUTED:
+            db_obj.status = precompute.STATUS_READY
+        else:
+            # A precomputed plan still waiting when the user got a new one was wasted.
+            missed = await self.session.execute(
+                update(WeeklyPlanEntity)
+                .where(WeeklyPlanEntity.profile_id == profile_id, WeeklyPlanEntity.status == precompute.STATUS_READY)
+                .values(status=precompute.STATUS_MISSED)
+            )
+            if missed.rowcount:
+                PLAN_PRECOMPUTE.labels(outcome="miss").inc(missed.rowcount)
+        if profile is not None:
+            # Indexed for nearest-plan reuse by other, similar profiles.
+            db_obj.profile_embedding = plan_reuse.encode_profile(profile).tolist()
+            db_obj.constraint_signature = plan_reuse.constraint_signature(profile)
+            db_obj.constraints = replan.plan_constraints(profile)
         self.session.add(db_obj)
-        await self.session.commit()
+        if not await self._commit_once(WeeklyPlanEntity, profile_id, job_id):
+            return await plan_store.load_one(self.session, await self._by_job(WeeklyPlanEntity, profile_id, job_id))
         await self.session.refresh(db_obj)
+        set_committed_value(db_obj, "plan", document)
         return db_obj
 
-    async def add_report(self, profile_id: str, report: ClinicalReport) -> ClinicalReportEntity:
-        db_obj = ClinicalReportEntity(profile_id=profile_id, report=report.model_dump())
+    @traced("profile_service.add_report")
+    async def add_report(
+        self, profile_id: str, report: ClinicalReport, correlation_id: Optional[str] = None, job_id: Optional[str] = None
+    ) -> ClinicalReportEntity:
+        if job_id:
+            existing = await self._by_job(ClinicalReportEntity, profile_id, job_id)
+            if existing is not None:
+                return existing
+        document = report.model_dump()
+        db_obj = ClinicalReportEntity(
+            profile_id=profile_id,
+            report=document,
+            content_hash=content_hash(document),
+            correlation_id=correlation_id,
+            job_id=job_id,
+        )
         self.session.add(db_obj)
-        await self.session.commit()
+        if not await self._commit_once(ClinicalReportEntity, profile_id, job_id):
+            return await self._by_job(ClinicalReportEntity, profile_id, job_id)
         await self.session.refresh(db_obj)
         return db_obj
 
+    async def _by_job(self, model, profile_id: str, job_id: str):
+        result = await self.session.execute(select(model).where(model.profile_id == profile_id, model.job_id == job_id))
+        return result.scalar_one_or_none()
+
+    async def _commit_once(self, model, profile_id: str, job_id: Optional[str]) -> bool:
+        """Commit; False when a concurrent delivery of the same task stored its row first."""
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            if not job_id or await self._by_job(model, profile_id, job_id) is None:
+                raise
+            return False
+        return True
+
+    @traced("profile_service.add_log")
     async def add_log(self, profile_id: str, entry: dict) -> MealLog:
         db_obj = MealLog(profile_id=profile_id, entry=entry)
         self.session.add(db_obj)
@@ -73,26 +306,112 @@ class ProfileService:
         await self.session.refresh(db_obj)
         return db_obj
 
+    @traced("profile_service.list_logs")
     async def list_logs(self, profile_id: str) -> List[MealLog]:
         result = await self.session.execute(select(MealLog).where(MealLog.profile_id == profile_id))
         return list(result.scalars().all())
 
-    async def latest_plan(self, profile_id: str) -> Optional[WeeklyPlanEntity]:
+    @traced("profile_service.latest_plan")
+    async def latest_plan(self, profile_id: str, content: bool = True) -> Optional[WeeklyPlanEntity]:
+        """Newest plan; without ``content`` only its id, hash and bookkeeping columns are read."""
+        statement = (
+            select(WeeklyPlanEntity)
+            .where(WeeklyPlanEntity.profile_id == profile_id)
+            .order_by(WeeklyPlanEntity.created_at.desc())
+            .limit(1)
+        )
+        result = await self.session.execute(statement.options(*_plan_content(content)))
+        entity = result.scalars().first()
+        return await plan_store.load_one(self.session, entity) if content else entity
+
+    @traced("profile_service.get_plan")
+    async def get_plan(self, profile_id: str, plan_id: str, content: bool = True) -> Optional[WeeklyPlanEntity]:
+        statement = select(WeeklyPlanEntity).where(WeeklyPlanEntity.id == plan_id, WeeklyPlanEntity.profile_id == profile_id)
+        result = await self.session.execute(statement.options(*_plan_content(content)))
+        entity = result.scalars().first()
+        return await plan_store.load_one(self.session, entity) if content else entity
+
+    @traced("profile_service.load_content")
+    async def load_content(self, entity) -> None:
+        """Load the document deferred by a ``content=False`` read."""
+        if isinstance(entity, WeeklyPlanEntity):
+            await self.session.refresh(entity, ["plan"])
+            await plan_store.load(self.session, [entity])
+        else:
+            await self.session.refresh(entity, ["report"])
+
+    @traced("profile_service.ready_plan")
+    async def ready_plan(self, profile_id: str, profile: UserProfile) -> Optional[WeeklyPlanEntity]:
+        """The profile's precomputed plan, if one is waiting and still fits the profile."""
         result = await self.session.execute(
-            select(WeeklyPlanEntity).where(WeeklyPlanEntity.profile_id == profile_id).order_by(WeeklyPlanEntity.created_at.desc())
+            select(WeeklyPlanEntity)
+            .where(WeeklyPlanEntity.profile_id == profile_id, WeeklyPlanEntity.status == precompute.STATUS_READY)
+            .order_by(WeeklyPlanEntity.created_at.desc())
         )
-        return result.scalars().first()
+        entity = result.scalars().first()
+        if entity is None or replan.diff_constraints(entity.constraints, replan.plan_constraints(profile)).changed:
+            return None
+        return await plan_store.load_one(self.session, entity)
 
-    async def list_plans(self, profile_id: str) -> List[WeeklyPlanEntity]:
-        result = await self.session.execute(select(WeeklyPlanEntity).where(WeeklyPlanEntity.profile_id == profile_id))
-        return list(result.scalars().all())
+    @traced("profile_service.serve_plan")
+    async def serve_plan(self, entity: WeeklyPlanEntity) -> WeeklyPlanEntity:
+        """Mark a ready precomputed plan as delivered to its user (a precompute hit).
 
-    async def latest_report(self, profile_id: str) -> Optional[ClinicalReportEntity]:
+        A single conditional UPDATE: repeated, retried or concurrent reads of the plan
+        (``GET /plans/latest`` is safe to repeat) change it and count the hit once.
+        """
+        if entity.status != precompute.STATUS_READY:
+            return entity
         result = await self.session.execute(
-            select(ClinicalReportEntity).where(ClinicalReportEntity.profile_id == profile_id).order_by(ClinicalReportEntity.created_at.desc())
+            update(WeeklyPlanEntity)
+            .where(WeeklyPlanEntity.id == entity.id, WeeklyPlanEntity.status == precompute.STATUS_READY)
+            .values(status=precompute.STATUS_SERVED)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        set_committed_value(entity, "status", precompute.STATUS_SERVED)
+        if result.rowcount:
+            PLAN_PRECOMPUTE.labels(outcome="hit").inc()
+        return entity
+
+    @traced("profile_service.list_plans")
+    async def list_plans(self, profile_id: str, content: bool = True) -> List[WeeklyPlanEntity]:
+        statement = (
+            select(WeeklyPlanEntity)
+            .where(WeeklyPlanEntity.profile_id == profile_id)
+            .order_by(WeeklyPlanEntity.created_at, WeeklyPlanEntity.id)
         )
+        result = await self.session.execute(statement.options(*_plan_content(content)))
+        plans = list(result.scalars().all())
+        if content:
+            await plan_store.load(self.session, plans)
+        return plans
+
+    @traced("profile_service.latest_report")
+    async def latest_report(self, profile_id: str, content: bool = True) -> Optional[ClinicalReportEntity]:
+        statement = (
+            select(ClinicalReportEntity)
+            .where(ClinicalReportEntity.profile_id == profile_id)
+            .order_by(ClinicalReportEntity.created_at.desc())
+            .limit(1)
+        )
+        result = await self.session.execute(statement.options(*_report_content(content)))
+        return result.scalars().first()
+
+    @traced("profile_service.get_report")
+    async def get_report(self, profile_id: str, report_id: str, content: bool = True) -> Optional[ClinicalReportEntity]:
+        statement = select(ClinicalReportEntity).where(
+            ClinicalReportEntity.id == report_id, ClinicalReportEntity.profile_id == profile_id
+        )
+        result = await self.session.execute(statement.options(*_report_content(content)))
         return result.scalars().first()
 
-    async def list_reports(self, profile_id: str) -> List[ClinicalReportEntity]:
-        result = await self.session.execute(select(ClinicalReportEntity).where(ClinicalReportEntity.profile_id == profile_id))
+    @traced("profile_service.list_reports")
+    async def list_reports(self, profile_id: str, content: bool = True) -> List[ClinicalReportEntity]:
+        statement = (
+            select(ClinicalReportEntity)
+            .where(ClinicalReportEntity.profile_id == profile_id)
+            .order_by(ClinicalReportEntity.created_at, ClinicalReportEntity.id)
+        )
+        result = await self.session.execute(statement.options(*_report_content(content)))
         return list(result.scalars().all())
@@ -0,0 +1,150 @@
+"""Compact, token-budgeted prompt encoding for Gemini calls.
+
+Each task projects only the profile fields it uses (short keys, rounded numbers,
+empty values dropped) and sends plans as one pipe-separated row per meal instead of
+``model_dump_json``. Prompts are assembled from sections; when the estimate exceeds
+the operation's budget in ``settings.gemini_prompt_budgets`` optional sections are
+dropped, last first, and ``PromptBudgetExceeded`` is raised if the required ones
+alone do not fit.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import structlog
+
+from app.core.config import settings
+from app.core.metrics import GEMINI_PROMPT_TOKENS
+from app.schemas.plan import UserProfile, WeeklyPlan
+
+logger = structlog.get_logger()
+
+# Gemini tokenizes English/Portuguese JSON at roughly four characters per token;
+# the estimate only has to be stable enough to budget and compare prompts.
+CHARS_PER_TOKEN = 4
+
+# Short key -> (profile section, field) for each task's projection.
+PROFILE_FIELDS = {
+    "sex": ("biometrics", "gender"),
+    "age": ("biometrics", "age"),
+    "cm": ("biometrics", "height"),
+    "kg": ("biometrics", "weight"),
+    "activity": ("lifestyle", "activityLevel"),
+    "goal": ("goals", "primary"),
+    "target_kg": ("goals", "targetWeight"),
+    "diet": ("routine", "dietaryPreference"),
+    "meals": ("routine", "mealsPerDay"),
+    "times": ("routine", "preferredMealTimes"),
+    "allergies": ("routine", "allergies"),
+    "intolerances": ("routine", "intolerances"),
+    "dislikes": ("routine", "dislikes"),
+    "restrictions": ("routine", "culturalRestrictions"),
+    "conditions": ("clinical", "medicalConditions"),
+    "meds": ("clinical", "medications"),
+}
+PLAN_PROFILE = tuple(PROFILE_FIELDS)
+CLINICAL_PROFILE = ("sex", "age", "cm", "kg", "activity", "goal", "target_kg", "allergies", "conditions", "meds")
+
+PLAN_SCHEMA = (
+    "{id,days[{day (full English name),meals[{id,name,description,calories,macros{protein,carbs,fats},timestamp}],"
+    "dailyCalories,dailyMacros{protein,carbs,fats}}],averageCalories,averageMacros{protein,carbs,fats},"
+    "recommendations[],generatedAt}"
+)
+MEAL_HEADER = "day|time|name|kcal|p|c|f"
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when the required sections of a prompt alone exceed its token budget."""
+
+
+@dataclass(frozen=True)
+class Section:
+    label: str
+    body: str
+    required: bool = True
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _compact_value(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value) if abs(value) >= 10 else round(value, 1)
+    if isinstance(value, list):
+        return [_compact_value(v) for v in value if v not in (None, "", [])]
+    return value
+
+
+def profile_context(profile: UserProfile, fields: Sequence[str] = PLAN_PROFILE) -> str:
+    """Compact JSON of the selected profile fields, empty ones omitted."""
+    data = profile.model_dump()
+    projected: Dict[str, Any] = {}
+    for key in fields:
+        section, name = PROFILE_FIELDS[key]
+        value = _compact_value((data.get(section) or {}).get(name))
+        if value not in (None, "", [], {}):
+            projected[key] = value
+    return compact_json(projected)
+
+
+def _num(value: float) -> str:
+    return f"{round(value):d}"
+
+
+def meal_rows(plan: WeeklyPlan) -> str:
+    """One ``day|time|name|kcal|p|c|f`` row per meal."""
+    rows = [MEAL_HEADER]
+    for day in plan.days:
+        for meal in day.meals:
+            m = meal.macros
+            rows.append(
+                "|".join(
+                    (day.day[:3], meal.timestamp, meal.name, _num(meal.calories), _num(m.protein), _num(m.carbs), _num(m.fats))
+                )
+            )
+    return "\n".join(rows)
+
+
+def meal_descriptions(plan: WeeklyPlan) -> str:
+    return "\n".join(
+        f"{day.day[:3]} {i + 1}: {meal.description}" for day in plan.days for i, meal in enumerate(day.meals) if meal.description
+    )
+
+
+def day_totals(plan: WeeklyPlan) -> str:
+    rows = ["day|kcal|p|c|f"]
+    for day in plan.days:
+        m = day.dailyMacros
+        rows.append("|".join((day.day[:3], _num(day.dailyCalories), _num(m.protein), _num(m.carbs), _num(m.fats))))
+    return "\n".join(rows)
+
+
+def _join(instruction: str, sections: Iterable[Section]) -> str:
+    return "\n".join([instruction, *(f"{s.label}:\n{s.body}" for s in sections)])
+
+
+def build(operation: str, instruction: str, sections: List[Section], budget: Optional[int] = None) -> str:
+    """Assemble a prompt within the operation's token budget and log its estimated size."""
+    budget = budget if budget is not None else settings.gemini_prompt_budgets.get(operation, 0)
+    kept = list(sections)
+    dropped: List[str] = []
+    prompt = _join(instruction, kept)
+    while budget and estimate_tokens(prompt) > budget:
+        optional = [s for s in kept if not s.required]
+        if not optional:
+            raise PromptBudgetExceeded(
+                f"{operation} prompt needs ~{estimate_tokens(prompt)} tokens, budget is {budget}"
+            )
+        kept.remove(optional[-1])
+        dropped.append(optional[-1].label)
+        prompt = _join(instruction, kept)
+    tokens = estimate_tokens(prompt)
+    GEMINI_PROMPT_TOKENS.labels(operation=operation).observe(tokens)
+    logger.info("gemini_prompt", operation=operation, estimated_tokens=tokens, budget=budget, dropped=dropped)
+    return prompt
@@ -0,0 +1,173 @@
+"""Diff-aware re-planning against a profile's latest stored plan.
+
+Each stored plan keeps a snapshot of the constraints it was built for. A re-plan
+compares that snapshot with the edited profile: a new meal layout or diet type needs
+a full generation, but a new calorie target only regenerates the days that now miss
+it by more than ``CALORIE_TOLERANCE``, a new allergy or dislike only the meals that contain it, and new meal times are
+patched in place. Weekly averages are updated from the changed days only.
+"""
+
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.plan import MacroBreakdown, UserProfile, WeeklyPlan
+from app.services import plan_engine
+from app.services.food_db import FoodTable, load_foods
+from app.services.food_index import normalize, term_pattern
+from app.services.nutrition_metrics import compute_targets
+
+CALORIE_TOLERANCE = 0.05
+_ITEM = re.compile(r"\d+(?:\.\d+)? g ([^,]+)")
+
+
+def plan_constraints(profile: UserProfile) -> Dict[str, Any]:
+    """JSON snapshot of what a plan for ``profile`` has to satisfy."""
+    targets = compute_targets(profile.model_dump())
+    preference, excluded, dislikes = plan_engine.restrictions(profile)
+    layout = plan_engine.meal_layout(profile)
+    return {
+        "calories": targets.calories,
+        "protein": targets.protein,
+        "carbs": targets.carbs,
+        "fats": targets.fats,
+        "preference": preference,
+        "excluded": sorted(excluded),
+        "dislikes": sorted({normalize(d) for d in dislikes} - {""}),
+        "layout": list(layout),
+        "times": plan_engine.meal_times(profile, layout),
+    }
+
+
+@dataclass(frozen=True)
+class ConstraintDiff:
+    full: bool
+    targets: bool = False
+    exclusions: Tuple[str, ...] = ()
+    dislikes: Tuple[str, ...] = ()
+    times: bool = False
+
+    @property
+    def changed(self) -> bool:
+        return self.full or self.targets or bool(self.exclusions or self.dislikes) or self.times
+
+
+def diff_constraints(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> ConstraintDiff:
+    """What changed between two snapshots; unknown or structural changes mean a full re-plan."""
+    if not old or old.get("layout") != new["layout"] or old.get("preference") != new["preference"]:
+        return ConstraintDiff(full=True)
+    targets = any(
+        abs(new[key] - old.get(key, 0.0)) > CALORIE_TOLERANCE * max(new[key], 1.0)
+        for key in ("calories", "protein", "carbs", "fats")
+    )
+    return ConstraintDiff(
+        full=False,
+        targets=targets,
+        exclusions=tuple(sorted(set(new["excluded"]) - set(old.get("excluded") or []))),
+        dislikes=tuple(sorted(set(new["dislikes"]) - set(old.get("dislikes") or []))),
+        times=old.get("times") != new["times"],
+    )
+
+
+@dataclass(frozen=True)
+class ReplanResult:
+    plan: WeeklyPlan
+    diff: ConstraintDiff
+    days: Tuple[int, ...]
+    meals: Tuple[Tuple[int, int], ...]
+
+    @property
+    def regenerated_fraction(self) -> float:
+        total = sum(len(day.meals) for day in self.plan.days) or 1
+        per_day = total / max(len(self.plan.days), 1)
+        return round((len(self.days) * per_day + len(self.meals)) / total, 3)
+
+
+def _seed_usage(ctx: plan_engine.PlanContext, plan: WeeklyPlan, skip_days: set) -> None:
+    """Count foods of the kept meals so regenerated ones still rotate."""
+    index = {name: i for i, name in enumerate(ctx.table.names)}
+    for day_index, day in enumerate(plan.days):
+        if day_index in skip_days:
+            continue
+        for meal in day.meals:
+            for name in _ITEM.findall(meal.description or ""):
+                food = index.get(name.strip())
+                if food is not None:
+                    ctx.usage[food] += 1
+
+
+def _shift(value: float, old: List[float], new: List[float], count: int) -> float:
+    return round(value + (sum(new) - sum(old)) / count, 1)
+
+
+def replan(
+    parent: WeeklyPlan,
+    parent_constraints: Optional[Dict[str, Any]],
+    profile: UserProfile,
+    table: Optional[FoodTable] = None,
+) -> Optional[ReplanResult]:
+    """Regenerate only what violates the profile's current constraints; None if a full plan is needed."""
+    table = table or load_foods()
+    constraints = plan_constraints(profile)
+    diff = diff_constraints(parent_constraints, constraints)
+    layout = constraints["layout"]
+    if diff.full or len(parent.days) != len(plan_engine.DAYS) or any(len(d.meals) != len(layout) for d in parent.days):
+        return None
+
+    target = constraints["calories"]
+    redo_days = set()
+    if diff.targets:
+        redo_days = {
+            i for i, day in enumerate(parent.days) if abs(day.dailyCalories - target) > CALORIE_TOLERANCE * target
+        }
+    # Every current restriction is checked, not only the new ones: a parent from
+    # Gemini may already break one.
+    routine = profile.routine or {}
+    phrases = [*(routine.get("allergies") or []), *(routine.get("intolerances") or []), *constraints["dislikes"]]
+    forbidden = term_pattern(table, set(constraints["excluded"]), phrases)
+
+    ctx = plan_engine.plan_context(profile, table)
+    _seed_usage(ctx, parent, redo_days)
+    days = list(parent.days)
+    redo_meals: List[Tuple[int, int]] = []
+    for day_index, day in enumerate(parent.days):
+        if day_index in redo_days:
+            days[day_index] = plan_engine.build_day(ctx, day_index)
+            continue
+        meals = list(day.meals)
+        for slot_index, meal in enumerate(day.meals):
+            if forbidden and forbidden.search(normalize(f"{meal.name} {meal.description or ''}")):
+                meals[slot_index] = plan_engine.build_meal(ctx, day_index, slot_index)
+                redo_meals.append((day_index, slot_index))
+            elif diff.times and meal.timestamp != ctx.times[slot_index]:
+                meals[slot_index] = meal.model_copy(update={"timestamp": ctx.times[slot_index]})
+        if meals != day.meals:
+            days[day_index] = plan_engine.day_plan(day.day, meals)
+
+    changed = [i for i, (old, new) in enumerate(zip(parent.days, days)) if old is not new]
+    old_days = [parent.days[i] for i in changed]
+    new_days = [days[i] for i in changed]
+    count = len(days)
+    plan = WeeklyPlan(
+        id=str(uuid.uuid4()),
+        days=days,
+        averageCalories=_shift(
+            parent.averageCalories, [d.dailyCalories for d in old_days], [d.dailyCalories for d in new_days], count
+        ),
+        averageMacros=MacroBreakdown(
+            **{
+                key: _shift(
+                    getattr(parent.averageMacros, key),
+                    [getattr(d.dailyMacros, key) for d in old_days],
+                    [getattr(d.dailyMacros, key) for d in new_days],
+                    count,
+                )
+                for key in ("protein", "carbs", "fats")
+            }
+        ),
+        recommendations=plan_engine.recommendations(ctx) if diff.targets else parent.recommendations,
+        generatedAt=datetime.now(timezone.utc).isoformat(),
+    )
+    return ReplanResult(plan, diff, tuple(sorted(redo_days)), tuple(redo_meals))
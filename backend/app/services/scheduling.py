@@ -0,0 +1,194 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import structlog
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.resources import resources
+
+logger = structlog.get_logger()
+
+LANES = ("interactive", "batch")
+MAX_PRIORITY = 9
+SLOT_TTL_SECONDS = 3600
+
+# Prune expired slots, check the lane limit and take the slot in one step, so
+# concurrent admits cannot overshoot. KEYS: lane set, tenant's set in that lane.
+# ARGV: slot member, now, slot ttl, lane limit. Returns {reserved, backlog, tenant pending}.
+RESERVE_SCRIPT = """
+local cutoff = tonumber(ARGV[2]) - tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', cutoff)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', cutoff)
+local backlog = redis.call('ZCARD', KEYS[1])
+local mine = redis.call('ZCARD', KEYS[2])
+if backlog >= tonumber(ARGV[4]) then
+    return {0, backlog, mine}
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return {1, backlog, mine}
+"""
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a lane's backlog is over its admission limit."""
+
+    def __init__(self, lane: str, backlog: int, retry_after: int):
+        super().__init__(f"{lane} backlog {backlog} over admission limit")
+        self.lane = lane
+        self.backlog = backlog
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class Admission:
+    lane: str
+    queue: str
+    priority: int
+
+
+def pending_key(lane: str) -> str:
+    """Sorted set of a lane's admitted jobs (``<tenant>|<job id>``), scored by admission time."""
+    return f"sched:pending:{lane}"
+
+
+def tenant_key(lane: str, tenant: str) -> str:
+    return f"sched:pending:{lane}:{tenant}"
+
+
+def slot_member(tenant: str, job_id: str) -> str:
+    return f"{tenant}|{job_id}"
+
+
+def slot_cutoff(now: Optional[float] = None) -> float:
+    """Slots admitted before this time belong to jobs that died without releasing them."""
+    return (now if now is not None else time.time()) - SLOT_TTL_SECONDS
+
+
+def queue_for(lane: str) -> str:
+    return settings.plan_queue_batch if lane == "batch" else settings.plan_queue_interactive
+
+
+def admission_limit(lane: str) -> int:
+    return settings.plan_admission_limit_batch if lane == "batch" else settings.plan_admission_limit_interactive
+
+
+def retry_after_seconds(backlog: int, limit: int) -> int:
+    """Time for the lane to drain back under its limit at the expected service rate."""
+    excess = backlog - limit + 1
+    return max(1, min(300, math.ceil(excess / max(settings.plan_service_rate, 0.01))))
+
+
+def tenant_priority(tenant_pending: int) -> int:
+    """Deficit-style fairness: every `quantum` jobs a tenant already has queued costs one priority step.
+
+    A tenant with nothing queued always lands on step 0, so a bulk submitter cannot push a
+    light tenant behind its own backlog.
+    """
+    quantum = max(settings.plan_fair_share_quantum, 1)
+    return min(MAX_PRIORITY, tenant_pending // quantum)
+
+
+def decide(pending: Dict[str, Dict[str, int]], tenant: str, requested_lane: str) -> Admission:
+    """Pick lane, queue and priority for a job given per-lane, per-tenant pending counts."""
+    lane = requested_lane if requested_lane in LANES else "interactive"
+    if lane == "interactive":
+        interactive = pending.get("interactive", {})
+        depth = sum(interactive.values())
+        if depth >= settings.plan_interactive_overflow_depth and interactive:
+            fair_share = depth / len(interactive)
+            if interactive.get(tenant, 0) >= max(fair_share, settings.plan_fair_share_quantum):
+                lane = "batch"
+
+    lane_pending = pending.get(lane, {})
+    backlog = sum(lane_pending.values())
+    limit = admission_limit(lane)
+    if backlog >= limit:
+        raise AdmissionRejected(lane, backlog, retry_after_seconds(backlog, limit))
+    return Admission(lane=lane, queue=queue_for(lane), priority=tenant_priority(lane_pending.get(tenant, 0)))
+
+
+def _decode(members: List) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for member in members:
+        member = member.decode() if isinstance(member, bytes) else member
+        tenant = member.rsplit("|", 1)[0]
+        counts[tenant] = counts.get(tenant, 0) + 1
+    return counts
+
+
+class PlanScheduler:
+    """Admission control and fair lane routing for plan generation jobs.
+
+    Uses the process's shared Redis pool unless given a client.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self._redis = redis
+
+    @property
+    def redis(self) -> Redis:
+        return self._redis or resources.redis
+
+    async def pending(self) -> Dict[str, Dict[str, int]]:
+        """Live slots per lane and tenant; slots older than ``SLOT_TTL_SECONDS`` are not counted."""
+        pipe = self.redis.pipeline(transaction=False)
+        for lane in LANES:
+            pipe.zrangebyscore(pending_key(lane), slot_cutoff(), "+inf")
+        results = await pipe.execute()
+        return {lane: _decode(members) for lane, members in zip(LANES, results)}
+
+    async def admit(self, tenant: str, requested_lane: str, job_id: str) -> Admission:
+        """Reserve a slot for the tenant's job or raise AdmissionRejected; fails open if Redis is down.
+
+        The lane is picked from a snapshot of the backlog; the limit check and the
+        reservation itself are one Lua script, and the priority comes from the tenant's
+        pending count at that moment.
+        """
+        lane = requested_lane if requested_lane in LANES else "interactive"
+        try:
+            pending = await self.pending()
+        except RedisError as exc:
+            logger.warning("scheduler_unavailable", error=str(exc))
+            return Admission(lane=lane, queue=queue_for(lane), priority=tenant_priority(0))
+
+        admission = decide(pending, tenant, requested_lane)
+        try:
+            reserved, backlog, mine = await self.redis.register_script(RESERVE_SCRIPT)(
+                keys=[pending_key(admission.lane), tenant_key(admission.lane, tenant)],
+                args=[slot_member(tenant, job_id), time.time(), SLOT_TTL_SECONDS, admission_limit(admission.lane)],
+            )
+        except RedisError as exc:
+            logger.warning("scheduler_reserve_failed", error=str(exc))
+            return admission
+        if not reserved:
+            limit = admission_limit(admission.lane)
+            raise AdmissionRejected(admission.lane, backlog, retry_after_seconds(backlog, limit))
+        admission = Admission(lane=admission.lane, queue=admission.queue, priority=tenant_priority(mine))
+        if admission.lane != requested_lane:
+            logger.info("plan_lane_demoted", tenant=tenant, requested=requested_lane, lane=admission.lane)
+        return admission
+
+
+def release_slot(client: SyncRedis, lane: str, tenant: Optional[str], job_id: Optional[str]) -> None:
+    """Give back a job's slot once it finishes, from the worker side; safe to repeat."""
+    if not tenant or not job_id:
+        return
+    member = slot_member(tenant, job_id)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zrem(pending_key(lane), member)
+        pipe.zrem(tenant_key(lane, tenant), member)
+        pipe.execute()
+    except RedisError as exc:
+        logger.warning("scheduler_release_failed", error=str(exc))
+
+
+scheduler = PlanScheduler()
@@ -1,49 +1,105 @@
 import time
 import uuid
-import asyncio
+from functools import lru_cache
+from typing import Optional
 
 import orjson
-from redis import Redis
+import structlog
 
 from app.core.celery_app import celery_app
 from app.core.config import settings
 from app.schemas.plan import PlanRequest, PlanTaskResponse
-from app.services import gemini
 from app.agents.registry import AgentRegistry
 from app.agents.orchestrator import OrchestratorAgent
 from app.agents.nutrition_plan_agent import NutritionPlanAgent
 from app.agents.clinical_safety_agent import ClinicalSafetyAgent
 from app.agents.behavior_coach_agent import BehaviorCoachAgent
-from app.agents.base_agent import AgentConfig
-from app.core.database import AsyncSessionLocal
+from app.agents.base_agent import AgentConfig, BaseAgent
+from app.agents.remote_agent import RemoteAgent
+from app.agents.transport import get_transport
+from app.core.resources import resources
+from app.core.deadline import deadline_scope
+from app.services.agent_memory import memory_store
+from app.services.checkpoints import PlanCheckpoints
+from app.services import llm_usage
+from app.services import precompute
 from app.services.profile_service import ProfileService
+from app.services.scheduling import MAX_PRIORITY, release_slot
+from app.core.tracing import extract_context, inject_headers, record_queue_wait, task_headers, traced, tracer
 
 
 STREAM_KEY = "agent:events"
-redis_client = Redis.from_url(settings.redis_url)
+# Checkpoint field marking that the request's results are stored (plan, report, memory).
+PERSISTED_STEP = "_persisted"
 
 
 def _publish_event(event: dict) -> None:
     """Publish structured event JSON into Redis Streams."""
-    redis_client.xadd(STREAM_KEY, {"json": orjson.dumps(event)})
-
-
-async def _persist_results(profile_id: str, weekly_plan, clinical_report) -> None:
-    async with AsyncSessionLocal() as session:
+    resources.sync_redis.xadd(STREAM_KEY, {"json": orjson.dumps(event)})
+
+
+@traced("persist_results")
+async def _persist_results(
+    profile_id: str,
+    weekly_plan,
+    clinical_report,
+    profile=None,
+    parent_id=None,
+    insights=None,
+    source="request",
+    correlation_id=None,
+    job_id=None,
+) -> None:
+    """Store the results; idempotent on the profile and ``job_id``, so a rerun stores nothing twice."""
+    async with resources.session() as session:
         service = ProfileService(session)
         if weekly_plan:
-            await service.add_plan(profile_id, weekly_plan)
+            await service.add_plan(profile_id, weekly_plan, profile, parent_id, source, correlation_id, job_id)
         if clinical_report:
-            await service.add_report(profile_id, clinical_report)
+            await service.add_report(profile_id, clinical_report, correlation_id, job_id)
+
+    def remember(memory) -> None:
+        if weekly_plan:
+            memory.record_plan(weekly_plan)
+        if insights:
+            memory.record_insights(insights)
+
+    if weekly_plan or insights:
+        await memory_store.update(profile_id, remember)
+
+
+@traced("load_parent_plan")
+async def _load_parent(profile_id: str) -> Optional[dict]:
+    """Latest stored plan and its constraint snapshot, the base of an incremental re-plan."""
+    async with resources.session() as session:
+        entity = await ProfileService(session).latest_plan(profile_id)
+    if entity is None:
+        return None
+    return {"id": entity.id, "plan": entity.plan, "constraints": entity.constraints}
 
 
-async def _process_generation(request: PlanRequest, correlation_id: str) -> dict:
+def _agent(cls, config: AgentConfig) -> BaseAgent:
+    """The agent itself, or a bus proxy when ``settings.agent_remote`` moves it to its own pool."""
+    if config.name not in settings.agent_remote:
+        return cls(config)
+    # The serving worker retries; the proxy only waits for its reply.
+    return RemoteAgent(config.model_copy(update={"max_retries": 1, "hedge": False}), get_transport(), cls.result_model)
+
+
+@lru_cache(maxsize=1)
+def _orchestrator() -> OrchestratorAgent:
+    """Agents and the compiled graph are built once per worker process."""
     registry = AgentRegistry()
-    registry.register(NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="Generate plan")))
-    registry.register(ClinicalSafetyAgent(AgentConfig(name="clinical_safety", description="Safety check")))
-    registry.register(BehaviorCoachAgent(AgentConfig(name="behavior_coach", description="Adherence tips")))
-    orchestrator = OrchestratorAgent(AgentConfig(name="orchestrator", description="Workflow orchestrator"), registry)
+    hedge = settings.agent_hedging_enabled
+    registry.register(_agent(NutritionPlanAgent, AgentConfig(name="nutrition_plan", description="Generate plan", hedge=hedge)))
+    registry.register(_agent(ClinicalSafetyAgent, AgentConfig(name="clinical_safety", description="Safety check", hedge=hedge)))
+    registry.register(_agent(BehaviorCoachAgent, AgentConfig(name="behavior_coach", description="Adherence tips")))
+    return OrchestratorAgent(AgentConfig(name="orchestrator", description="Workflow orchestrator"), registry)
 
+
+async def _process_generation(request: PlanRequest, correlation_id: str, job_id: str) -> dict:
+    """Run the pipeline and store its results, resuming from an earlier attempt's checkpoints."""
+    checkpoints = PlanCheckpoints(request.profile.id, job_id)
     _publish_event(
         {
             "type": "plan",
@@ -54,18 +110,39 @@ async def _process_generation(request: PlanRequest, correlation_id: str) -> dict
         }
     )
 
-    # Simple orchestration: nutrition_plan -> clinical_safety -> behavior_coach
-    weekly_plan = gemini.generate_weekly_plan(request)
-    clinical_report = gemini.generate_clinical_report(request, weekly_plan) if weekly_plan else None
-    orchestration_input = {
-        "profile": request.profile.model_dump(),
-        "plan": weekly_plan.model_dump() if weekly_plan else {},
-    }
-    await orchestrator.process(orchestration_input)
-    await _persist_results(request.profile.id, weekly_plan, clinical_report)
+    parent = await _load_parent(request.profile.id) if request.replan else None
+    # nutrition_plan -> (clinical_safety | behavior_coach), the last two in parallel
+    state = await _orchestrator().process(
+        {
+            "profile": request.profile.model_dump(),
+            "correlation_id": correlation_id,
+            "parent": parent,
+            "tenant_id": request.tenant_id,
+            "engine": request.engine,
+            "llm_model": request.llm_model,
+        },
+        checkpoints=checkpoints,
+    )
+    outputs = state.get("outputs", {})
+    weekly_plan = outputs.get("plan")
+    clinical_report = outputs.get("clinical")
+    insights = (outputs.get("coach") or {}).get("insights")
+    if PERSISTED_STEP not in await checkpoints.load():
+        await _persist_results(
+            request.profile.id,
+            weekly_plan,
+            clinical_report,
+            request.profile,
+            parent["id"] if parent else None,
+            insights,
+            request.source,
+            correlation_id,
+            job_id,
+        )
+        await checkpoints.save(PERSISTED_STEP, True)
 
     result = PlanTaskResponse(
-        task_id=correlation_id,
+        task_id=job_id,
         correlation_id=correlation_id,
         status="success",
         plan=weekly_plan,
@@ -80,6 +157,7 @@ async def _process_generation(request: PlanRequest, correlation_id: str) -> dict
             "profile_id": request.profile.id,
             "has_plan": bool(weekly_plan),
             "has_report": bool(clinical_report),
+            "timings": state.get("timings", {}),
             "payload": result,
             "timestamp": time.time(),
         }
@@ -88,9 +166,74 @@ async def _process_generation(request: PlanRequest, correlation_id: str) -> dict
     return result
 
 
-@celery_app.task(name="agent.generate_plan")
-def generate_plan_task(payload: dict) -> dict:
-    """Generate weekly plan + clinical report using Gemini and emit events."""
+@celery_app.task(
+    name="agent.generate_plan", bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=settings.plan_task_retries
+)
+def generate_plan_task(self, payload: dict) -> dict:
+    """Generate weekly plan + clinical report using Gemini and emit events.
+
+    Acknowledged only once finished, so a task lost with its worker is redelivered.
+    A failed task is retried while its deadline allows; both resume from the steps
+    checkpointed under the task id, which retries keep, and store results at most once.
+    """
     request = PlanRequest.model_validate(payload)
     correlation_id = request.correlation_id or str(uuid.uuid4())
-    return asyncio.run(_process_generation(request, correlation_id))
+    # Server-minted, unlike the client's correlation id; a direct call gets a fresh one.
+    job_id = self.request.id or str(uuid.uuid4())
+    headers = task_headers(self.request)
+    parent = extract_context(headers)
+    queue_wait = record_queue_wait(headers, parent)
+    retrying = False
+    try:
+        with (
+            structlog.contextvars.bound_contextvars(correlation_id=correlation_id),
+            tracer.start_as_current_span("agent.generate_plan", context=parent) as span,
+        ):
+            span.set_attribute("correlation_id", correlation_id)
+            span.set_attribute("profile_id", request.profile.id)
+            span.set_attribute("lane", request.priority)
+            if queue_wait is not None:
+                span.set_attribute("queue_wait_ms", round(queue_wait * 1000, 1))
+            if request.deadline is not None:
+                span.set_attribute("deadline_left_ms", round((request.deadline - time.time()) * 1000))
+            with (
+                deadline_scope(request.deadline),
+                llm_usage.usage_scope(request.tenant_id, request.profile.id, correlation_id),
+            ):
+                try:
+                    return resources.run(_process_generation(request, correlation_id, job_id))
+                except Exception as exc:
+                    if not _retryable(self, request):
+                        raise
+                    retrying = True
+                    span.add_event("retry", {"attempt": self.request.retries + 1, "error": str(exc)})
+                    # The retry keeps the task id; keep the trace id its logs and spans carry too.
+                    payload = {**payload, "correlation_id": correlation_id}
+                    raise self.retry(args=[payload], exc=exc, countdown=settings.plan_task_retry_delay)
+    finally:
+        # A retry keeps the tenant's admission slot; only the final attempt gives it back.
+        if not retrying:
+            release_slot(resources.sync_redis, request.priority, request.tenant_id, self.request.id)
+        llm_usage.ledger.flush()
+
+
+def _retryable(task, request: PlanRequest) -> bool:
+    if task.request.called_directly or task.request.retries >= task.max_retries:
+        return False
+    return request.deadline is None or request.deadline - time.time() > settings.plan_task_retry_delay
+
+
+async def _precompute_requests() -> list:
+    async with resources.session() as session:
+        return await precompute.schedule(session, resources.sync_redis)
+
+
+@celery_app.task(name="agent.precompute_plans")
+def precompute_plans_task() -> int:
+    """Queue off-peak plans for profiles predicted to ask for one soon (Celery beat)."""
+    requests = resources.run(_precompute_requests())
+    for request in requests:
+        generate_plan_task.apply_async(
+            args=[request.model_dump()], queue=settings.plan_queue_batch, priority=MAX_PRIORITY, headers=inject_headers()
+        )
+    return len(requests)
@@ -0,0 +1,16 @@
+from typing import Dict
+
+from app.core.celery_app import celery_app
+from app.core.resources import resources
+from app.services import analytics
+
+
+async def _export() -> Dict[str, int]:
+    async with resources.session() as session:
+        return await analytics.export(session)
+
+
+@celery_app.task(name="analytics.export")
+def export_analytics_task() -> Dict[str, int]:
+    """Append plans and logs written since the last run to the Parquet export (Celery beat)."""
+    return resources.run(_export())
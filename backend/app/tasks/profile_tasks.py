@@ -0,0 +1,15 @@
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.resources import resources
+from app.services.profile_service import ProfileService
+
+
+async def _recompute() -> int:
+    async with resources.session() as session:
+        return await ProfileService(session).recompute_metrics(settings.metrics_recompute_batch)
+
+
+@celery_app.task(name="profiles.recompute_metrics")
+def recompute_metrics_task() -> int:
+    """Fill derived metrics of profiles that lack them or predate the current formulas (Celery beat)."""
+    return resources.run(_recompute())
@@ -0,0 +1,162 @@
+"""Local stand-in for the Gemini REST API.
+
+Serves ``generateContent`` and ``streamGenerateContent`` with configurable latency,
+error rate and chunked streaming. Point the backend at it with::
+
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 GEMINI_TRANSPORT=rest GEMINI_API_KEY=fake
+
+Run with ``python -m benchmarks.fake_gemini --latency lognormal:median=1.2,sigma=0.4 --error-rate 0.02``.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fixtures import sample_clinical_report, sample_weekly_plan
+
+
+@dataclass
+class LatencyModel:
+    """Seconds to wait before answering; ``kind`` is constant, uniform, normal, lognormal or pareto."""
+
+    kind: str = "constant"
+    params: Dict[str, float] = field(default_factory=lambda: {"value": 0.0})
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        params = {}
+        for item in filter(None, raw.split(",")):
+            key, _, value = item.partition("=")
+            params[key.strip()] = float(value)
+        return cls(kind=kind.strip() or "constant", params=params or {"value": 0.0})
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "uniform":
+            return rng.uniform(p.get("low", 0.0), p.get("high", 1.0))
+        if self.kind == "normal":
+            return max(rng.gauss(p.get("mean", 1.0), p.get("stddev", 0.2)), 0.0)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(max(p.get("median", 1.0), 1e-6)), p.get("sigma", 0.5))
+        if self.kind == "pareto":
+            return p.get("scale", 0.5) * rng.paretovariate(p.get("alpha", 2.5))
+        return p.get("value", 0.0)
+
+
+@dataclass
+class FakeGeminiConfig:
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    error_rate: float = 0.0
+    error_status: int = 503
+    stream_chunks: int = 4
+    chunk_delay: float = 0.05
+    seed: int = 7
+
+
+def _prompt_text(body: dict) -> str:
+    parts: List[str] = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return " ".join(parts)
+
+
+def _answer(prompt: str) -> str:
+    if "clinical report" in prompt.lower():
+        return json.dumps(sample_clinical_report())
+    return json.dumps(sample_weekly_plan())
+
+
+def _envelope(text: str, prompt: str, finish: str | None = "STOP") -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finish:
+        candidate["finishReason"] = finish
+    prompt_tokens = max(len(prompt) // 4, 1)
+    response_tokens = max(len(text) // 4, 1)
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": response_tokens,
+            "totalTokenCount": prompt_tokens + response_tokens,
+        },
+    }
+
+
+def create_app(config: FakeGeminiConfig | None = None) -> FastAPI:
+    cfg = config or FakeGeminiConfig()
+    rng = random.Random(cfg.seed)
+    app = FastAPI(title="Fake Gemini")
+    app.state.calls = 0
+
+    @app.post("/{version}/models/{model_action}")
+    async def generate(version: str, model_action: str, request: Request):
+        app.state.calls += 1
+        body = await request.json()
+        prompt = _prompt_text(body)
+        await asyncio.sleep(cfg.latency.sample(rng))
+        if rng.random() < cfg.error_rate:
+            return JSONResponse(
+                status_code=cfg.error_status,
+                content={"error": {"code": cfg.error_status, "message": "injected failure", "status": "UNAVAILABLE"}},
+            )
+
+        text = _answer(prompt)
+        if not model_action.endswith(":streamGenerateContent"):
+            return JSONResponse(_envelope(text, prompt))
+
+        size = max(len(text) // max(cfg.stream_chunks, 1), 1)
+        pieces = [text[i : i + size] for i in range(0, len(text), size)]
+        sse = request.query_params.get("alt") == "sse"
+
+        async def chunks():
+            if not sse:
+                yield "["
+            for index, piece in enumerate(pieces):
+                last = index == len(pieces) - 1
+                payload = json.dumps(_envelope(piece, prompt, "STOP" if last else None))
+                if sse:
+                    yield f"data: {payload}\r\n\r\n"
+                else:
+                    yield payload + ("]" if last else ",")
+                await asyncio.sleep(cfg.chunk_delay)
+
+        media = "text/event-stream" if sse else "application/json"
+        return StreamingResponse(chunks(), media_type=media)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="constant:value=0", help="e.g. lognormal:median=1.2,sigma=0.4")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--stream-chunks", type=int, default=4)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    config = FakeGeminiConfig(
+        latency=LatencyModel.parse(args.latency),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_chunks=args.stream_chunks,
+        chunk_delay=args.chunk_delay,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Deterministic sample payloads shared by the fake Gemini server and the benchmarks."""
+
+import uuid
+from typing import Any, Dict
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+SLOTS = (("Breakfast", 450, "07:30"), ("Lunch", 650, "12:30"), ("Snack", 250, "16:00"), ("Dinner", 600, "19:30"))
+
+
+def sample_profile(profile_id: str | None = None) -> Dict[str, Any]:
+    return {
+        "id": profile_id or str(uuid.uuid4()),
+        "language": "en",
+        "onboardingMode": "complete",
+        "name": "Bench User",
+        "biometrics": {"age": 34, "gender": "Female", "height": 168, "weight": 72},
+        "clinical": {"medicalConditions": ["Hypertension"], "medications": []},
+        "lifestyle": {"activityLevel": "Moderately Active", "exerciseFrequency": 3, "stressLevel": "moderate"},
+        "routine": {"mealsPerDay": 4, "dietaryPreference": "omnivore", "allergies": ["peanut"], "intolerances": []},
+        "goals": {"primary": "loss", "targetWeight": 66, "secondary": []},
+        "consent": {"dataProcessing": True, "analytics": False, "camera": False, "notifications": True},
+    }
+
+
+def _macros(calories: float) -> Dict[str, float]:
+    return {"protein": round(calories * 0.3 / 4, 1), "carbs": round(calories * 0.45 / 4, 1), "fats": round(calories * 0.25 / 9, 1)}
+
+
+def sample_weekly_plan() -> Dict[str, Any]:
+    days = []
+    for d, day in enumerate(DAYS):
+        meals = [
+            {
+                "id": f"{d}-{s}",
+                "name": f"{slot} {d + 1}",
+                "description": f"Balanced {slot.lower()} with lean protein, whole grains and vegetables",
+                "calories": kcal,
+                "macros": _macros(kcal),
+                "timestamp": at,
+            }
+            for s, (slot, kcal, at) in enumerate(SLOTS)
+        ]
+        total = sum(m["calories"] for m in meals)
+        days.append({"day": day, "meals": meals, "dailyCalories": total, "dailyMacros": _macros(total)})
+    total = sum(kcal for _, kcal, _ in SLOTS)
+    return {
+        "id": str(uuid.uuid4()),
+        "days": days,
+        "averageCalories": total,
+        "averageMacros": _macros(total),
+        "recommendations": ["Drink 2L of water daily", "Prefer whole grains", "Keep sodium under 2g"],
+        "generatedAt": "2024-01-01T00:00:00Z",
+    }
+
+
+def sample_clinical_report() -> Dict[str, Any]:
+    return {
+        "id": str(uuid.uuid4()),
+        "generatedAt": "2024-01-01T00:00:00Z",
+        "overallScore": 82,
+        "weightProjection": -0.4,
+        "dailyDeficit": 420,
+        "micronutrientAnalysis": {"deficiencies": ["vitamin D"], "adequacies": ["iron"], "notes": "Adequate overall"},
+        "behavioralInsights": ["Plan snacks ahead of busy afternoons"],
+        "risks": ["Monitor blood pressure"],
+    }
@@ -0,0 +1,288 @@
+"""In-process micro-benchmarks for hot paths that do not need the network.
+
+    python -m benchmarks.micro --iterations 2000 --out micro.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fixtures import sample_clinical_report, sample_profile, sample_weekly_plan
+from benchmarks.report import Report, Result
+
+
+def _time_sync(fn: Callable[[], Any], iterations: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def _time_async(fn: Callable[[], Any], iterations: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _result(name: str, samples: List[float], **extra: Any) -> Result:
+    return Result.from_samples(name, samples, sum(samples), **extra)
+
+
+def bench_parse_weekly_plan(iterations: int, warmup: int) -> Result:
+    from app.services.gemini import _parse_weekly_plan
+
+    raw = json.dumps(sample_weekly_plan())
+    return _result("parse_weekly_plan", _time_sync(lambda: _parse_weekly_plan(raw), iterations, warmup), bytes=len(raw))
+
+
+def bench_parse_clinical_report(iterations: int, warmup: int) -> Result:
+    from app.services.gemini import _parse_clinical_report
+
+    raw = json.dumps(sample_clinical_report())
+    return _result("parse_clinical_report", _time_sync(lambda: _parse_clinical_report(raw), iterations, warmup))
+
+
+def bench_schema_validation(iterations: int, warmup: int) -> Result:
+    from app.schemas.plan import PlanRequest, WeeklyPlan
+
+    plan = sample_weekly_plan()
+    profile = sample_profile()
+
+    def validate() -> None:
+        WeeklyPlan.model_validate(plan)
+        PlanRequest.model_validate({"profile": profile})
+
+    return _result("schema_validation", _time_sync(validate, iterations, warmup))
+
+
+def bench_orchestrator(iterations: int, warmup: int) -> Result:
+    """Graph overhead only: the registered agents return immediately."""
+    from app.agents.base_agent import AgentConfig, BaseAgent
+    from app.agents.orchestrator import OrchestratorAgent
+    from app.agents.registry import AgentRegistry
+
+    class InstantAgent(BaseAgent[Dict[str, Any]]):
+        async def process(self, input_data: Dict[str, Any]) -> Any:
+            return {"ok": True}
+
+    registry = AgentRegistry()
+    for name in ("nutrition_plan", "clinical_safety", "behavior_coach"):
+        registry.register(InstantAgent(AgentConfig(name=name, description=name)))
+    orchestrator = OrchestratorAgent(AgentConfig(name="orchestrator", description="bench"), registry)
+    state = {"profile": sample_profile()}
+
+    async def run() -> List[float]:
+        return await _time_async(lambda: orchestrator.process(dict(state)), iterations, warmup)
+
+    return _result("orchestrator_graph", asyncio.run(run()))
+
+
+def bench_local_plan(iterations: int, warmup: int) -> Result:
+    from app.schemas.plan import UserProfile
+    from app.services import plan_engine
+
+    profile = UserProfile.model_validate(sample_profile())
+    return _result("local_plan_engine", _time_sync(lambda: plan_engine.generate_weekly_plan(profile), iterations, warmup))
+
+
+def bench_meal_log_parse(iterations: int, warmup: int) -> Result:
+    from app.services.meal_parser import parse_entry
+
+    text = "2 slices of whole grain bread, 150g frango grelhado e uma banana"
+    return _result("meal_log_parse", _time_sync(lambda: parse_entry(text), iterations, warmup))
+
+
+def bench_clinical_rules(iterations: int, warmup: int) -> Result:
+    from app.schemas.plan import UserProfile, WeeklyPlan
+    from app.services import clinical_rules
+
+    profile = UserProfile.model_validate(sample_profile())
+    plan = WeeklyPlan.model_validate(sample_weekly_plan())
+    return _result("clinical_rules", _time_sync(lambda: clinical_rules.assess(profile, plan), iterations, warmup))
+
+
+def bench_incremental_replan(iterations: int, warmup: int) -> Result:
+    """Re-plan after adding one allergy to the profile the parent plan was built for."""
+    from app.schemas.plan import UserProfile
+    from app.services import plan_engine, replan
+
+    profile = UserProfile.model_validate(sample_profile())
+    parent = plan_engine.generate_weekly_plan(profile)
+    constraints = replan.plan_constraints(profile)
+    edited = sample_profile()
+    edited["routine"]["allergies"].append("fish")
+    edited = UserProfile.model_validate(edited)
+    return _result("incremental_replan", _time_sync(lambda: replan.replan(parent, constraints, edited), iterations, warmup))
+
+
+def bench_prompt_size(iterations: int, warmup: int) -> Result:
+    """Build time of the compact prompts, with their size next to the former ``model_dump_json`` prompts."""
+    from app.schemas.plan import UserProfile, WeeklyPlan
+    from app.services import prompts
+
+    profile = UserProfile.model_validate(sample_profile())
+    plan = WeeklyPlan.model_validate(sample_weekly_plan())
+    before = {
+        "skeleton_plan": f"Profile: {profile.model_dump_json()} Draft: {plan.model_dump_json()}",
+        "clinical_report": f"Profile: {profile.model_dump_json()} Plan: {plan.model_dump_json()}",
+    }
+
+    def build() -> Dict[str, str]:
+        return {
+            "skeleton_plan": prompts.build(
+                "weekly_plan",
+                "",
+                [
+                    prompts.Section("Profile", prompts.profile_context(profile)),
+                    prompts.Section("Draft", prompts.meal_rows(plan)),
+                    prompts.Section("Draft descriptions", prompts.meal_descriptions(plan), required=False),
+                ],
+                budget=0,
+            ),
+            "clinical_report": prompts.build(
+                "clinical_report",
+                "",
+                [
+                    prompts.Section("Profile", prompts.profile_context(profile, prompts.CLINICAL_PROFILE)),
+                    prompts.Section("Daily totals", prompts.day_totals(plan)),
+                    prompts.Section("Meals", prompts.meal_rows(plan), required=False),
+                ],
+                budget=0,
+            ),
+        }
+
+    after = build()
+    sizes = {
+        name: {"tokens_before": prompts.estimate_tokens(before[name]), "tokens_after": prompts.estimate_tokens(after[name])}
+        for name in before
+    }
+    return _result("prompt_size", _time_sync(build, iterations, warmup), prompt_tokens=sizes)
+
+
+def _jittery_agent(hedge: bool):
+    import random
+
+    from app.agents.base_agent import AgentConfig, BaseAgent
+
+    class JitteryAgent(BaseAgent[dict]):
+        """2 ms calls with a 5% chance of a 100 ms stall."""
+
+        rng = random.Random(7)
+
+        async def process(self, input_data: dict) -> Any:
+            await asyncio.sleep(0.1 if self.rng.random() < 0.05 else 0.002)
+            return True
+
+    config = AgentConfig(name="jittery", description="bench", hedge=hedge, hedge_min_delay=0.004, hedge_min_samples=20)
+    return JitteryAgent(config)
+
+
+def bench_agent_hedging(iterations: int, warmup: int) -> Result:
+    """Tail latency of an agent with upstream stalls, with and without hedging (p99 without in extra)."""
+    iterations = min(iterations, 300)
+
+    async def run(agent) -> List[float]:
+        return await _time_async(lambda: agent.run({}), iterations, max(warmup, 20))
+
+    baseline = Result.from_samples("unhedged", asyncio.run(run(_jittery_agent(False))), 1.0)
+    samples = asyncio.run(run(_jittery_agent(True)))
+    return _result("agent_hedging", samples, unhedged_latency_ms=baseline.latency_ms)
+
+
+def _logger_samples(processors: list, sink: Any, iterations: int, warmup: int, correlation_id: Optional[str]) -> List[float]:
+    import logging
+
+    import structlog
+
+    logger = structlog.wrap_logger(sink, processors=processors, wrapper_class=structlog.make_filtering_bound_logger(logging.INFO))
+    event = lambda: logger.info("agent_run_start", agent="nutrition_plan", attempt=1, timeout=30.0)  # noqa: E731
+    with structlog.contextvars.bound_contextvars(correlation_id=correlation_id):
+        return _time_sync(event, iterations, warmup)
+
+
+def bench_structured_logging(iterations: int, warmup: int) -> Result:
+    """Caller-side cost of one agent log event, against the previous set-up (in extra).
+
+    Before: stdlib json rendered and printed on the caller's thread. After: orjson and
+    the queued writer; ``sampled_latency_ms`` adds the default 10% sampling of this
+    event. Output goes to /dev/null, which understates the old synchronous write.
+    """
+    import structlog
+
+    from app.core.logging import QueuedLogger, QueuedWriter, build_processors
+    from app.core.tracing import add_trace_context
+
+    before = [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        add_trace_context,
+        structlog.processors.TimeStamper(fmt="iso"),
+        structlog.processors.JSONRenderer(),
+    ]
+    with open(os.devnull, "w") as text_sink, open(os.devnull, "wb") as byte_sink:
+        baseline = _logger_samples(before, structlog.PrintLogger(text_sink), iterations, warmup, "bench-1")
+        writer = QueuedWriter(byte_sink, maxsize=2 * (iterations + warmup))
+        samples = _logger_samples(build_processors(), QueuedLogger(writer), iterations, warmup, "bench-1")
+        sampled = _logger_samples(
+            build_processors({"agent_run_start": 0.1}), QueuedLogger(writer), iterations, warmup, None
+        )
+        writer.close()
+    return _result(
+        "structured_logging",
+        samples,
+        print_json_latency_ms=Result.from_samples("print_json", baseline, 1.0).latency_ms,
+        sampled_latency_ms=Result.from_samples("sampled", sampled, 1.0).latency_ms,
+    )
+
+
+BENCHMARKS: Dict[str, Callable[[int, int], Result]] = {
+    "parse_weekly_plan": bench_parse_weekly_plan,
+    "parse_clinical_report": bench_parse_clinical_report,
+    "schema_validation": bench_schema_validation,
+    "orchestrator_graph": bench_orchestrator,
+    "local_plan_engine": bench_local_plan,
+    "meal_log_parse": bench_meal_log_parse,
+    "clinical_rules": bench_clinical_rules,
+    "incremental_replan": bench_incremental_replan,
+    "prompt_size": bench_prompt_size,
+    "agent_hedging": bench_agent_hedging,
+    "structured_logging": bench_structured_logging,
+}
+
+
+def run(names: List[str], iterations: int, warmup: int) -> Report:
+    report = Report("micro", meta={"iterations": iterations, "warmup": warmup})
+    for name in names:
+        try:
+            result = BENCHMARKS[name](iterations, warmup)
+        except Exception as exc:  # keep the remaining benchmarks comparable
+            result = Result(name, 0, 1, 0.0, 0.0, {"p50": 0, "p95": 0, "p99": 0, "mean": 0, "max": 0}, extra={"error": repr(exc)})
+        report.add(result)
+        print(f"{name}: p50={result.latency_ms['p50']}ms p99={result.latency_ms['p99']}ms")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bench", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    run(args.bench, args.iterations, args.warmup).write(args.out)
+
+
+if __name__ == "__main__":
+    main()
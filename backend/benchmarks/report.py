@@ -0,0 +1,140 @@
+"""Machine-readable benchmark reports and run-to-run comparison.
+
+Compare two runs with ``python -m benchmarks.report baseline.json current.json --tolerance 10``;
+the exit code is 1 when any shared result regressed beyond the tolerance.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Linear-interpolated percentile; ``pct`` in [0, 100]."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@dataclass
+class Result:
+    name: str
+    requests: int
+    errors: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: Dict[str, float]
+    concurrency: int = 1
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_samples(
+        cls,
+        name: str,
+        latencies_s: Sequence[float],
+        duration_s: float,
+        errors: int = 0,
+        concurrency: int = 1,
+        **extra: Any,
+    ) -> "Result":
+        ms = [s * 1000 for s in latencies_s]
+        total = len(latencies_s) + errors
+        return cls(
+            name=name,
+            requests=total,
+            errors=errors,
+            duration_s=round(duration_s, 4),
+            throughput_rps=round(len(latencies_s) / duration_s, 2) if duration_s > 0 else 0.0,
+            latency_ms={
+                "p50": round(percentile(ms, 50), 3),
+                "p95": round(percentile(ms, 95), 3),
+                "p99": round(percentile(ms, 99), 3),
+                "mean": round(sum(ms) / len(ms), 3) if ms else 0.0,
+                "max": round(max(ms), 3) if ms else 0.0,
+            },
+            concurrency=concurrency,
+            extra=extra,
+        )
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+@dataclass
+class Report:
+    suite: str
+    results: List[Result] = field(default_factory=list)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.meta.setdefault("started_at", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+        self.meta.setdefault("git_rev", _git_rev())
+        self.meta.setdefault("python", platform.python_version())
+        self.meta.setdefault("platform", platform.platform())
+
+    def add(self, result: Result) -> Result:
+        self.results.append(result)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"suite": self.suite, "meta": self.meta, "results": [asdict(r) for r in self.results]}
+
+    def write(self, path: Optional[str]) -> None:
+        text = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+        else:
+            print(text)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance_pct: float = 10.0) -> List[str]:
+    """List regressions: p95 latency up, or throughput down, by more than the tolerance."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current.get("results", []):
+        before = base.get(result["name"])
+        if not before:
+            continue
+        p95_before, p95_now = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if p95_before and (p95_now - p95_before) / p95_before * 100 > tolerance_pct:
+            regressions.append(f"{result['name']}: p95 {p95_before:.2f}ms -> {p95_now:.2f}ms")
+        rps_before, rps_now = before["throughput_rps"], result["throughput_rps"]
+        if rps_before and (rps_before - rps_now) / rps_before * 100 > tolerance_pct:
+            regressions.append(f"{result['name']}: throughput {rps_before:.2f} -> {rps_now:.2f} rps")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    with open(args.current, encoding="utf-8") as fh:
+        current = json.load(fh)
+    regressions = compare(baseline, current, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("no regressions")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
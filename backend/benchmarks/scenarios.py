@@ -0,0 +1,162 @@
+"""Load scenarios against a running backend.
+
+Start the stack against the fake Gemini server, then e.g.::
+
+    python -m benchmarks.scenarios --base-url http://localhost:8000 --scenario plan profiles ws \\
+        --concurrency 1 8 32 --requests 200 --out run.json
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, List
+
+import httpx
+import orjson
+
+from benchmarks.fixtures import sample_profile
+from benchmarks.report import Report, Result
+
+Operation = Callable[[httpx.AsyncClient], Awaitable[None]]
+
+
+async def run_load(
+    name: str, client: httpx.AsyncClient, operation: Operation, concurrency: int, total: int, **extra
+) -> Result:
+    """Run ``total`` operations with at most ``concurrency`` in flight and collect latencies."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+    lock = asyncio.Lock()
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while True:
+            async with lock:
+                if remaining <= 0:
+                    return
+                remaining -= 1
+            started = time.perf_counter()
+            try:
+                await operation(client)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return Result.from_samples(
+        f"{name}@c{concurrency}", latencies, time.perf_counter() - started, errors, concurrency, **extra
+    )
+
+
+def plan_operation(poll_interval: float, timeout: float) -> Operation:
+    """Enqueue a plan and poll until the worker finishes it (end-to-end latency)."""
+
+    async def op(client: httpx.AsyncClient) -> None:
+        resp = await client.post("/api/agents/plan", json={"profile": sample_profile()})
+        resp.raise_for_status()
+        task_id = resp.json()["task_id"]
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            status = (await client.get(f"/api/agents/plan/{task_id}")).json()["status"]
+            if status == "success":
+                return
+            if status in ("failure", "revoked"):
+                raise RuntimeError(f"task {task_id} {status}")
+            await asyncio.sleep(poll_interval)
+        raise TimeoutError(task_id)
+
+    return op
+
+
+async def profiles_operation(client: httpx.AsyncClient) -> None:
+    """One CRUD cycle: create, read, update, list, delete."""
+    profile = sample_profile(str(uuid.uuid4()))
+    (await client.post("/api/profiles", json={"profile": profile})).raise_for_status()
+    (await client.get(f"/api/profiles/{profile['id']}")).raise_for_status()
+    profile["name"] = "Bench User Updated"
+    (await client.put(f"/api/profiles/{profile['id']}", json={"profile": profile})).raise_for_status()
+    (await client.get("/api/profiles")).raise_for_status()
+    (await client.delete(f"/api/profiles/{profile['id']}")).raise_for_status()
+
+
+async def ws_scenario(base_url: str, sockets: int, duration: float) -> Result:
+    """Hold ``sockets`` subscribers on /ws/agents and measure publish-to-receive lag of plan events."""
+    import websockets
+
+    url = base_url.replace("http", "ws", 1).rstrip("/") + "/ws/agents"
+    lags: List[float] = []
+    errors = 0
+
+    async def subscriber() -> None:
+        nonlocal errors
+        try:
+            async with websockets.connect(url) as ws:
+                end = time.time() + duration
+                while time.time() < end:
+                    try:
+                        raw = await asyncio.wait_for(ws.recv(), timeout=max(end - time.time(), 0.01))
+                    except asyncio.TimeoutError:
+                        break
+                    event = orjson.loads(raw)
+                    if isinstance(event.get("timestamp"), (int, float)):
+                        lags.append(max(time.time() - event["timestamp"], 0.0))
+        except Exception:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(subscriber() for _ in range(sockets)))
+    return Result.from_samples(f"ws@s{sockets}", lags, time.perf_counter() - started, errors, sockets, events=len(lags))
+
+
+async def run(args: argparse.Namespace) -> Report:
+    report = Report("scenarios", meta={"base_url": args.base_url, "requests": args.requests})
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for concurrency in args.concurrency:
+            for scenario in args.scenario:
+                if scenario == "plan":
+                    op = plan_operation(args.poll_interval, args.timeout)
+                    result = await run_load("plan", client, op, concurrency, args.requests)
+                elif scenario == "profiles":
+                    result = await run_load("profiles", client, profiles_operation, concurrency, args.requests)
+                else:
+                    result = await _ws_with_load(args, client, concurrency)
+                report.add(result)
+                print(f"{result.name}: {result.throughput_rps} rps p95={result.latency_ms['p95']}ms errors={result.errors}")
+    return report
+
+
+async def _ws_with_load(args: argparse.Namespace, client: httpx.AsyncClient, sockets: int) -> Result:
+    """Drive plan traffic in the background so the sockets have events to receive."""
+    driver = asyncio.create_task(
+        run_load("ws-driver", client, plan_operation(args.poll_interval, args.timeout), 2, max(args.requests // 10, 1))
+    )
+    result = await ws_scenario(args.base_url, sockets, args.ws_duration)
+    driver.cancel()
+    return result
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", nargs="+", choices=("plan", "profiles", "ws"), default=["profiles"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--ws-duration", type=float, default=15.0)
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(run(args))
+    report.write(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Cold-start cost of importing the API: wall time, peak RSS and heavy modules loaded.
+
+Each sample imports the target in a fresh interpreter, as a new replica would::
+
+    python -m benchmarks.startup --runs 10 --out startup.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from benchmarks.report import Report, Result
+
+# Subsystems the API should only load on first use, if at all.
+HEAVY_MODULES = ("celery", "langgraph", "langchain_core", "google.generativeai", "app.agents.base_agent", "app.tasks.agent_tasks", "pyarrow")
+
+_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "heavy": heavy}}))
+"""
+
+
+def probe(module: str = "app.main") -> Dict[str, Any]:
+    """Import ``module`` in a fresh interpreter and report what it cost."""
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(module: str, runs: int) -> Report:
+    report = Report("startup", meta={"module": module})
+    samples: List[Dict[str, Any]] = [probe(module) for _ in range(runs)]
+    report.add(
+        Result.from_samples(
+            f"import_{module}",
+            [s["seconds"] for s in samples],
+            sum(s["seconds"] for s in samples),
+            rss_mb=round(max(s["rss_mb"] for s in samples), 1),
+            heavy_modules=samples[-1]["heavy"],
+        )
+    )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    run(args.module, args.runs).write(args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.behavior_coach_agent import BehaviorCoachAgent
+from app.agents.nutrition_plan_agent import NutritionPlanAgent
+from app.core.config import settings
+from app.schemas.plan import UserProfile
+from app.services import agent_memory, gemini, plan_engine
+from app.services.agent_memory import ProfileMemory
+from benchmarks.fixtures import sample_profile
+
+
+@pytest.fixture(scope="module")
+def plan():
+    return plan_engine.generate_weekly_plan(UserProfile.model_validate(sample_profile("u1")))
+
+
+def test_memory_stays_bounded_as_events_arrive(plan):
+    memory = ProfileMemory()
+    for n in range(6):
+        memory.record_plan(plan.model_copy(update={"id": f"p{n}"}))
+    start = date(2026, 1, 1)
+    for n in range(30):
+        memory.record_meal(plan.averageCalories / 2, start + timedelta(days=n))
+        memory.record_meal(plan.averageCalories / 2, start + timedelta(days=n))
+    memory.record_insights([f"tip {n}" for n in range(8)])
+    memory.record_insights(["tip 0"])
+
+    assert [p["id"] for p in memory.plans] == ["p5", "p4", "p3"]
+    assert len(memory.days) == agent_memory.MAX_DAYS and min(memory.days) == "2026-01-17"
+    assert memory.insights == ["tip 0", "tip 1", "tip 2", "tip 3", "tip 4"]
+    assert memory.adherence == {"logged_days": 14, "window": 14, "intake_ratio": 1.0}
+    assert ProfileMemory.from_dict(memory.to_dict()) == memory
+
+
+def test_context_summarises_memory(plan):
+    assert ProfileMemory().context() == ""
+    memory = ProfileMemory()
+    memory.record_plan(plan)
+    memory.record_meal(plan.averageCalories * 0.7, date(2026, 1, 1))
+    memory.record_insights(["Log dinner"])
+
+    context = memory.context()
+    assert f"{round(plan.averageCalories)} kcal" in context
+    assert "meal logs: 1 of last 14 days, intake 70% of plan calories" in context
+    assert "coach notes: Log dinner" in context
+
+
+def test_entry_calories_prefers_logged_value():
+    assert agent_memory.entry_calories({"calories": 420}) == 420.0
+    assert agent_memory.entry_calories({"text": "2 eggs"}) > 0
+    assert agent_memory.entry_calories({"note": "skipped"}) is None
+
+
+def test_updated_at_only_moves_forward(monkeypatch):
+    memory = ProfileMemory(updated_at=2000.0)
+    monkeypatch.setattr(agent_memory.time, "time", lambda: 1000.0)  # a worker with a lagging clock
+    memory.record_insights(["drink water"])
+    assert memory.updated_at > 2000.0
+
+
+def test_entry_calories_survives_parser_errors(monkeypatch):
+    def broken(text):
+        raise ZeroDivisionError("division by zero")
+
+    monkeypatch.setattr(agent_memory.meal_parser, "parse_entry", broken)
+    assert agent_memory.entry_calories({"text": "1/0 banana"}) is None
+
+
+@pytest.mark.asyncio
+async def test_agents_read_memory_only_when_enabled(monkeypatch, plan):
+    memory = ProfileMemory()
+    memory.record_plan(plan)
+    memory.record_meal(plan.averageCalories * 0.5, date(2026, 1, 1))
+    reads = []
+
+    async def get(profile_id):
+        reads.append(profile_id)
+        return memory
+
+    histories = []
+
+    def generate(req, skeleton=None, history="", model=None):
+        histories.append(history)
+        return plan
+
+    monkeypatch.setattr(agent_memory.memory_store, "get", get)
+    monkeypatch.setattr(gemini, "generate_weekly_plan", generate)
+    monkeypatch.setattr(settings, "plan_engine_mode", "llm")
+    monkeypatch.setattr(settings, "plan_reuse_enabled", False)
+
+    await NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="plan")).process({"profile": sample_profile("u1")})
+    coach = await BehaviorCoachAgent(AgentConfig(name="behavior_coach", description="tips")).process(
+        {"profile": sample_profile("u1")}
+    )
+    assert reads == ["u1", "u1"]
+    assert "previous plans:" in histories[0]
+    assert coach["insights"][:2] == ["Logged 1 of the last 14 days; log every day", "Intake averages 50% of the plan; avoid skipping meals"]
+
+    disabled = AgentConfig(name="nutrition_plan", description="plan", enable_memory=False)
+    await NutritionPlanAgent(disabled).process({"profile": sample_profile("u1")})
+    assert histories[1] == "" and reads == ["u1", "u1"]
@@ -0,0 +1,131 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.services import analytics
+from benchmarks.fixtures import sample_weekly_plan
+
+
+def _export(root):
+    """Two profiles, each with a plan on 1 and 2 October; only the first has diabetes."""
+    rows = {"plans": [], "days": [], "meals": []}
+    for n, (profile_id, day) in enumerate([("p1", 1), ("p1", 2), ("p2", 1), ("p2", 2)]):
+        plan = sample_weekly_plan()
+        if profile_id == "p2":
+            for meal in (m for d in plan["days"] for m in d["meals"]):
+                meal["calories"] *= 2
+        entity = SimpleNamespace(
+            id=f"plan-{n}", profile_id=profile_id, created_at=datetime(2026, 10, day, 9), source="request", plan=plan
+        )
+        for table, table_rows in analytics.flatten_plan(entity).items():
+            rows[table] += table_rows
+    for table, table_rows in rows.items():
+        analytics.write_partitions(root, table, table_rows, "created_at", analytics._part_name(table, None))
+    profiles = [
+        {"profile_id": "p1", "language": "en", "goal": "loss", "activity_level": "Sedentary",
+         "conditions": ["Type 2 Diabetes", "Hypertension"], "medications": ["Metformin"]},
+        {"profile_id": "p2", "language": "pt", "goal": "gain", "activity_level": "Very Active",
+         "conditions": ["Hypertension"], "medications": []},
+    ]
+    (root / analytics.PROFILES).mkdir()
+    pq.write_table(pa.Table.from_pylist(profiles, schema=analytics.SCHEMAS[analytics.PROFILES]),
+                   root / analytics.PROFILES / "profiles.parquet")
+
+
+def test_partitions_are_written_per_date_with_deterministic_names(tmp_path):
+    _export(tmp_path)
+    parts = sorted(p.relative_to(tmp_path).as_posix() for p in (tmp_path / "meals").rglob("*.parquet"))
+    name = analytics._part_name("meals", None)
+    assert parts == [f"meals/date=2026-10-01/part-{name}.parquet", f"meals/date=2026-10-02/part-{name}.parquet"]
+    assert analytics._part_name("meals", ["2026-10-02T09:00:00", "plan-3"]) != name
+
+
+def test_cohort_stats_filter_profiles_and_prune_dates(tmp_path):
+    _export(tmp_path)
+    week = dict(grain="meals", metric="calories", start=date(2026, 10, 1), end=date(2026, 10, 7))
+
+    everyone = analytics.cohort_stats(analytics.CohortQuery(**week), tmp_path)
+    assert (everyone.profiles, everyone.rows) == (2, 4 * 28)
+
+    diabetic = analytics.cohort_stats(
+        analytics.CohortQuery(**week, conditions=("type 2 diabetes", "hypertension"), medications=("metformin",)), tmp_path
+    )
+    assert (diabetic.profiles, diabetic.rows) == (1, 2 * 28)
+    assert diabetic.maximum == 650 and everyone.maximum == 1300
+    assert [d["date"] for d in diabetic.daily] == ["2026-10-01", "2026-10-02"]
+
+    second_day = analytics.cohort_stats(
+        analytics.CohortQuery(grain="days", metric="calories", start=date(2026, 10, 2), end=date(2026, 10, 2), goal="gain"),
+        tmp_path,
+    )
+    assert (second_day.profiles, second_day.rows, second_day.mean) == (1, 7, 1950)
+    assert analytics.cohort_stats(analytics.CohortQuery(**{**week, "grain": "logs"}), tmp_path).rows == 0
+
+
+def test_cohort_stats_reject_unknown_grain_and_metric(tmp_path):
+    with pytest.raises(analytics.UnknownMetric):
+        analytics.cohort_stats(analytics.CohortQuery("weeks", "calories", date(2026, 10, 1), date(2026, 10, 2)), tmp_path)
+    with pytest.raises(analytics.UnknownMetric):
+        analytics.cohort_stats(analytics.CohortQuery("meals", "name", date(2026, 10, 1), date(2026, 10, 2)), tmp_path)
+
+
+class _Pages:
+    """Session returning queued result pages; an empty page ends the scan."""
+
+    def __init__(self, *pages):
+        self.pages = list(pages)
+
+    async def execute(self, statement):
+        rows = self.pages.pop(0) if self.pages else []
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+    def expunge_all(self):
+        pass
+
+
+def _log(log_id, hour, minute=0):
+    return SimpleNamespace(id=log_id, profile_id="p1", logged_at=datetime(2026, 10, 2, hour, minute), entry={"calories": 300})
+
+
+@pytest.mark.asyncio
+async def test_log_export_picks_up_rows_committed_behind_the_watermark(tmp_path):
+    early, late, newest = _log("log-1", 9), _log("log-2", 9, 5), _log("log-3", 9, 10)
+    state = {}
+    assert await analytics._export_logs(_Pages([early, newest]), tmp_path, state) == 2
+
+    # log-2 was stamped before log-3 but committed after the first run read past it.
+    assert await analytics._export_logs(_Pages([early, late, newest]), tmp_path, state) == 1
+    assert await analytics._export_logs(_Pages([early, late, newest]), tmp_path, state) == 0
+
+    exported = pq.read_table(tmp_path / "logs").column("log_id").to_pylist()
+    assert sorted(exported) == ["log-1", "log-2", "log-3"]
+    assert state["logs"]["at"] == "2026-10-02T09:10:00"
+    assert analytics.load_state(tmp_path) == state
+
+
+def test_watermark_forgets_ids_older_than_the_overlap(monkeypatch):
+    monkeypatch.setattr(analytics.settings, "analytics_export_overlap", 600.0)
+    mark = analytics.Watermark.load(["2026-10-02T08:00:00", "log-0"])
+    mark.advance([("log-1", datetime(2026, 10, 2, 9)), ("log-2", datetime(2026, 10, 2, 9, 5))])
+    assert mark.start() == datetime(2026, 10, 2, 8, 55)
+    assert mark.seen == {"log-1": "2026-10-02T09:00:00", "log-2": "2026-10-02T09:05:00"}
+
+
+@pytest.mark.asyncio
+async def test_unreadable_log_is_exported_with_null_nutrients(tmp_path, monkeypatch):
+    def broken(text):
+        raise ZeroDivisionError("division by zero")
+
+    monkeypatch.setattr(analytics.meal_parser, "parse_entry", broken)
+    bad = SimpleNamespace(id="log-1", profile_id="p1", logged_at=datetime(2026, 10, 2, 9), entry={"text": "1/0 banana"})
+    odd = SimpleNamespace(id="log-2", profile_id="p1", logged_at=datetime(2026, 10, 2, 10), entry={"calories": "lots"})
+    state = {}
+    assert await analytics._export_logs(_Pages([bad, odd, _log("log-3", 11)]), tmp_path, state) == 3
+    assert state["logs"]["at"] == "2026-10-02T11:00:00"
+
+    assert pq.read_table(tmp_path / "logs").column("calories").to_pylist() == [None, None, 300.0]
+    stats = analytics.cohort_stats(analytics.CohortQuery("logs", "calories", date(2026, 10, 2), date(2026, 10, 2)), tmp_path)
+    assert (stats.rows, stats.mean) == (1, 300.0)
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents.base_agent import AgentConfig, AgentTimeoutError, BaseAgent
+from app.core import deadline
+from app.core.deadline import deadline_scope
+
+
+class StallingAgent(BaseAgent[dict]):
+    """Stalls on the calls listed in ``stalls`` (by call number), answers at once otherwise."""
+
+    def __init__(self, config: AgentConfig, stalls=(), delay: float = 0.0):
+        super().__init__(config)
+        self.stalls = set(stalls)
+        self.delay = delay
+        self.calls = 0
+
+    async def process(self, input_data: dict):
+        self.calls += 1
+        call = self.calls
+        await asyncio.sleep(5 if call in self.stalls else self.delay)
+        return call
+
+
+@pytest.mark.asyncio
+async def test_deadline_caps_attempt_timeout():
+    agent = StallingAgent(AgentConfig(name="slow", description="slow", timeout=30), stalls={1, 2, 3})
+    started = time.perf_counter()
+    with deadline_scope(time.time() + 0.2), pytest.raises(AgentTimeoutError):
+        await agent.run({})
+    assert time.perf_counter() - started < 1.0
+    assert agent.attempts == 1  # no time left for a backoff and second attempt
+
+
+@pytest.mark.asyncio
+async def test_retries_continue_while_deadline_allows():
+    config = AgentConfig(name="flaky", description="flaky", timeout=0.05, backoff_base=0.01)
+    agent = StallingAgent(config, stalls={1})
+    with deadline_scope(time.time() + 2):
+        assert await agent.run({}) == 2
+    assert agent.attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_hedge_takes_first_success_past_p95():
+    config = AgentConfig(name="hedged", description="hedged", hedge=True, hedge_min_delay=0.02, hedge_min_samples=5)
+    agent = StallingAgent(config, stalls={6}, delay=0.001)
+    for _ in range(5):
+        await agent.run({})
+
+    started = time.perf_counter()
+    assert await agent.run({}) == 7  # the hedge, not the stalled sixth call
+    assert time.perf_counter() - started < 1.0
+    assert agent.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_hedges_stay_within_budget_and_attempts_carry_their_deadline():
+    config = AgentConfig(name="budgeted", description="budgeted", hedge=True, hedge_min_delay=0.02, hedge_min_samples=5)
+    config = config.model_copy(update={"hedge_budget": 0.1, "timeout": 1.0, "max_retries": 1})
+    agent = StallingAgent(config, stalls={6, 8}, delay=0.001)
+    for _ in range(5):
+        await agent.run({})
+    assert await agent.run({}) == 7  # first hedge is within budget
+
+    with pytest.raises(AgentTimeoutError):
+        await agent.run({})  # a second hedge would exceed 10% of recent attempts
+    assert agent.calls == 8
+
+    class DeadlineAgent(BaseAgent[dict]):
+        async def process(self, input_data: dict):
+            return deadline.remaining()
+
+    assert await DeadlineAgent(AgentConfig(name="d", description="d", timeout=0.5)).run({}) <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_agents_can_opt_out_of_hedging():
+    class Expensive(StallingAgent):
+        hedgeable = False
+
+    agent = Expensive(AgentConfig(name="expensive", description="e", hedge=True, hedge_min_samples=1), delay=0.001)
+    await agent.run({})
+    assert agent.hedge_delay() is None
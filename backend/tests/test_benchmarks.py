@@ -0,0 +1,48 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.services.gemini import _parse_weekly_plan
+from benchmarks.fake_gemini import FakeGeminiConfig, LatencyModel, create_app
+from benchmarks.report import Report, Result, compare, percentile
+
+
+def test_percentile_interpolates():
+    samples = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(samples, 50) == 5.5
+    assert percentile(samples, 100) == 10
+
+
+def test_compare_flags_p95_and_throughput_regressions():
+    base = Report("micro")
+    base.add(Result.from_samples("parse", [0.001] * 100, duration_s=0.1))
+    slower = Report("micro")
+    slower.add(Result.from_samples("parse", [0.002] * 100, duration_s=0.2))
+    regressions = compare(base.to_dict(), slower.to_dict(), tolerance_pct=10)
+    assert len(regressions) == 2
+    assert compare(base.to_dict(), base.to_dict()) == []
+
+
+def test_fake_gemini_serves_parseable_plans_and_injected_errors():
+    client = TestClient(create_app(FakeGeminiConfig(latency=LatencyModel.parse("constant:value=0"))))
+    body = {"contents": [{"role": "user", "parts": [{"text": "Return ONLY valid JSON for a 7-day meal plan"}]}]}
+    resp = client.post("/v1beta/models/gemini-2.0-flash-exp:generateContent", json=body)
+    assert resp.status_code == 200
+    data = resp.json()
+    plan = _parse_weekly_plan(data["candidates"][0]["content"]["parts"][0]["text"])
+    assert len(plan.days) == 7
+    assert data["usageMetadata"]["promptTokenCount"] > 0
+
+    failing = TestClient(create_app(FakeGeminiConfig(error_rate=1.0)))
+    assert failing.post("/v1beta/models/m:generateContent", json=body).status_code == 503
+
+    stream = client.post("/v1beta/models/m:streamGenerateContent", json=body)
+    chunks = json.loads(stream.text)
+    text = "".join(c["candidates"][0]["content"]["parts"][0]["text"] for c in chunks)
+    assert len(_parse_weekly_plan(text).days) == 7
+
+
+def test_api_import_leaves_agent_stack_unloaded():
+    from benchmarks.startup import probe
+
+    assert probe("app.main")["heavy"] == []
@@ -0,0 +1,122 @@
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.orchestrator import OrchestratorAgent
+from app.agents.registry import AgentRegistry
+from app.schemas.plan import WeeklyPlan
+from app.services.checkpoints import PlanCheckpoints
+from app.tasks import agent_tasks
+from benchmarks.fixtures import sample_profile, sample_weekly_plan
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    async def hgetall(self, key):
+        return {k.encode(): v for k, v in self.hashes.get(key, {}).items()}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_exc):
+        return False
+
+    def hset(self, key, field, value):
+        self.ops.append((key, field, value))
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        for key, field, value in self.ops:
+            self.redis.hashes.setdefault(key, {})[field] = value
+
+
+class CountingAgent:
+    result_model = None
+
+    def __init__(self, name, output, failures=0):
+        self.config = AgentConfig(name=name, description=name)
+        self.output = output
+        self.failures = failures
+        self.calls = 0
+
+    async def run(self, _input):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError(f"{self.config.name} failed")
+        return self.output
+
+
+@pytest.mark.asyncio
+async def test_retry_resumes_after_the_last_completed_step():
+    plan = CountingAgent("nutrition_plan", WeeklyPlan.model_validate(sample_weekly_plan()))
+    plan.result_model = WeeklyPlan
+    clinical = CountingAgent("clinical_safety", {"overallScore": 80}, failures=1)
+    coach = CountingAgent("behavior_coach", {"insights": ["eat breakfast"]})
+    registry = AgentRegistry()
+    for agent in (plan, clinical, coach):
+        registry.register(agent)
+    orchestrator = OrchestratorAgent(AgentConfig(name="orch", description="Orchestrator"), registry)
+    checkpoints = PlanCheckpoints("u1", "job-1", FakeRedis())
+
+    with pytest.raises(RuntimeError, match="clinical_safety failed"):
+        await orchestrator.process({"profile": {"id": "u1"}}, checkpoints=checkpoints)
+    assert "plan" in await checkpoints.load()  # coach may or may not finish before the failure cancels it
+
+    result = await orchestrator.process({"profile": {"id": "u1"}}, checkpoints=checkpoints)
+    assert (plan.calls, clinical.calls) == (1, 2)
+    assert isinstance(result["outputs"]["plan"], WeeklyPlan)  # rebuilt from the checkpoint
+    assert result["timings"]["steps"]["plan"] == 0.0
+    assert set(await checkpoints.load()) == {"plan", "clinical", "coach"}
+
+
+@pytest.mark.asyncio
+async def test_results_are_persisted_once_per_task(monkeypatch):
+    redis = FakeRedis()
+    persisted = []
+    events = []
+
+    class Orchestrator:
+        async def process(self, input_data, checkpoints=None):
+            return {"outputs": {"plan": WeeklyPlan.model_validate(sample_weekly_plan())}}
+
+    async def persist(*args):
+        persisted.append(args[-1])
+        if len(persisted) == 1:
+            raise ConnectionError("database went away")
+
+    monkeypatch.setattr(agent_tasks, "PlanCheckpoints", lambda profile_id, job_id: PlanCheckpoints(profile_id, job_id, redis))
+    monkeypatch.setattr(agent_tasks, "_orchestrator", Orchestrator)
+    monkeypatch.setattr(agent_tasks, "_persist_results", persist)
+    monkeypatch.setattr(agent_tasks, "_publish_event", events.append)
+    request = agent_tasks.PlanRequest.model_validate({"profile": sample_profile("u1"), "correlation_id": "c1"})
+
+    with pytest.raises(ConnectionError):
+        await agent_tasks._process_generation(request, "c1", "job-1")
+    for _ in range(2):  # the retry stores the results; a redelivery after that does not
+        assert (await agent_tasks._process_generation(request, "c1", "job-1"))["status"] == "success"
+    assert persisted == ["job-1", "job-1"]
+
+    # Another tenant's request reusing the correlation id shares nothing with it.
+    other = agent_tasks.PlanRequest.model_validate({"profile": sample_profile("u2"), "correlation_id": "c1"})
+    await agent_tasks._process_generation(other, "c1", "job-2")
+    assert persisted == ["job-1", "job-1", "job-2"]
+
+
+@pytest.mark.asyncio
+async def test_checkpoints_are_scoped_to_the_profile():
+    redis = FakeRedis()
+    await PlanCheckpoints("u1", "job-1", redis).save("plan", {"id": "p1"})
+    assert await PlanCheckpoints("u1", "job-1", redis).load() == {"plan": {"id": "p1"}}
+    assert await PlanCheckpoints("u2", "job-1", redis).load() == {}
@@ -0,0 +1,69 @@
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.clinical_safety_agent import ClinicalSafetyAgent
+from app.core.config import settings
+from app.schemas.plan import UserProfile, WeeklyPlan
+from app.services import clinical_rules, gemini, plan_engine
+from benchmarks.fixtures import sample_profile, sample_weekly_plan
+
+
+def _profile(**clinical) -> UserProfile:
+    data = sample_profile()
+    data["clinical"].update(clinical)
+    return UserProfile.model_validate(data)
+
+
+def test_energy_balance_matches_plan_totals():
+    profile = _profile(medicalConditions=[])
+    plan = plan_engine.generate_weekly_plan(profile)
+    assessment = clinical_rules.assess(profile, plan)
+    report = assessment.to_report()
+
+    assert report.dailyDeficit == pytest.approx(assessment.tdee - plan.averageCalories, abs=1.0)
+    assert report.weightProjection == pytest.approx(-report.dailyDeficit * 7 / 7700, abs=0.01)
+    assert report.risks == []
+    assert report.micronutrientAnalysis["adequacies"] == ["protein", "carbohydrates", "fats"]
+    assert not clinical_rules.narrative_needed(assessment, "auto")
+
+
+def test_flags_inconsistent_totals_low_days_and_allergens():
+    data = sample_weekly_plan()
+    data["days"][0]["dailyCalories"] += 500
+    data["days"][1]["meals"][0]["name"] = "Toast with peanut butter"
+    for meal in data["days"][2]["meals"]:
+        meal["calories"], meal["macros"] = 150, {"protein": 10, "carbs": 15, "fats": 5.5}
+    profile = _profile(medicalConditions=["Type 2 diabetes"])
+
+    assessment = clinical_rules.assess(profile, WeeklyPlan.model_validate(data))
+    flags = " ".join(assessment.risks + assessment.warnings)
+
+    assert "sum of meals on Monday" in flags
+    assert "safety floor on Wednesday" in flags
+    assert "peanut butter" in flags
+    assert assessment.score < 80
+    assert clinical_rules.narrative_needed(assessment, "auto")
+    assert not clinical_rules.narrative_needed(assessment, "template")
+
+
+@pytest.mark.asyncio
+async def test_agent_sends_compact_summary_and_keeps_computed_numbers(monkeypatch):
+    prompts = []
+
+    def fake_report(req, plan, assessment=None, model=None):
+        prompts.append(assessment.summary())
+        return assessment.to_report({"behavioralInsights": ["narrative"], "risks": ["Check sodium"], "notes": "ok"})
+
+    monkeypatch.setattr(gemini, "generate_clinical_report", fake_report)
+    monkeypatch.setattr(settings, "clinical_narrative_mode", "auto")
+    agent = ClinicalSafetyAgent(AgentConfig(name="clinical_safety", description="clinical"))
+
+    report = await agent.process({"profile": sample_profile(), "plan": sample_weekly_plan()})
+    assert prompts and "Hypertension" in prompts[0]["conditions"]
+    assert report.behavioralInsights == ["narrative"]
+    assert "Check sodium" in report.risks
+
+    monkeypatch.setattr(settings, "clinical_narrative_mode", "template")
+    report = await agent.process({"profile": sample_profile(), "plan": sample_weekly_plan()})
+    assert len(prompts) == 1
+    assert report.behavioralInsights[0].startswith("Average intake")
@@ -1,8 +1,11 @@
 import json
+import time
 from types import SimpleNamespace
 
+import google.generativeai as genai
 import pytest
 
+from app.core.deadline import deadline_scope
 from app.schemas.plan import PlanRequest, UserProfile, WeeklyPlan, ClinicalReport
 from app.services import gemini
 
@@ -57,11 +60,11 @@ def test_generate_weekly_plan_parses_json(monkeypatch):
         def __init__(self, *_args, **_kwargs):
             ...
 
-        def generate_content(self, prompt):
+        def generate_content(self, prompt, request_options=None):
             return fake_generate_content(prompt)
 
-    monkeypatch.setattr(gemini.genai, "GenerativeModel", FakeModel)
-    monkeypatch.setattr(gemini.genai, "configure", lambda api_key: None)
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda api_key: None)
 
     plan = gemini.generate_weekly_plan(_dummy_request())
     assert isinstance(plan, WeeklyPlan)
@@ -84,11 +87,11 @@ def test_generate_clinical_report_parses_json(monkeypatch):
         def __init__(self, *_args, **_kwargs):
             ...
 
-        def generate_content(self, prompt):
+        def generate_content(self, prompt, request_options=None):
             return SimpleNamespace(text=json.dumps(expected))
 
-    monkeypatch.setattr(gemini.genai, "GenerativeModel", FakeModel)
-    monkeypatch.setattr(gemini.genai, "configure", lambda api_key: None)
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda api_key: None)
 
     req = _dummy_request()
     dummy_plan = WeeklyPlan(
@@ -104,6 +107,23 @@ def test_generate_clinical_report_parses_json(monkeypatch):
     assert report.overallScore == 90
 
 
+def test_narrative_calls_are_accounted_separately(monkeypatch):
+    operations = []
+
+    def fake_retry(func, attempts, backoff, operation, model=None):
+        operations.append(operation)
+        return json.dumps({"behavioralInsights": ["eat breakfast"]})
+
+    monkeypatch.setattr(gemini, "_retry_call", fake_retry)
+    monkeypatch.setattr(gemini.resources, "llm", lambda model=None: None)
+    plan = WeeklyPlan(id="p1", days=[], averageCalories=0, averageMacros={"protein": 0, "carbs": 0, "fats": 0},
+                      recommendations=[], generatedAt="")
+    assessment = SimpleNamespace(summary=lambda: {"score": 80}, to_report=lambda narrative: narrative)
+
+    gemini.generate_clinical_report(_dummy_request(), plan, assessment)
+    assert operations == ["clinical_narrative"]
+
+
 def test_circuit_breaker(monkeypatch):
     def failing_call(prompt):
         raise RuntimeError("fail")
@@ -112,11 +132,11 @@ def test_circuit_breaker(monkeypatch):
         def __init__(self, *_args, **_kwargs):
             ...
 
-        def generate_content(self, prompt):
+        def generate_content(self, prompt, request_options=None):
             return failing_call(prompt)
 
-    monkeypatch.setattr(gemini.genai, "GenerativeModel", FakeModel)
-    monkeypatch.setattr(gemini.genai, "configure", lambda api_key: None)
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda api_key: None)
 
     req = _dummy_request()
     with pytest.raises(Exception):
@@ -124,3 +144,50 @@ def test_circuit_breaker(monkeypatch):
     # circuit should be open now; next call raises CircuitOpenError quickly
     with pytest.raises(gemini.CircuitOpenError):
         gemini.generate_weekly_plan(req)
+
+
+def test_skeleton_prompt_is_compact(monkeypatch):
+    from app.services import plan_engine
+    from benchmarks.fixtures import sample_profile
+
+    sent = []
+    profile = UserProfile.model_validate(sample_profile("u1"))
+    skeleton = plan_engine.generate_weekly_plan(profile)
+
+    class FakeModel:
+        def __init__(self, *_args, **_kwargs):
+            ...
+
+        def generate_content(self, prompt, request_options=None):
+            sent.append(prompt)
+            return SimpleNamespace(text=skeleton.model_dump_json())
+
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda api_key: None)
+    monkeypatch.setattr(gemini, "_circuit_state", {"failures": 0, "opened_at": 0.0})
+
+    gemini.generate_weekly_plan(PlanRequest(profile=profile), skeleton)
+    assert "consent" not in sent[0] and skeleton.days[0].meals[0].id not in sent[0]
+    assert len(sent[0]) < len(profile.model_dump_json()) + len(skeleton.model_dump_json())
+
+
+def test_gemini_request_timeout_is_capped_by_the_deadline(monkeypatch):
+    sent = []
+
+    class FakeModel:
+        def __init__(self, *_args, **_kwargs):
+            ...
+
+        def generate_content(self, prompt, request_options=None):
+            sent.append(request_options["timeout"])
+            return SimpleNamespace(text='{"calories": 300, "protein": 20, "carbs": 30, "fats": 10}')
+
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda **_kwargs: None)
+    monkeypatch.setattr(gemini, "_circuit_state", {"failures": 0, "opened_at": 0.0})
+    monkeypatch.setattr(gemini.llm_usage.ledger, "record", lambda record: None)
+
+    gemini.estimate_meal("rice")
+    with deadline_scope(time.time() + 2):
+        gemini.estimate_meal("rice")
+    assert sent[0] == gemini.settings.gemini_timeout and 0 < sent[1] <= 2
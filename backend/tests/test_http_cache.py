@@ -0,0 +1,65 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app.core import compression, http_cache
+from app.main import app
+from app.schemas.plan import UserProfile
+from app.services import plan_engine
+from app.services.profile_service import ProfileService
+from benchmarks.fixtures import sample_profile
+
+client = TestClient(app)
+
+
+def test_etag_comparison_ignores_weakness_and_encoding_suffix():
+    tag = http_cache.etag("p1", "ab" * 32)
+    assert tag == '"p1-abababababababab"'
+    assert http_cache.matches('"p1-abababababababab-gzip"', tag)
+    assert http_cache.matches('"other", W/"p1-abababababababab"', tag)
+    assert http_cache.matches("*", tag)
+    assert not http_cache.matches('"p1-0000000000000000"', tag) and not http_cache.matches(None, tag)
+
+
+def test_negotiation_follows_q_values_then_preference():
+    assert compression.negotiate("gzip, br;q=0.5, zstd", ["zstd", "br", "gzip"]) == "zstd"
+    assert compression.negotiate("gzip;q=1, zstd;q=0.2", ["zstd", "br", "gzip"]) == "gzip"
+    assert compression.negotiate("identity", ["zstd", "br", "gzip"]) is None
+    assert compression.negotiate("*;q=0.1", ["gzip"]) == "gzip"
+
+
+def test_latest_plan_revalidates_without_loading_the_document(monkeypatch):
+    plan = plan_engine.generate_weekly_plan(UserProfile.model_validate(sample_profile("u1")))
+    entity = SimpleNamespace(
+        id="e1", content_hash=http_cache.content_hash(plan.model_dump()), created_at=datetime(2026, 1, 1), source="request"
+    )
+    loads = []
+
+    async def latest_plan(self, profile_id, content=True):
+        return entity
+
+    async def serve_plan(self, plan_entity):
+        return plan_entity
+
+    async def load_content(self, plan_entity):
+        loads.append(plan_entity.id)
+        plan_entity.plan = plan.model_dump()
+
+    monkeypatch.setattr(ProfileService, "latest_plan", latest_plan)
+    monkeypatch.setattr(ProfileService, "serve_plan", serve_plan)
+    monkeypatch.setattr(ProfileService, "load_content", load_content)
+
+    first = client.get("/api/profiles/u1/plans/latest", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200 and first.json()["plan"]["id"] == plan.id
+    assert first.headers["content-encoding"] == "gzip" and first.headers["vary"] == "Accept-Encoding"
+    assert first.headers["etag"].endswith('-gzip"') and first.headers["cache-control"] == http_cache.REVALIDATE
+
+    second = client.get("/api/profiles/u1/plans/latest", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304 and second.content == b""
+    assert loads == ["e1"]
+
+
+def test_small_bodies_are_not_compressed():
+    resp = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200 and "content-encoding" not in resp.headers
@@ -0,0 +1,149 @@
+from types import SimpleNamespace
+
+import google.generativeai as genai
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services import gemini, llm_usage
+from app.services.profile_service import ProfileService
+from app.services.scheduling import Admission
+from benchmarks.fixtures import sample_profile
+
+PLAN_BODY = {"profile": sample_profile("u1")}
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args))
+
+    def _run(self):
+        results = []
+        for name, args in self.ops:
+            if name == "xadd":
+                self.redis.stream.append(args[1])
+            elif name == "hincrby":
+                key, field, value = args
+                self.redis.hashes.setdefault(key, {})[field] = self.redis.hashes.get(key, {}).get(field, 0) + value
+            elif name == "hget":
+                results.append(self.redis.hashes.get(args[0], {}).get(args[1]))
+        return results
+
+    def execute(self):
+        return self._run()
+
+
+class AsyncPipeline(FakePipeline):
+    async def execute(self):
+        return self._run()
+
+
+class FakeRedis:
+    def __init__(self, pipeline=FakePipeline):
+        self.stream = []
+        self.hashes = {}
+        self._pipeline = pipeline
+
+    def pipeline(self, transaction=True):
+        return self._pipeline(self)
+
+
+def test_ledger_batches_records_and_counts_per_tenant_and_profile(monkeypatch):
+    monkeypatch.setattr(settings, "llm_usage_batch", 2)
+    redis = FakeRedis()
+    monkeypatch.setattr(llm_usage, "ledger", llm_usage.UsageLedger(redis))
+
+    with llm_usage.usage_scope("t1", "p1", "c1"):
+        llm_usage.record_call("gemini-x", "weekly_plan", "success", 2, 1.5, {"prompt": 800, "response": 1200, "cached": 300})
+        assert redis.stream == []  # buffered until the batch is full
+        llm_usage.record_call("gemini-x", "clinical_report", "error", 3, 0.25)
+    assert len(redis.stream) == 2
+
+    window = llm_usage.day_window()
+    tenant = redis.hashes[llm_usage.counter_key("tenant", "t1", window)]
+    assert tenant == {"calls": 2, "tokens": 2000, "prompt_tokens": 800, "response_tokens": 1200, "latency_ms": 1750, "attempts": 5}
+    assert redis.hashes[llm_usage.counter_key("profile", "p1", window)]["tokens"] == 2000
+    assert llm_usage.UsageRecord(0, "m", "op", "success", 1, 0, cached_tokens=300).cache == "hit"
+
+
+@pytest.mark.asyncio
+async def test_budget_allows_downgrades_or_rejects(monkeypatch):
+    redis = FakeRedis(AsyncPipeline)
+    assert await llm_usage.check_budget(redis, "t1", "p1") == llm_usage.ALLOW  # no budget configured
+
+    monkeypatch.setattr(settings, "llm_budget_tenant_tokens", 1000)
+    redis.hashes[llm_usage.counter_key("tenant", "t1", llm_usage.day_window())] = {"tokens": 999}
+    assert (await llm_usage.check_budget(redis, "t1", "p1")).action == "allow"
+
+    redis.hashes[llm_usage.counter_key("tenant", "t1", llm_usage.day_window())] = {"tokens": 1000}
+    decision = await llm_usage.check_budget(redis, "t1", "p1")
+    assert (decision.action, decision.engine, decision.model) == ("downgrade", "local", None)
+
+    monkeypatch.setattr(settings, "llm_budget_fallback_model", "gemini-lite")
+    assert (await llm_usage.check_budget(redis, "t1", "p1")).model == "gemini-lite"
+
+    monkeypatch.setattr(settings, "llm_budget_action", "reject")
+    decision = await llm_usage.check_budget(redis, "t1", "p1")
+    assert decision.action == "reject" and 0 < decision.retry_after <= 24 * 3600
+    assert (await llm_usage.check_budget(redis, "other", "p1")).action == "allow"
+
+
+def test_gemini_calls_write_one_record_each(monkeypatch):
+    records = []
+    monkeypatch.setattr(llm_usage.ledger, "record", records.append)
+    monkeypatch.setattr(gemini, "_circuit_state", {"failures": 0, "opened_at": 0.0})
+
+    class FakeModel:
+        def __init__(self, name=None):
+            self.name = name
+
+        def generate_content(self, prompt, request_options=None):
+            usage = SimpleNamespace(prompt_token_count=40, candidates_token_count=12, cached_content_token_count=0)
+            return SimpleNamespace(text='{"calories": 300, "protein": 20, "carbs": 30, "fats": 10}', usage_metadata=usage)
+
+    monkeypatch.setattr(genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(genai, "configure", lambda **_kwargs: None)
+
+    with llm_usage.usage_scope("t1", "p1", "c1"):
+        gemini.estimate_meal("rice and beans", model="gemini-lite")
+    (record,) = records
+    assert (record.model, record.operation, record.outcome, record.attempts) == ("gemini-lite", "meal_estimate", "success", 1)
+    assert (record.prompt_tokens, record.response_tokens, record.tenant_id, record.correlation_id) == (40, 12, "t1", "c1")
+
+
+def test_enqueue_applies_budget_decision(monkeypatch):
+    sent = []
+
+    async def no_ready_plan(self, profile_id, profile):
+        return None
+
+    async def admit(tenant, lane, job_id):
+        return Admission(lane="interactive", queue="agents.interactive", priority=0)
+
+    decision = llm_usage.BudgetDecision("downgrade", "tenant tokens", engine="local")
+
+    async def check_budget(redis, tenant_id, profile_id):
+        return decision
+
+    monkeypatch.setattr(ProfileService, "ready_plan", no_ready_plan)
+    monkeypatch.setattr("app.api.routes.tasks.scheduler.admit", admit)
+    monkeypatch.setattr(llm_usage, "check_budget", check_budget)
+    monkeypatch.setattr(
+        "app.api.routes.tasks._celery",
+        lambda: SimpleNamespace(send_task=lambda name, args, **kw: sent.append(args[0]) or SimpleNamespace(id="t")),
+    )
+    client = TestClient(app)
+
+    body = {**PLAN_BODY, "engine": "llm", "llm_model": "gemini-pro"}  # client values are overwritten
+    assert client.post("/api/agents/plan", json=body).status_code == 200
+    assert (sent[0]["engine"], sent[0]["llm_model"]) == ("local", None)
+
+    decision = llm_usage.BudgetDecision("reject", "tenant tokens", retry_after=120)
+    resp = client.post("/api/agents/plan", json=PLAN_BODY)
+    assert resp.status_code == 429 and resp.headers["Retry-After"] == "120"
+    assert len(sent) == 1
@@ -0,0 +1,52 @@
+import io
+import os
+
+import orjson
+import pytest
+import structlog
+from prometheus_client import REGISTRY
+
+from app.core.logging import EventSampler, QueuedLogger, QueuedWriter, build_processors
+
+
+def test_sampler_keeps_or_drops_a_request_as_a_whole():
+    sampler = EventSampler({"agent_run_start": 0.3, "agent_run_success": 1.0})
+    kept = set()
+    for n in range(2000):
+        event = {"event": "agent_run_start", "correlation_id": f"c{n}"}
+        try:
+            sampler(None, "info", dict(event))
+        except structlog.DropEvent:
+            with pytest.raises(structlog.DropEvent):
+                sampler(None, "info", dict(event))
+            continue
+        kept.add(n)
+        assert sampler(None, "info", dict(event))["sample_rate"] == 0.3
+    assert 0.25 < len(kept) / 2000 < 0.35
+    assert sampler(None, "warning", {"event": "agent_run_start", "correlation_id": "c1"})
+    assert "sample_rate" not in sampler(None, "info", {"event": "agent_run_success"})
+
+
+def test_queued_writer_renders_orjson_with_bound_correlation_id():
+    stream = io.BytesIO()
+    writer = QueuedWriter(stream)
+    logger = structlog.wrap_logger(QueuedLogger(writer), processors=build_processors())
+    with structlog.contextvars.bound_contextvars(correlation_id="corr-1"):
+        for attempt in range(3):
+            logger.info("agent_run_start", attempt=attempt)
+    writer.close()
+
+    lines = [orjson.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["attempt"] for line in lines] == [0, 1, 2]
+    assert {line["correlation_id"] for line in lines} == {"corr-1"}
+    assert lines[0]["level"] == "info" and "timestamp" in lines[0]
+
+
+def test_full_queue_drops_instead_of_blocking(monkeypatch):
+    writer = QueuedWriter(io.BytesIO(), maxsize=1)
+    # No writer thread, so the queue stays full.
+    monkeypatch.setattr(writer, "_start", lambda: setattr(writer, "_pid", os.getpid()))
+    before = REGISTRY.get_sample_value("log_records_dropped_total") or 0
+    writer.write(b"a")
+    writer.write(b"b")
+    assert REGISTRY.get_sample_value("log_records_dropped_total") == before + 1
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.meal_log_agent import MealLogAgent
+from app.schemas.plan import MealEstimate
+from app.services import food_db, gemini
+from app.services.food_index import FoodIndex, normalize
+from app.services.meal_parser import parse_entry
+
+
+def test_parses_units_and_portuguese_aliases():
+    entry = parse_entry("2 slices of whole grain bread, 150g frango e uma banana")
+    assert [(i.food, i.grams) for i in entry.items] == [
+        ("whole grain bread", 60.0),
+        ("chicken breast", 150.0),
+        ("banana", 100.0),
+    ]
+    assert entry.confidence == 1.0
+    assert entry.macros.protein == pytest.approx(0.6 * 13 + 1.5 * 31 + 1.1, abs=0.2)
+
+
+def test_fractions_decimal_commas_and_trailing_quantities():
+    items = parse_entry("1/2 cup oats; 1,5 kg melancia; Arroz 100 g").items
+    assert [(i.food, i.grams) for i in items] == [("oats", 80.0), ("watermelon", 1500.0), ("white rice", 100.0)]
+
+
+@pytest.mark.parametrize("text", ["1/0 banana", "2.5/3 banana"])
+def test_unreadable_quantities_leave_the_item_to_gemini(text):
+    item, = parse_entry(text).items
+    assert (item.food, item.calories, item.confidence) == (None, 0.0, 0.0)
+
+
+def test_fuzzy_matches_score_below_exact_ones():
+    index = FoodIndex(food_db.load_foods())
+    assert normalize("Pão Francês") == "pao frances"
+    assert index.best("pao frances").score == 1.0
+    fuzzy = index.best("grilled salmon")
+    assert fuzzy.term == "salmon" and 0.6 < fuzzy.score < 1.0
+    assert index.best("xyz unknown thing").score < 0.6
+
+
+def test_compiled_table_is_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(food_db.settings, "food_db_cache_dir", str(tmp_path / "cache"))
+    food_db.load_foods.cache_clear()
+    try:
+        table = food_db.load_foods()
+        (compiled,) = (tmp_path / "cache").iterdir()  # no temp file left behind
+        assert compiled == food_db.cache_path() and compiled.name.startswith("foods-")
+        assert isinstance(table.per_100g.base, np.memmap) or isinstance(table.per_100g, np.memmap)
+        for column in (table.names, table.categories, table.slots):
+            assert isinstance(column.base, np.memmap) or isinstance(column, np.memmap)
+        assert "banana" in table.names
+    finally:
+        food_db.load_foods.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_agent_sends_only_uncertain_items_to_gemini(monkeypatch):
+    calls = []
+
+    def estimate(description):
+        calls.append(description)
+        return MealEstimate(calories=300, protein=10, carbs=40, fats=12)
+
+    monkeypatch.setattr(gemini, "estimate_meal", estimate)
+    agent = MealLogAgent(AgentConfig(name="meal_log", description="log"))
+
+    result = await agent.process({"entry": {"text": "a banana and xyz unknown thing"}})
+    assert calls == ["xyz unknown thing"]
+    assert result["source"] == "mixed"
+    assert result["calories"] == pytest.approx(89 + 300)
+
+    calls.clear()
+    result = await agent.process({"entry": "200 g chicken breast"})
+    assert calls == [] and result["source"] == "local"
+    assert result["macros"]["protein"] == pytest.approx(62.0)
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.agents.base_agent import AgentConfig, BaseAgent
+from app.core import metrics
+from app.main import app
+
+client = TestClient(app)
+
+
+class FakePipeline:
+    def __init__(self):
+        self.calls = []
+
+    def llen(self, key):
+        self.calls.append(3 if key == "agents.interactive" else 0)
+
+    def zcount(self, key, low, high):
+        self.calls.append(3 if key.endswith("interactive") else 0)
+
+    def execute(self):
+        return self.calls
+
+
+class FakeRedis:
+    def pipeline(self, transaction=False):
+        return FakePipeline()
+
+
+class EchoAgent(BaseAgent[dict]):
+    async def process(self, input_data: dict) -> dict:
+        return input_data
+
+
+@pytest.mark.asyncio
+async def test_agent_run_is_recorded():
+    await EchoAgent(AgentConfig(name="metrics_echo", description="Echo")).run({})
+    labels = {"agent": "metrics_echo", "outcome": "success"}
+    assert REGISTRY.get_sample_value("agent_run_duration_seconds_count", labels) == 1
+    assert REGISTRY.get_sample_value("agent_run_attempts_sum", {"agent": "metrics_echo"}) == 1
+
+
+def test_metrics_endpoint_exposes_queue_depth(monkeypatch):
+    monkeypatch.setattr(metrics.queue_depth_collector, "_client", lambda: FakeRedis())
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    body = resp.text
+    assert 'celery_queue_depth{queue="agents.interactive"} 3.0' in body
+    assert 'plan_pending_jobs{lane="interactive"} 3.0' in body
+    assert "agent_run_duration_seconds_bucket" in body
+    assert "gemini_circuit_open" in body
+
+
+def test_workers_serve_metrics_only_when_given_a_port(monkeypatch):
+    import prometheus_client
+
+    started = []
+    monkeypatch.setattr(prometheus_client, "start_http_server", lambda port, registry: started.append((port, registry)))
+    metrics.serve_metrics(0)
+    metrics.serve_metrics(9100)
+    assert started == [(9100, REGISTRY)]
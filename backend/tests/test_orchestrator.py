@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from app.agents.base_agent import AgentConfig
@@ -25,3 +27,49 @@ async def test_orchestrator_executes_plan(monkeypatch):
     orch = OrchestratorAgent(AgentConfig(name="orch", description="Orchestrator"), registry)
     result = await orch.process({"profile": {"id": "u1"}})
     assert result["results"][0]["plan"] == "ok"
+
+
+class SlowAgent:
+    def __init__(self, name: str, delay: float, tracker: dict):
+        self.config = AgentConfig(name=name, description=name)
+        self.delay = delay
+        self.tracker = tracker
+
+    async def run(self, step_input):
+        self.tracker["running"] += 1
+        self.tracker["peak"] = max(self.tracker["peak"], self.tracker["running"])
+        await asyncio.sleep(self.delay)
+        self.tracker["running"] -= 1
+        return {"agent": self.config.name, "saw_plan": "plan" in step_input}
+
+
+def _slow_registry(tracker: dict) -> AgentRegistry:
+    registry = AgentRegistry()
+    for name in ("nutrition_plan", "clinical_safety", "behavior_coach"):
+        registry.register(SlowAgent(name, 0.05, tracker))
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_fans_out_independent_steps():
+    tracker = {"running": 0, "peak": 0}
+    orch = OrchestratorAgent(AgentConfig(name="orch", description="Orchestrator"), _slow_registry(tracker))
+    result = await orch.process({"profile": {"id": "u1"}})
+
+    assert tracker["peak"] == 2  # clinical_safety and behavior_coach overlap after the plan step
+    assert result["outputs"]["clinical"]["saw_plan"] is True
+    assert set(result["timings"]["steps"]) == {"plan", "clinical", "coach"}
+    assert {"intake", "planner", "executor", "total"} <= set(result["timings"])
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_respects_parallel_limit_and_reuses_graph():
+    tracker = {"running": 0, "peak": 0}
+    orch = OrchestratorAgent(AgentConfig(name="orch", description="Orchestrator"), _slow_registry(tracker))
+    steps = [{"id": f"s{i}", "agent": "behavior_coach", "depends_on": []} for i in range(4)]
+    outputs, _ = await orch.execute_steps(steps, {}, max_parallel=2)
+
+    assert len(outputs) == 4
+    assert tracker["peak"] == 2
+    other = OrchestratorAgent(AgentConfig(name="orch2", description="Orchestrator"), AgentRegistry())
+    assert other.compiled_graph("plan_pipeline") is orch.compiled_graph("plan_pipeline")
@@ -0,0 +1,104 @@
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.nutrition_plan_agent import NutritionPlanAgent
+from app.core.config import settings
+from app.schemas.plan import UserProfile
+from app.services import gemini, plan_engine
+from app.services.food_db import load_foods, restriction_tags
+from app.services.nutrition_metrics import compute_targets
+from benchmarks.fixtures import sample_profile
+
+
+def _profile(**routine) -> UserProfile:
+    data = sample_profile()
+    data["routine"].update(routine)
+    return UserProfile.model_validate(data)
+
+
+def test_targets_follow_mifflin_st_jeor():
+    targets = compute_targets(sample_profile())
+    # 10*72 + 6.25*168 - 5*34 - 161
+    assert targets.bmr == 1439.0
+    assert targets.tdee == pytest.approx(1439.0 * 1.55, abs=0.1)
+    assert targets.calories == pytest.approx(targets.tdee * 0.8, abs=0.1)
+    assert targets.protein == pytest.approx(72 * 1.6, abs=0.1)
+
+
+def test_kidney_disease_caps_protein():
+    data = sample_profile()
+    data["clinical"]["medicalConditions"] = ["Chronic kidney disease"]
+    assert compute_targets(data).protein == pytest.approx(72 * 0.8, abs=0.1)
+
+
+def test_local_plan_hits_targets():
+    profile = _profile()
+    targets = compute_targets(profile.model_dump())
+    plan = plan_engine.generate_weekly_plan(profile)
+
+    assert len(plan.days) == 7
+    assert all(len(day.meals) == 4 for day in plan.days)
+    assert plan.averageCalories == pytest.approx(targets.calories, rel=0.08)
+    assert plan.averageMacros.protein == pytest.approx(targets.protein, rel=0.1)
+    assert len({meal.name for day in plan.days for meal in day.meals}) > 14
+
+
+def test_local_plan_respects_restrictions():
+    table = load_foods()
+    plan = plan_engine.generate_weekly_plan(_profile(dietaryPreference="vegan", allergies=["soy", "peanuts"], mealsPerDay=3))
+    names = {name: tags for name, tags in zip(table.names, table.tags)}
+    used = [part.split(" g ", 1)[1] for day in plan.days for meal in day.meals for part in meal.description.split(", ")]
+
+    assert all(len(day.meals) == 3 for day in plan.days)
+    assert all("vegan" in names[food] and not names[food] & {"soy", "peanut"} for food in used)
+
+
+@pytest.mark.parametrize(("value", "meals"), [("3-4", 3), ("three", 4), (None, 4), (9, 6), ("0", 1)])
+def test_free_text_meals_per_day_maps_to_a_layout(value, meals):
+    profile = _profile(mealsPerDay=value)
+    assert plan_engine.meals_per_day(profile) == meals
+    assert len(plan_engine.meal_layout(profile)) == meals
+
+
+def test_meal_with_every_food_excluded_gets_the_slot_title():
+    meal = plan_engine._build_meal(load_foods(), [], "10:00", "snack")
+    assert (meal.name, meal.description, meal.calories) == ("Snack", "", 0.0)
+
+
+def test_restriction_tags_do_not_confuse_peanuts_with_tree_nuts():
+    assert restriction_tags(["peanut"]) == {"peanut"}
+    assert restriction_tags(["Nozes", "kosher"]) == {"nuts", "pork", "shellfish"}
+
+
+@pytest.mark.asyncio
+async def test_agent_falls_back_to_local_engine_when_circuit_open(monkeypatch):
+    def open_circuit(req, *args):
+        raise gemini.CircuitOpenError("open")
+
+    monkeypatch.setattr(gemini, "generate_weekly_plan", open_circuit)
+    monkeypatch.setattr(settings, "plan_engine_mode", "fallback")
+    agent = NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="plan"))
+
+    plan = await agent.process({"profile": sample_profile()})
+    assert len(plan.days) == 7
+
+    monkeypatch.setattr(settings, "plan_engine_mode", "llm")
+    with pytest.raises(gemini.CircuitOpenError):
+        await agent.process({"profile": sample_profile()})
+
+
+@pytest.mark.asyncio
+async def test_agent_skeleton_mode_sends_draft_to_gemini(monkeypatch):
+    seen = []
+
+    def personalise(req, skeleton, history="", model=None):
+        seen.append(skeleton)
+        return skeleton.model_copy(update={"recommendations": ["personalised"]})
+
+    monkeypatch.setattr(gemini, "generate_weekly_plan", personalise)
+    monkeypatch.setattr(settings, "plan_engine_mode", "skeleton")
+    agent = NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="plan"))
+
+    plan = await agent.process({"profile": sample_profile()})
+    assert plan.recommendations == ["personalised"]
+    assert plan.id == seen[0].id
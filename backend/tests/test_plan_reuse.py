@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.nutrition_plan_agent import NutritionPlanAgent
+from app.core.config import settings
+from app.models.profile import PROFILE_EMBEDDING_DIM
+from app.schemas.plan import UserProfile
+from app.services import gemini, plan_engine, plan_reuse
+from app.services.nutrition_metrics import compute_targets
+from benchmarks.fixtures import sample_profile
+
+
+def _profile(**changes) -> UserProfile:
+    data = sample_profile()
+    for section, values in changes.items():
+        data[section].update(values)
+    return UserProfile.model_validate(data)
+
+
+def test_encoder_is_deterministic_unit_vector():
+    vector = plan_reuse.encode_profile(_profile())
+    assert vector.shape == (PROFILE_EMBEDDING_DIM,)
+    assert vector.dtype == np.float32
+    assert float(np.linalg.norm(vector)) == pytest.approx(1.0, abs=1e-5)
+    np.testing.assert_array_equal(vector, plan_reuse.encode_profile(_profile()))
+
+
+def test_encoder_accepts_free_text_meals_per_day():
+    vector = plan_reuse.encode_profile(_profile(routine={"mealsPerDay": "3-4"}))
+    np.testing.assert_array_equal(vector, plan_reuse.encode_profile(_profile(routine={"mealsPerDay": 3})))
+
+
+def test_similar_profiles_are_close_and_different_goals_are_not():
+    base = plan_reuse.encode_profile(_profile())
+    twin = plan_reuse.encode_profile(_profile(biometrics={"age": 35, "weight": 73}))
+    gainer = plan_reuse.encode_profile(_profile(goals={"primary": "gain"}))
+
+    assert float(base @ twin) >= settings.plan_reuse_min_similarity
+    assert float(base @ gainer) < settings.plan_reuse_min_similarity
+
+
+def test_signature_separates_hard_constraints():
+    base = plan_reuse.constraint_signature(_profile())
+    assert base == plan_reuse.constraint_signature(_profile(biometrics={"weight": 90}))
+    assert base != plan_reuse.constraint_signature(_profile(routine={"allergies": ["peanut", "shrimp"]}))
+    assert base != plan_reuse.constraint_signature(_profile(routine={"mealsPerDay": 5}))
+
+
+def test_adapt_plan_rescales_to_calorie_target():
+    plan = plan_engine.generate_weekly_plan(_profile())
+    profile = _profile(biometrics={"weight": 76})
+    adapted = plan_reuse.adapt_plan(plan, profile)
+
+    assert adapted is not None and adapted.id != plan.id
+    targets = compute_targets(profile.model_dump())
+    assert adapted.averageCalories == pytest.approx(targets.calories, rel=0.02)
+    assert f"about {targets.calories:.0f} kcal" in adapted.recommendations[0]
+    assert adapted.recommendations != plan.recommendations
+    assert plan_reuse.adapt_plan(plan, _profile(biometrics={"weight": 120, "height": 190})) is None
+
+
+@pytest.mark.asyncio
+async def test_agent_prefers_reused_plan(monkeypatch):
+    reused = plan_engine.generate_weekly_plan(_profile())
+
+    async def find_reusable(profile):
+        return reused
+
+    def unexpected(*args):
+        raise AssertionError("Gemini should not be called")
+
+    monkeypatch.setattr(plan_reuse, "find_reusable", find_reusable)
+    monkeypatch.setattr(gemini, "generate_weekly_plan", unexpected)
+    monkeypatch.setattr(settings, "plan_engine_mode", "llm")
+    monkeypatch.setattr(settings, "plan_reuse_enabled", True)
+    agent = NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="plan"))
+
+    assert (await agent.process({"profile": sample_profile()})).id == reused.id
+
+
+@pytest.mark.asyncio
+async def test_lookup_fails_open_without_database(monkeypatch):
+    monkeypatch.setattr(settings, "plan_reuse_timeout", 0.05)
+    assert await plan_reuse.find_reusable(_profile()) is None
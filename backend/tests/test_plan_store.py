@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.schemas.plan import UserProfile, WeeklyPlan
+from app.services import plan_engine, plan_store
+from benchmarks.fixtures import sample_profile
+
+
+def _plans(count, profiles=4):
+    return [
+        plan_engine.generate_weekly_plan(UserProfile.model_validate(sample_profile(f"u{n % profiles}"))).model_dump()
+        for n in range(count)
+    ]
+
+
+def test_normalize_round_trips_and_shares_bodies_across_regenerations():
+    first, second = _plans(2, profiles=1)
+    assert first["id"] != second["id"]
+
+    body, meals, instance = plan_store.normalize(first)
+    again, _, other = plan_store.normalize(second)
+    assert plan_store.materialize(body, meals, instance) == first
+    assert WeeklyPlan.model_validate(plan_store.materialize(again, meals, other)) == WeeklyPlan.model_validate(second)
+    assert plan_store.content_hash(body) == plan_store.content_hash(again)
+
+
+def test_catalog_stores_a_fraction_of_the_inline_documents():
+    documents = _plans(20)
+    inline = sum(len(orjson.dumps(d)) for d in documents)
+    bodies, meals, instances = {}, {}, 0
+    for document in documents:
+        body, used, instance = plan_store.normalize(document)
+        bodies[plan_store.content_hash(body)] = len(orjson.dumps(body))
+        meals.update({key: len(orjson.dumps(data)) for key, data in used.items()})
+        instances += len(orjson.dumps(instance))
+    assert sum(bodies.values()) + sum(meals.values()) + instances < inline / 4
+
+
+class FakeSession:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return SimpleNamespace(all=lambda: self.rows.pop(0))
+
+
+@pytest.mark.asyncio
+async def test_store_and_load_use_conflict_free_inserts_and_two_reads(monkeypatch):
+    document = _plans(1)[0]
+    writes = FakeSession()
+    body_hash, instance = await plan_store.store(writes, document)
+    assert len(writes.statements) == 2
+    assert all("ON CONFLICT (hash) DO NOTHING" in statement for statement in writes.statements)
+
+    body, meals, _ = plan_store.normalize(document)
+    entity = SimpleNamespace(plan=None, body_hash=body_hash, instance=instance)
+    inline = SimpleNamespace(plan=document, body_hash=None, instance=None)
+    reads = FakeSession([[(body_hash, body)], list(meals.items())])
+    monkeypatch.setattr(plan_store, "set_committed_value", lambda obj, key, value: setattr(obj, key, value))
+    await plan_store.load(reads, [entity, inline])
+    assert entity.plan == document and len(reads.statements) == 2
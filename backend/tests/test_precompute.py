@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.models.profile import WeeklyPlanEntity
+from app.services import precompute
+from app.services.profile_service import ProfileService
+
+NOW = datetime(2026, 3, 7, 3, 0)  # Saturday, 03:00 UTC
+
+
+def _plans(*ages_days, source="request", status=None):
+    return [SimpleNamespace(created_at=NOW - timedelta(days=d), source=source, status=status) for d in ages_days]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+
+    def expire(self, key, seconds):
+        return True
+
+
+def test_candidates_follow_each_profiles_cadence():
+    history = {
+        "weekly": _plans(20, 13, 6),  # due tomorrow
+        "fortnightly": _plans(30, 16, 2),  # due in 12 days
+        "waiting": _plans(13, 6) + _plans(0, source="precomputed", status="ready"),
+        "lapsed": _plans(60, 53, 46),  # three weeks overdue
+        "served": _plans(13) + _plans(6, source="precomputed", status="served"),
+    }
+    candidates = precompute.select_candidates(history, NOW)
+
+    assert [c.profile_id for c in candidates] == ["weekly", "served"]
+    assert candidates[0].due_at == NOW + timedelta(days=1)
+
+
+def test_window_and_daily_budget(monkeypatch):
+    monkeypatch.setattr(settings, "precompute_window_start_hour", 22)
+    monkeypatch.setattr(settings, "precompute_window_end_hour", 5)
+    assert precompute.in_window(NOW) and not precompute.in_window(NOW.replace(hour=12))
+
+    monkeypatch.setattr(settings, "precompute_daily_budget", 5)
+    client = FakeRedis()
+    assert precompute.reserve_budget(client, 3, NOW) == 3
+    assert precompute.reserve_budget(client, 3, NOW) == 2
+    assert precompute.reserve_budget(client, 3, NOW) == 0
+    assert precompute.reserve_budget(client, 3, NOW + timedelta(days=1)) == 3
+
+
+def test_claims_release_survives_redis_errors():
+    class DownRedis:
+        def delete(self, *keys):
+            raise RedisError("down")
+
+    precompute.release_claims(DownRedis(), [precompute.Candidate("p1", NOW)])  # logged, not raised
+
+
+@pytest.mark.asyncio
+async def test_serving_a_ready_plan_counts_one_hit():
+    class FakeSession:
+        def __init__(self):
+            self.ready = True
+
+        async def execute(self, statement):
+            changed, self.ready = self.ready, False  # the row only matches while still ready
+            return SimpleNamespace(rowcount=int(changed))
+
+        async def commit(self):
+            pass
+
+    session = FakeSession()
+    hits = lambda: REGISTRY.get_sample_value("plan_precompute_total", {"outcome": "hit"}) or 0
+    before = hits()
+    # Two concurrent reads that both loaded the plan while it was ready.
+    first, second = (WeeklyPlanEntity(id="pre-1", status="ready") for _ in range(2))
+    await ProfileService(session).serve_plan(first)
+    await ProfileService(session).serve_plan(second)
+    assert first.status == second.status == "served"
+    assert hits() - before == 1
@@ -0,0 +1,90 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.api.routes.profiles import profile_out
+from app.models.profile import Profile
+from app.schemas.plan import UserProfile
+from app.services import nutrition_metrics
+from app.services.profile_service import ProfileFilters, ProfileService
+from benchmarks.fixtures import sample_profile
+
+
+def _profiles():
+    profiles = []
+    for n, (gender, activity, goal, diet) in enumerate(
+        [("Male", "Sedentary", "gain", "keto"), ("Female", "Very Active", "loss", "omnivore"), ("", "", "", "low_carb")]
+    ):
+        data = sample_profile(f"u{n}")
+        data["biometrics"] = {"age": 25 + 10 * n, "gender": gender, "height": 160 + 8 * n, "weight": 55 + 15 * n}
+        data["lifestyle"] = {"activityLevel": activity}
+        data["goals"] = {"primary": goal}
+        data["routine"] = {"dietaryPreference": diet}
+        profiles.append(data)
+    return profiles
+
+
+def test_batch_matches_single_profile_targets():
+    profiles = _profiles()
+    batch = nutrition_metrics.compute_targets_batch(profiles)
+    for i, profile in enumerate(profiles):
+        assert {name: float(column[i]) for name, column in batch.items()} == nutrition_metrics.compute_targets(profile).as_dict()
+
+
+class FakeSession:
+    def __init__(self, rows):
+        self.pages = [rows, []]
+        self.updates = []
+        self.added = []
+
+    async def execute(self, statement, params=None):
+        if params is not None:
+            self.updates.append((str(statement.compile(dialect=postgresql.dialect())), params))
+            return None
+        self.query = str(statement.compile(dialect=postgresql.dialect()))
+        return SimpleNamespace(all=lambda: self.pages.pop(0))
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        pass
+
+    async def refresh(self, obj):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_create_stores_metrics_and_recompute_updates_stale_rows_in_bulk():
+    profiles = _profiles()
+    session = FakeSession([(p["id"], p) for p in profiles])
+    created = await ProfileService(session).create_profile(UserProfile.model_validate(profiles[0]))
+    expected = nutrition_metrics.compute_targets(profiles[0])
+    assert (created.bmr, created.tdee, created.target_calories, created.bmi) == (
+        expected.bmr, expected.tdee, expected.calories, expected.bmi
+    )
+    assert created.metrics_version == nutrition_metrics.METRICS_VERSION
+
+    assert await ProfileService(session).recompute_metrics(batch_size=10) == 3
+    assert "metrics_version IS NULL OR profile.metrics_version <" in session.query
+    ((sql, params),) = session.updates
+    assert "updated_at=profile.updated_at" in sql
+    assert params[2]["b_id"] == "u2" and params[2]["b_target_protein"] == nutrition_metrics.compute_targets(profiles[2]).protein
+
+
+def test_metric_filters_and_output():
+    filters = ProfileFilters(min_bmi=18.5, max_bmi=25, max_calories=1800)
+    sql = str(select(Profile.id).where(*filters.clauses()).compile(dialect=postgresql.dialect()))
+    assert "profile.bmi >=" in sql and "profile.bmi <=" in sql and "profile.target_calories <=" in sql
+
+    data = _profiles()[1]
+    stamp = datetime(2026, 1, 1)
+    profile = Profile(id="u1", name="User", language="en", data=data, created_at=stamp, updated_at=stamp)
+    assert profile_out(profile).metrics is None  # not computed yet
+    profile.bmr, profile.tdee, profile.target_calories, profile.target_protein = 1400.0, 2100.0, 1700.0, 110.0
+    profile.target_carbs, profile.target_fats, profile.bmi, profile.metrics_version = 180.0, 60.0, 22.9, 1
+    out = profile_out(profile)
+    assert out.metrics.calories == 1700.0 and out.data["bmr"] == 1400.0 and out.data["tdee"] == 2100.0
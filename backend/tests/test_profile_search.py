@@ -0,0 +1,59 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from app.main import app
+from app.models.profile import PROFILE_GOAL, Profile
+from app.services.profile_service import (
+    InvalidCursor,
+    ProfileFilters,
+    ProfileService,
+    decode_cursor,
+    encode_cursor,
+)
+
+client = TestClient(app)
+
+
+def _profile(n: int) -> SimpleNamespace:
+    stamp = datetime(2026, 1, 1, 12, n)
+    return SimpleNamespace(id=f"p{n}", name="User", language="pt", data={"goals": {}}, created_at=stamp, updated_at=stamp, metrics_version=None)
+
+
+def test_filters_use_indexed_containment_and_expressions():
+    filters = ProfileFilters(language="pt", conditions=("Hypertension", "Diabetes"), goal="loss")
+    sql = str(select(Profile.id).where(*filters.clauses()).compile(dialect=postgresql.dialect()))
+
+    assert "profile.data @> " in sql and f"{PROFILE_GOAL} = %(goal)s" in sql
+    assert "profile.language = " in sql
+    assert ProfileFilters().clauses() == []
+
+
+def test_cursor_round_trip():
+    profile = _profile(5)
+    assert decode_cursor(encode_cursor(profile)) == (profile.created_at, "p5")
+    with pytest.raises(InvalidCursor):
+        decode_cursor("garbage")
+
+
+def test_list_profiles_pages_and_projects(monkeypatch):
+    calls = []
+
+    async def list_profiles(self, filters, limit, after, slim):
+        calls.append((filters, limit, after, slim))
+        return [_profile(n) for n in range(limit)]
+
+    monkeypatch.setattr(ProfileService, "list_profiles", list_profiles)
+
+    resp = client.get("/api/profiles?condition=Hypertension&condition=Diabetes&goal=loss&limit=2&slim=true")
+    assert resp.status_code == 200
+    assert [p["id"] for p in resp.json()] == ["p0", "p1"] and "data" not in resp.json()[0]
+    assert decode_cursor(resp.headers["X-Next-Cursor"])[1] == "p1"
+    assert calls[0][0] == ProfileFilters(conditions=("Hypertension", "Diabetes"), goal="loss")
+
+    resp = client.get(f"/api/profiles?limit=3&after={resp.headers['X-Next-Cursor']}")
+    assert "data" in resp.json()[0] and calls[1][2] is not None
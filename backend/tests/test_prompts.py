@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from app.schemas.plan import UserProfile, WeeklyPlan
+from app.services import prompts
+from benchmarks.fixtures import sample_profile, sample_weekly_plan
+
+
+def test_profile_context_projects_only_task_fields():
+    profile = UserProfile.model_validate(sample_profile("u1"))
+    data = json.loads(prompts.profile_context(profile, prompts.CLINICAL_PROFILE))
+
+    assert data["kg"] == 72 and data["conditions"] == ["Hypertension"]
+    assert "diet" not in data and "meds" not in data  # not projected / empty
+    encoded = prompts.profile_context(profile)
+    assert "consent" not in encoded and "u1" not in encoded and "onboarding" not in encoded
+
+
+def test_meal_rows_are_one_line_per_meal():
+    plan = WeeklyPlan.model_validate(sample_weekly_plan())
+    rows = prompts.meal_rows(plan).splitlines()
+
+    assert rows[0] == prompts.MEAL_HEADER
+    assert len(rows) == 1 + sum(len(day.meals) for day in plan.days)
+    assert rows[1].startswith("Mon|")
+
+
+def test_build_drops_optional_sections_to_fit_budget():
+    sections = [
+        prompts.Section("Required", "x" * 200),
+        prompts.Section("Extra", "y" * 400, required=False),
+    ]
+    prompt = prompts.build("test", "Do it.", sections, budget=100)
+    assert "Required" in prompt and "Extra" not in prompt
+    assert prompts.estimate_tokens(prompt) <= 100
+
+    with pytest.raises(prompts.PromptBudgetExceeded):
+        prompts.build("test", "Do it.", sections, budget=20)
@@ -0,0 +1,90 @@
+import pytest
+
+from app.agents.base_agent import AgentConfig
+from app.agents.nutrition_plan_agent import NutritionPlanAgent
+from app.core.config import settings
+from app.schemas.plan import UserProfile
+from app.services import gemini, plan_engine, replan
+from app.services.food_index import normalize
+from benchmarks.fixtures import sample_profile
+
+
+def _profile(**routine) -> UserProfile:
+    data = sample_profile("u1")
+    data["routine"].update(routine)
+    return UserProfile.model_validate(data)
+
+
+@pytest.fixture(scope="module")
+def parent():
+    profile = _profile()
+    return plan_engine.generate_weekly_plan(profile), replan.plan_constraints(profile)
+
+
+def test_unchanged_profile_keeps_every_meal(parent):
+    plan, constraints = parent
+    result = replan.replan(plan, constraints, _profile())
+
+    assert not result.diff.changed and result.days == () and result.meals == ()
+    assert result.plan.days == plan.days and result.plan.id != plan.id
+
+
+def test_new_allergy_regenerates_only_affected_meals(parent):
+    plan, constraints = parent
+    result = replan.replan(plan, constraints, _profile(allergies=["peanut", "egg"]))
+
+    assert result.diff.exclusions == ("egg",) and result.days == ()
+    assert 0 < len(result.meals) < 28 and result.regenerated_fraction < 0.5
+    for day_index, day in enumerate(result.plan.days):
+        for slot_index, meal in enumerate(day.meals):
+            assert "egg" not in normalize(meal.description).split()
+            if (day_index, slot_index) not in result.meals:
+                assert meal == plan.days[day_index].meals[slot_index]
+
+    days = result.plan.days
+    assert result.plan.averageCalories == pytest.approx(sum(d.dailyCalories for d in days) / 7, abs=0.2)
+    assert result.plan.averageMacros.protein == pytest.approx(sum(d.dailyMacros.protein for d in days) / 7, abs=0.2)
+
+
+def test_new_calorie_target_regenerates_days(parent):
+    plan, constraints = parent
+    data = sample_profile("u1")
+    data["biometrics"]["weight"] = 85
+    result = replan.replan(plan, constraints, UserProfile.model_validate(data))
+
+    assert result.diff.targets and result.days
+    assert result.plan.averageCalories > plan.averageCalories
+
+
+def test_meal_time_change_is_patched_in_place(parent):
+    plan, constraints = parent
+    result = replan.replan(plan, constraints, _profile(preferredMealTimes=["08:00", "13:00", "17:00", "20:00"]))
+
+    assert result.diff.times and result.meals == ()
+    assert [m.timestamp for m in result.plan.days[0].meals] == ["08:00", "13:00", "17:00", "20:00"]
+    assert result.plan.days[0].meals[0].name == plan.days[0].meals[0].name
+
+
+def test_structural_changes_need_full_generation(parent):
+    plan, constraints = parent
+    assert replan.replan(plan, constraints, _profile(mealsPerDay=5)) is None
+    assert replan.replan(plan, constraints, _profile(dietaryPreference="vegan")) is None
+    assert replan.replan(plan, None, _profile()) is None
+
+
+@pytest.mark.asyncio
+async def test_agent_replans_from_parent(monkeypatch, parent):
+    plan, constraints = parent
+
+    def unexpected(*args):
+        raise AssertionError("Gemini should not be called")
+
+    monkeypatch.setattr(gemini, "generate_weekly_plan", unexpected)
+    monkeypatch.setattr(settings, "plan_engine_mode", "llm")
+    agent = NutritionPlanAgent(AgentConfig(name="nutrition_plan", description="plan"))
+    profile = _profile(allergies=["peanut", "egg"]).model_dump()
+
+    result = await agent.process(
+        {"profile": profile, "parent": {"id": "p1", "plan": plan.model_dump(), "constraints": constraints}}
+    )
+    assert result.days[0].day == "Monday" and result.id != plan.id
@@ -0,0 +1,77 @@
+import asyncio
+
+import google.generativeai as genai
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.resources import Resources, resources
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_ready_reports_warmup_state(monkeypatch):
+    warmed = []
+
+    async def warmup(timeout=None):
+        warmed.append(True)
+        return resources.ready
+
+    monkeypatch.setattr(resources, "warmup", warmup)
+    monkeypatch.setattr(resources, "ready", False)
+    resp = client.get("/api/ready")
+    assert resp.status_code == 503 and resp.json()["status"] == "warming"
+    assert warmed == [True]
+
+    monkeypatch.setattr(resources, "ready", True)
+    assert client.get("/api/ready").status_code == 200
+    assert warmed == [True]
+
+
+@pytest.mark.asyncio
+async def test_shutdown_drains_tracked_work_then_closes(monkeypatch):
+    container = Resources()
+    finished, closed = [], []
+
+    async def work(delay):
+        await asyncio.sleep(delay)
+        finished.append(delay)
+
+    async def close():
+        closed.append(list(finished))
+
+    monkeypatch.setattr(container, "close", close)
+    monkeypatch.setattr(settings, "shutdown_drain_timeout", 0.2)
+    container.ready = True
+    container.track(work(0.01))
+    stuck = container.track(work(10))
+
+    await container.shutdown()
+    assert closed == [[0.01]]
+    assert stuck.cancelled() or stuck.cancelling()
+    assert not container.ready and container.closing
+
+
+def test_pools_are_shared_within_a_loop_and_rebuilt_across_loops():
+    container = Resources()
+
+    async def handles():
+        return container.redis, container.engine
+
+    first, second = container.run(handles()), container.run(handles())
+    assert first[0] is second[0] and first[1] is second[1]
+    other = asyncio.run(handles())
+    assert other[0] is not first[0] and other[1] is not first[1]
+    container.stop_worker()
+
+
+def test_llm_client_is_configured_once(monkeypatch):
+    configured = []
+    monkeypatch.setattr(genai, "configure", lambda **kwargs: configured.append(kwargs))
+    monkeypatch.setattr(genai, "GenerativeModel", lambda name: name)
+    container = Resources()
+
+    assert container.llm() == settings.gemini_model
+    assert container.llm("other-model") == "other-model"
+    assert len(configured) == 1
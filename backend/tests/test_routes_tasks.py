@@ -1,13 +1,27 @@
 from types import SimpleNamespace
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.schemas.plan import UserProfile
+from app.services import plan_engine
+from app.services.profile_service import ProfileService
+from app.services.scheduling import Admission, AdmissionRejected
+from benchmarks.fixtures import sample_profile
 
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def no_ready_plan(monkeypatch):
+    async def ready_plan(self, profile_id, profile):
+        return None
+
+    monkeypatch.setattr(ProfileService, "ready_plan", ready_plan)
+
+
 class DummyAsyncResult:
     def __init__(self, status: str, result=None):
         self._status = status
@@ -21,41 +35,98 @@ class DummyAsyncResult:
         return self._status
 
 
+PLAN_BODY = {
+    "profile": {
+        "id": "u1",
+        "language": "en",
+        "onboardingMode": "express",
+        "name": "User",
+        "biometrics": {},
+        "clinical": {},
+        "lifestyle": {},
+        "routine": {},
+        "goals": {},
+        "consent": {},
+    }
+}
+
+
 def test_enqueue_plan(monkeypatch):
+    calls = {}
+
     class DummyTask:
         def __init__(self):
             self.id = "task-1"
 
-    def fake_delay(payload):
+    def fake_send_task(name, args, task_id, queue, priority, headers):
+        calls.update(name=name, payload=args[0], task_id=task_id, queue=queue, priority=priority, headers=headers)
         return DummyTask()
 
-    monkeypatch.setattr("app.api.routes.tasks.generate_plan_task.delay", fake_delay)
-
-    resp = client.post(
-        "/api/agents/plan",
-        json={
-            "profile": {
-                "id": "u1",
-                "language": "en",
-                "onboardingMode": "express",
-                "name": "User",
-                "biometrics": {},
-                "clinical": {},
-                "lifestyle": {},
-                "routine": {},
-                "goals": {},
-                "consent": {},
-            }
-        },
-    )
+    async def fake_admit(tenant, lane, job_id):
+        calls.update(slot=job_id)
+        return Admission(lane="batch", queue="agents.batch", priority=3)
+
+    monkeypatch.setattr("app.api.routes.tasks._celery", lambda: SimpleNamespace(send_task=fake_send_task))
+    monkeypatch.setattr("app.api.routes.tasks.scheduler.admit", fake_admit)
+
+    resp = client.post("/api/agents/plan", json=PLAN_BODY)
     assert resp.status_code == 200
     data = resp.json()
     assert data["task_id"] == "task-1"
+    assert calls["name"] == "agent.generate_plan"
+    assert calls["queue"] == "agents.batch"
+    assert calls["priority"] == 3
+    assert calls["task_id"] == calls["slot"]  # the worker releases the slot by its task id
+    assert calls["payload"]["priority"] == "batch"
+    assert calls["payload"]["tenant_id"] == "dev-user"
+    assert calls["payload"]["deadline"] is None  # batch lane has no end-to-end deadline by default
+    assert "enqueued_at" in calls["headers"]
+
+
+def test_enqueue_plan_serves_ready_precomputed_plan(monkeypatch):
+    plan = plan_engine.generate_weekly_plan(UserProfile.model_validate(sample_profile("u1")))
+    served = []
+    entity = SimpleNamespace(id="pre-1", plan=plan.model_dump(), status="ready")
+
+    async def ready_plan(self, profile_id, profile):
+        return entity
+
+    async def serve_plan(self, plan):
+        served.append(plan.id)
+        return plan
+
+    async def latest_report(self, profile_id):
+        return None
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("a ready plan must not be regenerated")
+
+    monkeypatch.setattr(ProfileService, "ready_plan", ready_plan)
+    monkeypatch.setattr(ProfileService, "serve_plan", serve_plan)
+    monkeypatch.setattr(ProfileService, "latest_report", latest_report)
+    monkeypatch.setattr("app.api.routes.tasks._celery", lambda: SimpleNamespace(send_task=unexpected))
+
+    resp = client.post("/api/agents/plan", json=PLAN_BODY)
+    assert resp.status_code == 200
+    assert resp.json()["status"] == "success" and resp.json()["plan"]["id"] == plan.id
+    assert served == ["pre-1"]
+
+
+def test_enqueue_plan_rejected_when_backlogged(monkeypatch):
+    async def fake_admit(tenant, lane, job_id):
+        raise AdmissionRejected(lane, backlog=250, retry_after=26)
+
+    monkeypatch.setattr("app.api.routes.tasks.scheduler.admit", fake_admit)
+
+    resp = client.post("/api/agents/plan", json=PLAN_BODY)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "26"
 
 
 def test_plan_status_success(monkeypatch):
     result_data = {"task_id": "task-1", "status": "success"}
-    monkeypatch.setattr("app.api.routes.tasks.AsyncResult", lambda _id: DummyAsyncResult("SUCCESS", result_data))
+    celery = SimpleNamespace(AsyncResult=lambda _id: DummyAsyncResult("SUCCESS", result_data))
+    monkeypatch.setattr("app.api.routes.tasks._celery", lambda: celery)
 
     resp = client.get("/api/agents/plan/task-1")
     assert resp.status_code == 200
@@ -63,7 +134,8 @@ def test_plan_status_success(monkeypatch):
 
 
 def test_plan_status_pending(monkeypatch):
-    monkeypatch.setattr("app.api.routes.tasks.AsyncResult", lambda _id: DummyAsyncResult("PENDING"))
+    celery = SimpleNamespace(AsyncResult=lambda _id: DummyAsyncResult("PENDING"))
+    monkeypatch.setattr("app.api.routes.tasks._celery", lambda: celery)
 
     resp = client.get("/api/agents/plan/task-2")
     assert resp.status_code == 200
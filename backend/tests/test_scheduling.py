@@ -0,0 +1,111 @@
+import pytest
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services import scheduling
+from app.services.scheduling import AdmissionRejected, PlanScheduler, decide, pending_key, release_slot, slot_member
+
+
+def test_light_tenant_keeps_top_priority_behind_bulk_tenant():
+    pending = {"interactive": {"bulk": 40}, "batch": {}}
+    assert decide(pending, "bulk", "interactive").priority == scheduling.MAX_PRIORITY
+    admission = decide(pending, "light", "interactive")
+    assert admission.lane == "interactive"
+    assert admission.priority == 0
+    assert admission.queue == settings.plan_queue_interactive
+
+
+def test_heavy_tenant_spills_to_batch_when_interactive_is_deep(monkeypatch):
+    monkeypatch.setattr(settings, "plan_interactive_overflow_depth", 10)
+    pending = {"interactive": {"bulk": 9, "light": 1}, "batch": {}}
+    assert decide(pending, "bulk", "interactive").lane == "batch"
+    assert decide(pending, "light", "interactive").lane == "interactive"
+
+
+def test_admission_rejects_over_limit_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "plan_admission_limit_batch", 100)
+    monkeypatch.setattr(settings, "plan_service_rate", 2.0)
+    pending = {"interactive": {}, "batch": {"a": 60, "b": 50}}
+    with pytest.raises(AdmissionRejected) as exc_info:
+        decide(pending, "c", "batch")
+    assert exc_info.value.retry_after == 6
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def zrangebyscore(self, key, low, high):
+        self.results.append([m for m, score in self.redis.sets.get(key, {}).items() if score >= low])
+
+    def zrem(self, key, member):
+        self.results.append(self.redis.sets.get(key, {}).pop(member, None) is not None)
+
+    def execute(self):
+        return self.results
+
+
+class AsyncPipeline(FakePipeline):
+    async def execute(self):
+        return self.results
+
+
+class FakeRedis:
+    """Sorted sets in a dict; the reservation script is replayed in Python."""
+
+    def __init__(self, pipeline=AsyncPipeline, sets=None):
+        self.sets = {} if sets is None else sets
+        self._pipeline = pipeline
+
+    def pipeline(self, transaction=False):
+        return self._pipeline(self)
+
+    def register_script(self, script):
+        assert "ZREMRANGEBYSCORE" in script
+
+        async def reserve(keys, args):
+            member, now, ttl, limit = args
+            lane, mine = (self.sets.setdefault(key, {}) for key in keys)
+            for slots in (lane, mine):
+                for stale in [m for m, score in slots.items() if score < now - ttl]:
+                    del slots[stale]
+            backlog, count = len(lane), len(mine)
+            if backlog >= limit:
+                return [0, backlog, count]
+            lane[member] = mine[member] = now
+            return [1, backlog, count]
+
+        return reserve
+
+
+@pytest.mark.asyncio
+async def test_admit_reserves_expiring_slots_and_release_frees_them(monkeypatch):
+    monkeypatch.setattr(settings, "plan_admission_limit_interactive", 3)
+    redis = FakeRedis()
+    scheduler = PlanScheduler(redis)
+    # A slot left behind by a worker that died an hour ago no longer counts.
+    redis.sets[pending_key("interactive")] = {slot_member("gone", "j0"): scheduling.time.time() - scheduling.SLOT_TTL_SECONDS - 1}
+
+    for job in ("j1", "j2"):
+        await scheduler.admit("a", "interactive", job)
+    assert (await scheduler.admit("b", "interactive", "j3")).priority == 0
+    assert await scheduler.pending() == {"interactive": {"a": 2, "b": 1}, "batch": {}}
+    with pytest.raises(AdmissionRejected):
+        await scheduler.admit("c", "interactive", "j4")
+
+    worker_redis = FakeRedis(FakePipeline, redis.sets)
+    release_slot(worker_redis, "interactive", "a", "j1")
+    release_slot(worker_redis, "interactive", "a", "j1")  # a redelivered task releases twice
+    assert (await scheduler.admit("c", "interactive", "j4")).lane == "interactive"
+    assert (await scheduler.pending())["interactive"] == {"a": 1, "b": 1, "c": 1}
+
+
+@pytest.mark.asyncio
+async def test_admit_fails_open_when_redis_is_down():
+    class DownRedis:
+        def pipeline(self, transaction=False):
+            raise RedisError("down")
+
+    admission = await PlanScheduler(DownRedis()).admit("a", "batch", "j1")
+    assert (admission.lane, admission.priority) == ("batch", 0)
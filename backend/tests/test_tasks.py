@@ -1,25 +1,57 @@
-import time
-from types import SimpleNamespace
-
 from app.tasks import agent_tasks
-from app.schemas.plan import PlanRequest, UserProfile
+from app.schemas.plan import ClinicalReport, PlanRequest, UserProfile, WeeklyPlan
+from app.core.config import settings
+from app.services import gemini
+
+
+def _plan() -> WeeklyPlan:
+    return WeeklyPlan(
+        id="p1",
+        days=[],
+        averageCalories=0,
+        averageMacros={"protein": 0, "carbs": 0, "fats": 0},
+        recommendations=[],
+        generatedAt="",
+    )
+
+
+def _report() -> ClinicalReport:
+    return ClinicalReport(
+        id="r1",
+        generatedAt="",
+        overallScore=90,
+        weightProjection=-0.4,
+        dailyDeficit=350,
+        micronutrientAnalysis={},
+        behavioralInsights=[],
+        risks=[],
+    )
 
 
 def test_generate_plan_task(monkeypatch):
     events = []
+    persisted = []
 
     def fake_publish_event(event: dict):
         events.append(event)
 
-    def fake_generate_weekly_plan(req):
-        return SimpleNamespace(model_dump=lambda: {"plan": "ok"})
+    def fake_generate_weekly_plan(req, *args):
+        return _plan()
+
+    def fake_generate_clinical_report(req, plan, assessment=None, model=None):
+        return _report()
 
-    def fake_generate_clinical_report(req, plan):
-        return SimpleNamespace(model_dump=lambda: {"report": "ok"})
+    async def fake_persist_results(
+        profile_id, weekly_plan, clinical_report, profile=None, parent_id=None, insights=None, source="request", correlation_id=None,
+        job_id=None,
+    ):
+        persisted.append((profile_id, weekly_plan, clinical_report))
 
     monkeypatch.setattr(agent_tasks, "_publish_event", fake_publish_event)
-    monkeypatch.setattr(agent_tasks.gemini, "generate_weekly_plan", fake_generate_weekly_plan)
-    monkeypatch.setattr(agent_tasks.gemini, "generate_clinical_report", fake_generate_clinical_report)
+    monkeypatch.setattr(agent_tasks, "_persist_results", fake_persist_results)
+    monkeypatch.setattr(gemini, "generate_weekly_plan", fake_generate_weekly_plan)
+    monkeypatch.setattr(gemini, "generate_clinical_report", fake_generate_clinical_report)
+    monkeypatch.setattr(settings, "clinical_narrative_mode", "llm")
 
     payload = PlanRequest(
         profile=UserProfile(
@@ -39,5 +71,9 @@ def test_generate_plan_task(monkeypatch):
 
     result = agent_tasks.generate_plan_task(payload)
     assert result["status"] == "success"
+    assert result["plan"]["id"] == "p1"
+    assert result["clinical_report"]["id"] == "r1"
+    assert persisted[0][0] == "u1"
     assert events[0]["event"] == "started"
     assert events[-1]["event"] == "completed"
+    assert set(events[-1]["timings"]["steps"]) == {"plan", "clinical", "coach"}
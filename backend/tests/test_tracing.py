@@ -0,0 +1,60 @@
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from app.agents.base_agent import AgentConfig, BaseAgent
+from app.core import tracing
+
+exporter = InMemorySpanExporter()
+
+
+@pytest.fixture(autouse=True)
+def span_exporter():
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+    exporter.clear()
+    yield exporter
+
+
+class EchoAgent(BaseAgent[dict]):
+    async def process(self, input_data: dict) -> dict:
+        return input_data
+
+
+class FakeTaskRequest(dict):
+    headers = None
+
+
+def test_context_propagates_through_task_headers(span_exporter):
+    with tracing.tracer.start_as_current_span("api.enqueue_plan") as parent:
+        headers = tracing.inject_headers()
+    assert "traceparent" in headers
+
+    found = tracing.task_headers(FakeTaskRequest(headers))
+    wait = tracing.record_queue_wait(found, tracing.extract_context(found))
+    assert wait is not None and wait >= 0
+
+    spans = {s.name: s for s in span_exporter.get_finished_spans()}
+    queue_span = spans["celery.queue_wait"]
+    assert queue_span.context.trace_id == parent.get_span_context().trace_id
+    assert queue_span.parent.span_id == parent.get_span_context().span_id
+
+
+@pytest.mark.asyncio
+async def test_agent_run_and_traced_functions_emit_spans(span_exporter):
+    @tracing.traced("persist")
+    async def persist():
+        return "ok"
+
+    agent = EchoAgent(AgentConfig(name="echo", description="Echo"))
+    assert await agent.run({"x": 1}) == {"x": 1}
+    assert await persist() == "ok"
+
+    spans = {s.name: s for s in span_exporter.get_finished_spans()}
+    assert spans["agent.run"].attributes["agent"] == "echo"
+    assert spans["agent.run"].attributes["attempts"] == 1
+    assert "persist" in spans
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents.base_agent import AgentConfig, AgentMessage, BaseAgent
+from app.agents.remote_agent import RemoteAgent, RemoteAgentError
+from app.agents.transport import InProcessTransport, RedisStreamsTransport
+from app.core import deadline
+from app.schemas.plan import MacroBreakdown
+
+
+class EchoAgent(BaseAgent[dict]):
+    result_model = MacroBreakdown
+
+    async def process(self, input_data: dict):
+        if input_data.get("fail"):
+            raise ValueError("bad input")
+        await asyncio.sleep(input_data.get("delay", 0))
+        return MacroBreakdown(protein=input_data["n"], carbs=deadline.remaining() or 0, fats=0)
+
+
+def _serve(agent: BaseAgent, transport: InProcessTransport, concurrency: int = 1) -> asyncio.Task:
+    return asyncio.create_task(agent.serve(transport, "test", concurrency))
+
+
+@pytest.mark.asyncio
+async def test_remote_agent_round_trip_routes_by_receiver():
+    transport = InProcessTransport()
+    echo = EchoAgent(AgentConfig(name="echo", description="echo", max_retries=1))
+    other = EchoAgent(AgentConfig(name="other", description="other", max_retries=1))
+    servers = [_serve(echo, transport), _serve(other, transport)]
+    remote = RemoteAgent(AgentConfig(name="echo", description="proxy", max_retries=1), transport, EchoAgent.result_model)
+
+    with deadline.deadline_scope(time.time() + 5):
+        result = await remote.run({"n": 3})
+    assert isinstance(result, MacroBreakdown) and result.protein == 3
+    assert 0 < result.carbs <= 5  # the worker ran under the caller's deadline
+
+    with pytest.raises(RemoteAgentError, match="ValueError"):
+        await remote.process({"fail": True})
+
+    echo.stop()
+    other.stop()
+    for server in servers:
+        server.cancel()
+    await asyncio.gather(*servers, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_serve_concurrency_bounds_messages_in_flight():
+    transport = InProcessTransport()
+    echo = EchoAgent(AgentConfig(name="echo", description="echo", max_retries=1))
+    server = _serve(echo, transport, concurrency=4)
+    remote = RemoteAgent(AgentConfig(name="echo", description="proxy", max_retries=1), transport)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(remote.process({"n": i, "delay": 0.1}) for i in range(4)))
+    assert [r["protein"] for r in results] == [0, 1, 2, 3]
+    assert time.perf_counter() - started < 0.35
+
+    echo.stop()
+    server.cancel()
+    await asyncio.gather(server, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_parallel_steps_of_one_plan_get_their_own_replies():
+    transport = InProcessTransport()
+    agents = [EchoAgent(AgentConfig(name=name, description=name, max_retries=1)) for name in ("clinical", "coach")]
+    servers = [_serve(agent, transport) for agent in agents]
+    clinical, coach = (RemoteAgent(AgentConfig(name=a.config.name, description="proxy", max_retries=1), transport) for a in agents)
+
+    # Both steps carry the plan's correlation id, as the orchestrator's fan-out does.
+    results = await asyncio.gather(
+        clinical.process({"n": 1, "delay": 0.05, "correlation_id": "plan-1"}),
+        coach.process({"n": 2, "correlation_id": "plan-1"}),
+    )
+    assert [r["protein"] for r in results] == [1, 2]
+
+    for agent in agents:
+        agent.stop()
+    for server in servers:
+        server.cancel()
+    await asyncio.gather(*servers, return_exceptions=True)
+
+
+def test_redis_stream_naming_and_encoding():
+    message = AgentMessage(sender="a", receiver="clinical_safety", content={"x": 1}, message_type="request", deadline=12.5)
+    decoded = RedisStreamsTransport.decode({b"json": RedisStreamsTransport.encode(message)["json"]})
+
+    assert decoded == message
+    assert RedisStreamsTransport.stream("clinical_safety") == "agents:inbox:clinical_safety"
+    assert RedisStreamsTransport.stream("agents:replies:node-1") == "agents:replies:node-1"